@@ -88,7 +88,6 @@ id:
     sample: /subscriptions/subid/resourceGroups/rg1/providers/Microsoft.Network/routeTables/testrt/routes/route1
 '''
 
-import time
 from ansible.module_utils.azure_rm_common import AzureRMModuleBase
 
 try:
@@ -237,10 +236,6 @@ class AzureRMRoutes(AzureRMModuleBase):
                 return self.results
 
             self.delete_route()
-            # make sure instance is actually deleted, for some Azure resources, instance is hanging around
-            # for some time after deletion -- this should be really fixed in Azure
-            while self.get_route():
-                time.sleep(20)
         else:
             self.log("Route instance unchanged")
             self.results['changed'] = False
@@ -283,6 +278,8 @@ class AzureRMRoutes(AzureRMModuleBase):
             response = self.mgmt_client.routes.delete(resource_group_name=self.resource_group,
                                                       route_table_name=self.route_table_name,
                                                       route_name=self.route_name)
+            if isinstance(response, AzureOperationPoller):
+                self.get_poller_result(response)
         except CloudError as e:
             self.log('Error attempting to delete the Route instance.')
             self.fail("Error deleting the Route instance: {0}".format(str(e)))
@@ -39,6 +39,8 @@ options:
     routes:
         description:
             - Collection of routes contained within a route table.
+            - The whole set is compared with the routes of the existing table and written with one request. Routes of
+              the table that are not listed are kept, unless I(purge_routes) is set.
         type: list
         suboptions:
             id:
@@ -47,6 +49,7 @@ options:
             address_prefix:
                 description:
                     - The destination CIDR to which the route applies.
+                required: True
             next_hop_type:
                 description:
                     - "The type of Azure hop the packet should be sent to. Possible values are: 'C(virtual_network_gateway)', 'C(vnet_local)', 'C(internet)',
@@ -67,12 +70,22 @@ options:
             name:
                 description:
                     - The name of the resource that is unique within a resource group. This name can be used to access the resource.
+                required: True
             etag:
                 description:
                     - A unique read-only string that changes whenever the resource is updated.
+    purge_routes:
+        description:
+            - Remove routes of the route table that are not listed in I(routes).
+        type: bool
+        default: False
+        aliases:
+            - purge
+        version_added: "2.7"
     disable_bgp_route_propagation:
         description:
             - Gets or sets whether to disable the I(routes) learned by BGP on that route table. True means disable.
+        type: bool
     provisioning_state:
         description:
             - "The provisioning state of the resource. Possible values are: 'Updating', 'Deleting', and 'Failed'."
@@ -94,6 +107,20 @@ EXAMPLES = '''
       resource_group: rg1
       route_table_name: testrt
       location: eastus
+
+  - name: Synchronize all routes of a Route Table
+    azure_rm_appgwroutetable:
+      resource_group: rg1
+      route_table_name: testrt
+      purge_routes: yes
+      routes:
+        - name: to-firewall
+          address_prefix: 0.0.0.0/0
+          next_hop_type: virtual_appliance
+          next_hop_ip_address: 10.0.0.4
+        - name: to-onprem
+          address_prefix: 192.168.0.0/16
+          next_hop_type: virtual_network_gateway
 '''
 
 RETURN = '''
@@ -103,9 +130,18 @@ id:
     returned: always
     type: str
     sample: /subscriptions/subid/resourceGroups/rg1/providers/Microsoft.Network/routeTables/testrt
+route_changes:
+    description:
+        - Names of the routes added, updated and, when I(purge_routes) is set, removed.
+    returned: when the route table exists and I(routes) is set
+    type: dict
+    sample: {
+        "added": ["to-onprem"],
+        "updated": [],
+        "removed": ["legacy"]
+    }
 '''
 
-import time
 from ansible.module_utils.azure_rm_common import AzureRMModuleBase
 
 try:
@@ -122,6 +158,63 @@ class Actions:
     NoAction, Create, Update, Delete = range(4)
 
 
+NEXT_HOP_TYPES = dict(
+    virtual_network_gateway='VirtualNetworkGateway',
+    vnet_local='VnetLocal',
+    internet='Internet',
+    virtual_appliance='VirtualAppliance',
+    none='None'
+)
+
+ROUTE_KEYS = ('name', 'address_prefix', 'next_hop_type', 'next_hop_ip_address')
+
+
+route_spec = dict(
+    name=dict(type='str', required=True),
+    address_prefix=dict(type='str', required=True),
+    next_hop_type=dict(type='str', required=True, choices=list(NEXT_HOP_TYPES.keys())),
+    next_hop_ip_address=dict(type='str'),
+    id=dict(type='str'),
+    provisioning_state=dict(type='str'),
+    etag=dict(type='str')
+)
+
+
+def route_key(route):
+    return tuple(route.get(key) for key in ROUTE_KEYS)
+
+
+def reconcile_routes(existing, desired, purge):
+    '''
+    Merge the desired routes into the routes of the existing table, matching them by name.
+
+    :param existing: list of route dicts of the existing table
+    :param desired: list of route dicts with the keys of ROUTE_KEYS
+    :param purge: drop existing routes that are not in desired
+    :return: tuple of the list of route dicts to write and a dict of added, updated and removed route names
+    '''
+    changes = dict(added=[], updated=[], removed=[])
+    wanted = dict((route['name'], route) for route in desired)
+    routes = []
+    for route in existing:
+        route = dict((key, route.get(key)) for key in ROUTE_KEYS)
+        if route['name'] in wanted:
+            if route_key(route) != route_key(wanted[route['name']]):
+                changes['updated'].append(route['name'])
+                route = wanted[route['name']]
+            routes.append(route)
+        elif purge:
+            changes['removed'].append(route['name'])
+        else:
+            routes.append(route)
+    names = set(route['name'] for route in existing)
+    for route in desired:
+        if route['name'] not in names:
+            changes['added'].append(route['name'])
+            routes.append(route)
+    return routes, changes
+
+
 class AzureRMRouteTables(AzureRMModuleBase):
     """Configuration class for an Azure RM Route Table resource"""
 
@@ -142,10 +235,17 @@ class AzureRMRouteTables(AzureRMModuleBase):
                 type='str'
             ),
             routes=dict(
-                type='list'
+                type='list',
+                elements='dict',
+                options=route_spec
+            ),
+            purge_routes=dict(
+                type='bool',
+                default=False,
+                aliases=['purge']
             ),
             disable_bgp_route_propagation=dict(
-                type='str'
+                type='bool'
             ),
             provisioning_state=dict(
                 type='str'
@@ -162,6 +262,8 @@ class AzureRMRouteTables(AzureRMModuleBase):
 
         self.resource_group = None
         self.route_table_name = None
+        self.routes = None
+        self.purge_routes = None
         self.parameters = dict()
 
         self.results = dict(changed=False)
@@ -184,20 +286,6 @@ class AzureRMRouteTables(AzureRMModuleBase):
                     self.parameters["id"] = kwargs[key]
                 elif key == "location":
                     self.parameters["location"] = kwargs[key]
-                elif key == "routes":
-                    ev = kwargs[key]
-                    if 'next_hop_type' in ev:
-                        if ev['next_hop_type'] == 'virtual_network_gateway':
-                            ev['next_hop_type'] = 'VirtualNetworkGateway'
-                        elif ev['next_hop_type'] == 'vnet_local':
-                            ev['next_hop_type'] = 'VnetLocal'
-                        elif ev['next_hop_type'] == 'internet':
-                            ev['next_hop_type'] = 'Internet'
-                        elif ev['next_hop_type'] == 'virtual_appliance':
-                            ev['next_hop_type'] = 'VirtualAppliance'
-                        elif ev['next_hop_type'] == 'none':
-                            ev['next_hop_type'] = 'None'
-                    self.parameters["routes"] = ev
                 elif key == "disable_bgp_route_propagation":
                     self.parameters["disable_bgp_route_propagation"] = kwargs[key]
                 elif key == "provisioning_state":
@@ -218,19 +306,43 @@ class AzureRMRouteTables(AzureRMModuleBase):
 
         old_response = self.get_routetable()
 
+        desired_routes = None
+        if self.routes is not None:
+            names = set()
+            desired_routes = []
+            for route in self.routes:
+                if route['name'] in names:
+                    self.fail("Route {0} is listed more than once".format(route['name']))
+                names.add(route['name'])
+                route = dict((key, route.get(key)) for key in ROUTE_KEYS)
+                route['next_hop_type'] = NEXT_HOP_TYPES[route['next_hop_type']]
+                desired_routes.append(route)
+
         if not old_response:
             self.log("Route Table instance doesn't exist")
             if self.state == 'absent':
                 self.log("Old instance didn't exist")
             else:
                 self.to_do = Actions.Create
+                if desired_routes:
+                    self.parameters["routes"] = desired_routes
         else:
             self.log("Route Table instance already exists")
             if self.state == 'absent':
                 self.to_do = Actions.Delete
             elif self.state == 'present':
                 self.log("Need to check if Route Table instance has to be deleted or may be updated")
-                self.to_do = Actions.Update
+                # keep the existing routes unless they are managed here, a PUT without routes removes them
+                routes, route_changes = reconcile_routes(old_response.get('routes') or [], desired_routes or [],
+                                                         self.purge_routes and desired_routes is not None)
+                self.parameters["routes"] = routes
+                if desired_routes is not None:
+                    self.results['route_changes'] = route_changes
+                if any(route_changes.values()):
+                    self.to_do = Actions.Update
+                if self.parameters.get("disable_bgp_route_propagation") is not None and \
+                   bool(old_response.get('disable_bgp_route_propagation')) != self.parameters["disable_bgp_route_propagation"]:
+                    self.to_do = Actions.Update
 
         if (self.to_do == Actions.Create) or (self.to_do == Actions.Update):
             self.log("Need to Create / Update the Route Table instance")
@@ -254,10 +366,6 @@ class AzureRMRouteTables(AzureRMModuleBase):
                 return self.results
 
             self.delete_routetable()
-            # make sure instance is actually deleted, for some Azure resources, instance is hanging around
-            # for some time after deletion -- this should be really fixed in Azure
-            while self.get_routetable():
-                time.sleep(20)
         else:
             self.log("Route Table instance unchanged")
             self.results['changed'] = False
@@ -298,6 +406,8 @@ class AzureRMRouteTables(AzureRMModuleBase):
         try:
             response = self.mgmt_client.route_tables.delete(resource_group_name=self.resource_group,
                                                             route_table_name=self.route_table_name)
+            if isinstance(response, AzureOperationPoller):
+                self.get_poller_result(response)
         except CloudError as e:
             self.log('Error attempting to delete the Route Table instance.')
             self.fail("Error deleting the Route Table instance: {0}".format(str(e)))
@@ -33,6 +33,12 @@ options:
             - The resource group to search for the desired availability set
         required: false
         default: null
+    fields:
+        description:
+            - Only return these fields of each object, given as dotted paths such as C(name) or C(tags).
+        required: false
+        default: null
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -107,7 +113,8 @@ class AzureRMAvailabilitySetFacts(AzureRMModuleBase):
         super(AzureRMAvailabilitySetFacts, self).__init__(
             derived_arg_spec=self.module_args,
             supports_tags=False,
-            facts_module=True
+            facts_module=True,
+            supports_fields=True
         )
 
     def exec_module(self, **kwargs):
@@ -38,6 +38,12 @@ options:
             - Limit results by providing a list of tags. Format tags as 'key' or 'key:value'.
         required: false
         default: null
+    fields:
+        description:
+            - Only return these fields of each object, given as dotted paths such as C(name) or C(tags).
+        required: false
+        default: null
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -134,7 +140,8 @@ class AzureRMFunctionAppFacts(AzureRMModuleBase):
         super(AzureRMFunctionAppFacts, self).__init__(
             self.module_arg_spec,
             supports_tags=False,
-            facts_module=True
+            facts_module=True,
+            supports_fields=True
         )
 
     def exec_module(self, **kwargs):
@@ -168,7 +175,7 @@ class AzureRMFunctionAppFacts(AzureRMModuleBase):
             pass
 
         if function_app and self.has_tags(function_app.tags, self.tags):
-            result = function_app.as_dict()
+            result = self.model_to_dict(function_app)
 
         return [result]
 
@@ -182,7 +189,7 @@ class AzureRMFunctionAppFacts(AzureRMModuleBase):
         results = []
         for item in response:
             if self.has_tags(item.tags, self.tags):
-                results.append(item.as_dict())
+                results.append(self.model_to_dict(item))
         return results
 
     def list_all(self):
@@ -195,7 +202,7 @@ class AzureRMFunctionAppFacts(AzureRMModuleBase):
         results = []
         for item in response:
             if self.has_tags(item.tags, self.tags):
-                results.append(item.as_dict())
+                results.append(self.model_to_dict(item))
         return results
 
 
@@ -318,6 +318,16 @@ changed:
     description: Whether or not the resource has changed
     returned: always
     type: bool
+differences:
+    description:
+        - Names of the frontend IP configurations, backend address pools, probes, inbound NAT pools and load balancing
+          rules that were added, changed or removed, by sub-resource type. Empty when the load balancer is up to date.
+    returned: when the load balancer exists and I(state=present)
+    type: dict
+    sample: {
+        "load_balancing_rules": ["lbrbalancingrule0"],
+        "probes": ["prob0"]
+    }
 '''
 
 import random
@@ -591,13 +601,17 @@ class AzureRMLoadBalancer(AzureRMModuleBase):
             setattr(self, key, kwargs[key])
 
         changed = False
-
-        resource_group = self.get_resource_group(self.resource_group)
-        if not self.location:
-            self.location = resource_group.location
+        tags = self.tags
 
         load_balancer = self.get_load_balancer()
 
+        if not self.location:
+            if load_balancer:
+                self.location = load_balancer.location
+            else:
+                resource_group = self.get_resource_group(self.resource_group)
+                self.location = resource_group.location
+
         if self.state == 'present':
             # compatible parameters
             if not self.frontend_ip_configurations and not self.backend_address_pools and not self.probes and not self.inbound_nat_pools:
@@ -644,8 +658,15 @@ class AzureRMLoadBalancer(AzureRMModuleBase):
                     enable_floating_ip=False
                 )] if self.protocol else None
             if load_balancer:
-                # check update, NIE
-                changed = False
+                differences = diff_states(existing_state(load_balancer), self.desired_state())
+                if differences:
+                    self.log('CHANGED: load balancer {0} differs in {1}'.format(self.name, differences))
+                    changed = True
+                self.results['differences'] = differences
+                update_tags, tags = self.update_tags(load_balancer.tags)
+                if update_tags:
+                    self.log('CHANGED: load balancer {0} tags'.format(self.name))
+                    changed = True
             else:
                 changed = True
         elif self.state == 'absent' and load_balancer:
@@ -654,11 +675,11 @@ class AzureRMLoadBalancer(AzureRMModuleBase):
         self.results['state'] = load_balancer_to_dict(load_balancer)
         self.results['changed'] = changed
 
-        if self.state == 'present' and changed:
+        if self.state == 'present' and changed and not self.check_mode:
             # create or update
             frontend_ip_configurations_param = [self.network_models.FrontendIPConfiguration(
                 name=item.get('name'),
-                public_ip_address=self.get_public_ip_address(item.get('public_ip_address'))
+                public_ip_address=self.network_models.PublicIPAddress(id=self.public_ip_address_id(item.get('public_ip_address')))
             ) for item in self.frontend_ip_configurations] if self.frontend_ip_configurations else None
 
             backend_address_pools_param = [self.network_models.BackendAddressPool(
@@ -717,13 +738,15 @@ class AzureRMLoadBalancer(AzureRMModuleBase):
                 protocol=item.get('protocol'),
                 load_distribution=item.get('load_distribution'),
                 frontend_port=item.get('frontend_port'),
-                backend_port=item.get('backend_port'),
+                backend_port=item.get('backend_port') or item.get('frontend_port'),
                 idle_timeout_in_minutes=item.get('idle_timeout'),
                 enable_floating_ip=item.get('enable_floating_ip')
             ) for item in self.load_balancing_rules] if self.load_balancing_rules else None
 
             param = self.network_models.LoadBalancer(
                 location=self.location,
+                tags=tags,
+                sku=load_balancer.sku if load_balancer else None,
                 frontend_ip_configurations=frontend_ip_configurations_param,
                 backend_address_pools=backend_address_pools_param,
                 probes=probes_param,
@@ -731,23 +754,58 @@ class AzureRMLoadBalancer(AzureRMModuleBase):
                 load_balancing_rules=load_balancing_rules_param
             )
 
-            self.create_or_update_load_balancer(param)
-        elif self.state == 'absent' and changed:
+            self.results['state'] = self.create_or_update_load_balancer(param)
+        elif self.state == 'absent' and changed and not self.check_mode:
             self.delete_load_balancer()
             self.results['state'] = None
 
         return self.results
 
-    def get_public_ip_address(self, id):
-        """Get a reference to the public ip address resource"""
-        self.log('Fetching public ip address {}'.format(id))
-        pip_dict = parse_resource_id(id)
-        resource_group = pip_dict.get('resource_group', self.resource_group)
-        name = pip_dict.get('name')
-        try:
-            return self.network_client.public_ip_addresses.get(resource_group, name)
-        except CloudError as err:
-            self.fail('Error fetching public ip address {} - {}'.format(name, str(err)))
+    def public_ip_address_id(self, name):
+        """Build the id of a public ip address from its name or id"""
+        pip_dict = parse_resource_id(name)
+        return public_ip_address_id(
+            pip_dict.get('subscription', self.subscription_id),
+            pip_dict.get('resource_group', self.resource_group),
+            pip_dict.get('name')
+        )
+
+    def desired_state(self):
+        """Canonical form of the requested sub-resources, comparable with existing_state"""
+        def sub_id(build, name):
+            return build(self.subscription_id, self.resource_group, self.name, name).lower()
+
+        return dict(
+            frontend_ip_configurations=dict((item['name'], (
+                self.public_ip_address_id(item['public_ip_address']).lower(),
+            )) for item in self.frontend_ip_configurations or []),
+            backend_address_pools=dict((item['name'], ()) for item in self.backend_address_pools or []),
+            probes=dict((item['name'], (
+                item.get('port'),
+                item.get('protocol') or 'Tcp',
+                item.get('interval'),
+                item.get('fail_count'),
+                item.get('request_path') or None
+            )) for item in self.probes or []),
+            inbound_nat_pools=dict((item['name'], (
+                sub_id(frontend_ip_configuration_id, item['frontend_ip_configuration_name']),
+                item.get('protocol') or 'Tcp',
+                item.get('frontend_port_range_start'),
+                item.get('frontend_port_range_end'),
+                item.get('backend_port')
+            )) for item in self.inbound_nat_pools or []),
+            load_balancing_rules=dict((item['name'], (
+                sub_id(frontend_ip_configuration_id, item['frontend_ip_configuration']),
+                sub_id(backend_address_pool_id, item['backend_address_pool']),
+                sub_id(probe_id, item['probe']),
+                item.get('protocol') or 'Tcp',
+                item.get('load_distribution') or 'Default',
+                item.get('frontend_port'),
+                item.get('backend_port') or item.get('frontend_port'),
+                item.get('idle_timeout'),
+                bool(item.get('enable_floating_ip'))
+            )) for item in self.load_balancing_rules or [])
+        )
 
     def get_load_balancer(self):
         """Get a load balancer"""
@@ -895,6 +953,64 @@ def load_balancer_to_dict(load_balancer):
     return result
 
 
+def existing_state(load_balancer):
+    """Canonical form of the sub-resources of a LoadBalancer object, comparable with desired_state"""
+    def lower_id(sub_resource):
+        return sub_resource.id.lower() if sub_resource and sub_resource.id else None
+
+    return dict(
+        frontend_ip_configurations=dict((_.name, (
+            lower_id(_.public_ip_address),
+        )) for _ in load_balancer.frontend_ip_configurations or []),
+        backend_address_pools=dict((_.name, ()) for _ in load_balancer.backend_address_pools or []),
+        probes=dict((_.name, (
+            _.port,
+            _.protocol,
+            _.interval_in_seconds,
+            _.number_of_probes,
+            _.request_path or None
+        )) for _ in load_balancer.probes or []),
+        inbound_nat_pools=dict((_.name, (
+            lower_id(_.frontend_ip_configuration),
+            _.protocol,
+            _.frontend_port_range_start,
+            _.frontend_port_range_end,
+            _.backend_port
+        )) for _ in load_balancer.inbound_nat_pools or []),
+        load_balancing_rules=dict((_.name, (
+            lower_id(_.frontend_ip_configuration),
+            lower_id(_.backend_address_pool),
+            lower_id(_.probe),
+            _.protocol,
+            _.load_distribution,
+            _.frontend_port,
+            _.backend_port,
+            _.idle_timeout_in_minutes,
+            bool(_.enable_floating_ip)
+        )) for _ in load_balancer.load_balancing_rules or [])
+    )
+
+
+def diff_states(existing, desired):
+    """Return the names of the sub-resources that are added, changed or removed, by sub-resource type"""
+    differences = dict()
+    for key in desired:
+        names = sorted(name for name in set(existing[key]) | set(desired[key])
+                       if existing[key].get(name) != desired[key].get(name))
+        if names:
+            differences[key] = names
+    return differences
+
+
+def public_ip_address_id(subscription_id, resource_group_name, name):
+    """Generate the id for a public ip address"""
+    return '/subscriptions/{}/resourceGroups/{}/providers/Microsoft.Network/publicIPAddresses/{}'.format(
+        subscription_id,
+        resource_group_name,
+        name
+    )
+
+
 def frontend_ip_configuration_id(subscription_id, resource_group_name, load_balancer_name, name):
     """Generate the id for a frontend ip configuration"""
     return '/subscriptions/{}/resourceGroups/{}/providers/Microsoft.Network/loadBalancers/{}/frontendIPConfigurations/{}'.format(
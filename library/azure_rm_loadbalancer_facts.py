@@ -53,6 +53,12 @@ options:
             - Limit results by providing a list of tags. Format tags as 'key' or 'key:value'.
         required: false
         default: null
+    fields:
+        description:
+            - Only return these fields of each object, given as dotted paths such as C(name) or C(tags).
+        required: false
+        default: null
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -120,7 +126,8 @@ class AzureRMLoadBalancerFacts(AzureRMModuleBase):
         super(AzureRMLoadBalancerFacts, self).__init__(
             derived_arg_spec=self.module_args,
             supports_tags=False,
-            facts_module=True
+            facts_module=True,
+            supports_fields=True
         )
 
     def exec_module(self, **kwargs):
@@ -156,7 +163,7 @@ class AzureRMLoadBalancerFacts(AzureRMModuleBase):
             self.log('Could not get facts for LoadBalancers.')
 
         if response is not None:
-            results[response.name] = response.as_dict()
+            results[response.name] = self.model_to_dict(response)
 
         return results
 
@@ -176,7 +183,7 @@ class AzureRMLoadBalancerFacts(AzureRMModuleBase):
 
         if response is not None:
             for item in response:
-                results[item.name] = item.as_dict()
+                results[item.name] = self.model_to_dict(item)
 
         return results
 
@@ -196,7 +203,7 @@ class AzureRMLoadBalancerFacts(AzureRMModuleBase):
 
         if response is not None:
             for item in response:
-                results[item.name] = item.as_dict()
+                results[item.name] = self.model_to_dict(item)
 
         return results
 
@@ -32,7 +32,7 @@ options:
     name:
         description:
             - Name of the managed disk.
-        required: true
+            - Required unless I(disks) is set.
     state:
         description:
             - Assert the state of the managed disk. Use C(present) to create or update a managed disk and 'absent' to delete a managed disk.
@@ -62,7 +62,7 @@ options:
             - URI to a valid VHD file to be used when I(create_option) is C(import).
     source_resource_uri:
         description:
-            - The resource ID of the managed disk to copy when I(create_option) is C(copy).
+            - The resource ID of the managed disk or snapshot to copy when I(create_option) is C(copy).
     os_type:
         description:
             - "Type of Operating System: C(linux) or C(windows). Used when I(create_option) is either C(copy) or C(import) and the source is an OS disk."
@@ -80,6 +80,59 @@ options:
     tags:
         description:
             - Tags to assign to the managed disk.
+    disks:
+        description:
+            - List of managed disks to create, update or delete in one task. Mutually exclusive with I(name).
+            - Options set on the task apply to every disk that does not set them itself.
+            - The resource group is listed once and missing disks are created concurrently, waiting on all creates in
+              a single loop. Disks are then attached to
+              I(managed_by) with one update of the virtual machine, at the lowest free LUNs. Disks attached to another
+              virtual machine are detached from it with one update per virtual machine.
+            - With I(state=absent) the disks are detached and then deleted concurrently.
+        type: list
+        version_added: "2.7"
+        suboptions:
+            name:
+                description:
+                    - Name of the managed disk.
+                required: true
+            storage_account_type:
+                description:
+                    - Type of storage for the managed disk.
+                choices:
+                    - Standard_LRS
+                    - Premium_LRS
+            create_option:
+                description:
+                    - How to create the managed disk, as in I(create_option).
+                choices:
+                    - empty
+                    - import
+                    - copy
+            source_uri:
+                description:
+                    - URI to a valid VHD file to be used when I(create_option) is C(import).
+            source_resource_uri:
+                description:
+                    - The resource ID of the managed disk or snapshot to copy when I(create_option) is C(copy).
+            os_type:
+                description:
+                    - Type of Operating System.
+                choices:
+                    - linux
+                    - windows
+            disk_size_gb:
+                description:
+                    - Size in GB of the managed disk.
+            tags:
+                description:
+                    - Tags to assign to the managed disk.
+    max_concurrency:
+        description:
+            - Maximum number of managed disk creates, updates or deletes in flight when I(disks) is set.
+        type: int
+        default: 10
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -111,6 +164,34 @@ EXAMPLES = '''
         resource_group: Testing
         disk_size_gb: 4
 
+    - name: Create and attach data disks to a database VM with one VM update
+      azure_rm_managed_disk:
+        resource_group: Testing
+        storage_account_type: Premium_LRS
+        disk_size_gb: 1023
+        managed_by: testvm001
+        disks:
+          - name: data1
+          - name: data2
+          - name: logs
+            disk_size_gb: 128
+      register: output
+
+    - name: Clone a data set from its snapshots
+      azure_rm_managed_disk:
+        resource_group: Testing
+        create_option: copy
+        max_concurrency: 20
+        disks:
+          - name: test-data1
+            source_resource_uri: /subscriptions/XXXXXXX-XXXX-XXXX-XXXX-XXXXXXXXXX/resourceGroups/Testing/providers/Microsoft.Compute/snapshots/data1
+          - name: test-data2
+            source_resource_uri: /subscriptions/XXXXXXX-XXXX-XXXX-XXXX-XXXXXXXXXX/resourceGroups/Testing/providers/Microsoft.Compute/snapshots/data2
+      register: output
+
+    - debug:
+        msg: "{{ output.timings }}"
+
     - name: Delete managed disk
       azure_rm_manage_disk:
         name: mymanageddisk
@@ -126,8 +207,27 @@ id:
     type: dict
 state:
     description: Current state of the managed disk
-    returned: always
+    returned: when I(name) is set
+    type: dict
+timings:
+    description: Seconds each created or updated disk took, from the request to the end of the operation, by disk name.
+    returned: when I(disks) is set and disks were written
     type: dict
+    sample: {"test-data1": 41.2, "test-data2": 44.0}
+disks:
+    description: Current state of the managed disks, in the order of I(disks).
+    returned: when I(disks) is set with I(state=present)
+    type: list
+    sample: [{
+        "id": "/subscriptions/XXXXXXX-XXXX-XXXX-XXXX-XXXXXXXXXX/resourceGroups/Testing/providers/Microsoft.Compute/disks/data1",
+        "name": "data1",
+        "location": "eastus",
+        "tags": null,
+        "disk_size_gb": 1023,
+        "os_type": null,
+        "storage_account_type": "Premium_LRS",
+        "managed_by": "/subscriptions/XXXXXXX-XXXX-XXXX-XXXX-XXXXXXXXXX/resourceGroups/Testing/providers/Microsoft.Compute/virtualMachines/testvm001"
+    }]
 changed:
     description: Whether or not the resource has changed
     returned: always
@@ -162,6 +262,28 @@ def managed_disk_to_dict(managed_disk):
     )
 
 
+disk_spec = dict(
+    name=dict(type='str', required=True),
+    storage_account_type=dict(type='str', choices=['Standard_LRS', 'Premium_LRS']),
+    create_option=dict(type='str', choices=['empty', 'import', 'copy']),
+    source_uri=dict(type='str'),
+    source_resource_uri=dict(type='str'),
+    os_type=dict(type='str', choices=['linux', 'windows']),
+    disk_size_gb=dict(type='int'),
+    tags=dict(type='dict')
+)
+
+
+def attached_vm(disk):
+    '''
+    :return: (resource group, name) of the virtual machine the disk dict is attached to, or None
+    '''
+    if not disk or not disk.get('managed_by'):
+        return None
+    vm = parse_resource_id(disk['managed_by'])
+    return vm.get('resource_group'), vm.get('name')
+
+
 class AzureRMManagedDisk(AzureRMModuleBase):
     """Configuration class for an Azure RM Managed Disk resource"""
 
@@ -172,8 +294,7 @@ class AzureRMManagedDisk(AzureRMModuleBase):
                 required=True
             ),
             name=dict(
-                type='str',
-                required=True
+                type='str'
             ),
             state=dict(
                 type='str',
@@ -206,6 +327,15 @@ class AzureRMManagedDisk(AzureRMModuleBase):
             ),
             managed_by=dict(
                 type='str'
+            ),
+            disks=dict(
+                type='list',
+                elements='dict',
+                options=disk_spec
+            ),
+            max_concurrency=dict(
+                type='int',
+                default=10
             )
         )
         required_if = [
@@ -228,9 +358,13 @@ class AzureRMManagedDisk(AzureRMModuleBase):
         self.disk_size_gb = None
         self.tags = None
         self.managed_by = None
+        self.disks = None
+        self.max_concurrency = None
         super(AzureRMManagedDisk, self).__init__(
             derived_arg_spec=self.module_arg_spec,
             required_if=required_if,
+            mutually_exclusive=[['name', 'disks']],
+            required_one_of=[['name', 'disks']],
             supports_check_mode=True,
             supports_tags=True)
 
@@ -246,6 +380,9 @@ class AzureRMManagedDisk(AzureRMModuleBase):
         if not self.location:
             self.location = resource_group.location
 
+        if self.disks:
+            return self.exec_batch()
+
         disk_instance = self.get_managed_disk()
         result = disk_instance
 
@@ -280,57 +417,179 @@ class AzureRMManagedDisk(AzureRMModuleBase):
         self.results['state'] = result
         return self.results
 
+    def exec_batch(self):
+        '''
+        Create, update or delete every disk in disks. The resource group is listed once, disks are written on up to
+        max_concurrency threads and every virtual machine is updated once.
+        '''
+        if self.max_concurrency < 1:
+            self.fail("Parameter error: max_concurrency must be at least 1")
+        specs = self.batch_specs()
+
+        existing = dict()
+        try:
+            for disk in self.compute_client.disks.list_by_resource_group(self.resource_group):
+                existing[disk.name.lower()] = managed_disk_to_dict(disk)
+        except CloudError as exc:
+            self.fail("Error listing managed disks in resource group {0} - {1}".format(self.resource_group, str(exc)))
+        disks = [existing.get(spec['name'].lower()) for spec in specs]
+
+        if self.state == 'absent':
+            found = [disk for disk in disks if disk]
+            self.results['changed'] = len(found) > 0
+            if found and not self.check_mode:
+                self.detach_from_vms([disk for disk in found if attached_vm(disk)])
+                outcomes = self.run_pollers(lambda disk: self.compute_client.disks.delete(self.resource_group, disk['name']),
+                                            found, self.max_concurrency)
+                failed = dict((disk['name'], str(exc)) for disk, (result, exc, seconds) in zip(found, outcomes) if exc)
+                if failed:
+                    self.fail("Error deleting managed disks {0}".format(', '.join(sorted(failed))), errors=failed)
+            return self.results
+
+        to_write = []
+        for index, (spec, disk) in enumerate(zip(specs, disks)):
+            parameter = self.generate_managed_disk_property(spec)
+            if not disk or self.is_different(disk, parameter):
+                to_write.append((index, spec['name'], parameter))
+        changed = len(to_write) > 0
+
+        if to_write and not self.check_mode:
+            outcomes = self.run_pollers(lambda item: self.compute_client.disks.create_or_update(self.resource_group, item[1], item[2]),
+                                        to_write, self.max_concurrency)
+            failed = dict()
+            timings = dict()
+            for (index, name, parameter), (disk, exc, seconds) in zip(to_write, outcomes):
+                timings[name] = round(seconds, 1)
+                if exc:
+                    failed[name] = str(exc)
+                else:
+                    disks[index] = managed_disk_to_dict(disk)
+            if failed:
+                self.fail("Error creating or updating managed disks {0}".format(', '.join(sorted(failed))),
+                          errors=failed, timings=timings)
+            self.results['timings'] = timings
+
+        target = (self.resource_group.lower(), self.managed_by.lower()) if self.managed_by else None
+        moving = []
+        for disk in disks:
+            vm = attached_vm(disk)
+            if disk and (vm and (vm[0].lower(), vm[1].lower())) != target:
+                moving.append(disk)
+        changed = changed or len(moving) > 0
+        if moving and not self.check_mode:
+            self.detach_from_vms([disk for disk in moving if attached_vm(disk)])
+            if target:
+                vm = self.update_vm_disks(self.managed_by, attach=moving)
+                for disk in moving:
+                    disk['managed_by'] = vm.id
+
+        self.results['changed'] = bool(changed)
+        self.results['disks'] = disks
+        return self.results
+
+    def batch_specs(self):
+        '''
+        Apply the task options to every disk that does not set them.
+        '''
+        specs = []
+        for item in self.disks:
+            spec = dict((key, item.get(key) if item.get(key) is not None else getattr(self, key)) for key in disk_spec)
+            spec['location'] = self.location
+            specs.append(spec)
+        names = [spec['name'].lower() for spec in specs]
+        if len(set(names)) != len(names):
+            self.fail("Parameter error: disk names must be unique")
+        for spec in specs:
+            for option, value, required in [('create_option', 'import', 'source_uri'),
+                                             ('create_option', 'copy', 'source_resource_uri'),
+                                             ('create_option', 'empty', 'disk_size_gb')]:
+                if spec[option] == value and spec[required] is None:
+                    self.fail("Parameter error: disk {0} has {1} {2} but no {3}".format(spec['name'], option, value, required))
+        return specs
+
+    def detach_from_vms(self, disks):
+        '''
+        Detach disk dicts from the virtual machines they are attached to, with one update per virtual machine.
+        '''
+        by_vm = dict()
+        for disk in disks:
+            by_vm.setdefault(attached_vm(disk), []).append(disk)
+        for (resource_group, vm_name), vm_disks in sorted(by_vm.items()):
+            self.update_vm_disks(vm_name, detach=[disk['name'] for disk in vm_disks], resource_group=resource_group)
+            for disk in vm_disks:
+                disk['managed_by'] = None
+
     def attach(self, vm_name, disk):
-        vm = self._get_vm(vm_name)
-        # find the lun
-        luns = ([d.lun for d in vm.storage_profile.data_disks]
-                if vm.storage_profile.data_disks else [])
-        lun = max(luns) + 1 if luns else 0
-
-        # prepare the data disk
-        params = self.compute_models.ManagedDiskParameters(id=disk.get('id'), storage_account_type=disk.get('storage_account_type'))
-        data_disk = self.compute_models.DataDisk(lun, self.compute_models.DiskCreateOptionTypes.attach, managed_disk=params)
-        vm.storage_profile.data_disks.append(data_disk)
-        self._update_vm(vm_name, vm)
+        self.update_vm_disks(vm_name, attach=[disk])
 
     def detach(self, vm_name, disk):
-        vm = self._get_vm(vm_name)
-        leftovers = [d for d in vm.storage_profile.data_disks if d.name.lower() != disk.get('name').lower()]
-        if len(vm.storage_profile.data_disks) == len(leftovers):
-            self.fail("No disk with the name '{0}' was found".format(disk.get('name')))
-        vm.storage_profile.data_disks = leftovers
-        self._update_vm(vm_name, vm)
-
-    def _update_vm(self, name, params):
+        self.update_vm_disks(vm_name, detach=[disk.get('name')])
+
+    def update_vm_disks(self, vm_name, attach=None, detach=None, resource_group=None):
+        '''
+        Attach and detach data disks with a single update of the virtual machine.
+
+        :param attach: disk dicts to attach, at the lowest free LUNs
+        :param detach: names of the data disks to detach
+        :return: updated virtual machine
+        '''
+        resource_group = resource_group or self.resource_group
+        vm = self._get_vm(vm_name, resource_group)
+        data_disks = vm.storage_profile.data_disks or []
+
+        if detach:
+            attached = set(d.name.lower() for d in data_disks)
+            missing = [name for name in detach if name.lower() not in attached]
+            if missing:
+                self.fail("No disk with the name '{0}' was found".format("', '".join(missing)))
+            names = set(name.lower() for name in detach)
+            data_disks = [d for d in data_disks if d.name.lower() not in names]
+
+        used_luns = set(d.lun for d in data_disks)
+        lun = 0
+        for disk in attach or []:
+            while lun in used_luns:
+                lun += 1
+            used_luns.add(lun)
+            params = self.compute_models.ManagedDiskParameters(id=disk.get('id'), storage_account_type=disk.get('storage_account_type'))
+            data_disks.append(self.compute_models.DataDisk(lun, self.compute_models.DiskCreateOptionTypes.attach, managed_disk=params))
+
+        vm.storage_profile.data_disks = data_disks
+        return self._update_vm(vm_name, vm, resource_group)
+
+    def _update_vm(self, name, params, resource_group=None):
         try:
-            poller = self.compute_client.virtual_machines.create_or_update(self.resource_group, name, params)
-            self.get_poller_result(poller)
+            poller = self.compute_client.virtual_machines.create_or_update(resource_group or self.resource_group, name, params)
+            return self.get_poller_result(poller)
         except Exception as exc:
             self.fail("Error updating virtual machine {0} - {1}".format(name, str(exc)))
 
-    def _get_vm(self, name):
+    def _get_vm(self, name, resource_group=None):
         try:
-            return self.compute_client.virtual_machines.get(self.resource_group, name, expand='instanceview')
+            return self.compute_client.virtual_machines.get(resource_group or self.resource_group, name)
         except Exception as exc:
             self.fail("Error getting virtual machine {0} - {1}".format(name, str(exc)))
 
-    def generate_managed_disk_property(self):
+    def generate_managed_disk_property(self, spec=None):
+        if spec is None:
+            spec = dict((key, getattr(self, key)) for key in disk_spec)
+            spec['location'] = self.location
         disk_params = {}
         creation_data = {}
-        disk_params['location'] = self.location
-        disk_params['tags'] = self.tags
-        if self.storage_account_type:
-            storage_account_type = self.compute_models.DiskSku(self.storage_account_type)
+        disk_params['location'] = spec['location']
+        disk_params['tags'] = spec['tags']
+        if spec['storage_account_type']:
+            storage_account_type = self.compute_models.DiskSku(spec['storage_account_type'])
             disk_params['sku'] = storage_account_type
-        disk_params['disk_size_gb'] = self.disk_size_gb
+        disk_params['disk_size_gb'] = spec['disk_size_gb']
         # TODO: Add support for EncryptionSettings
         creation_data['create_option'] = self.compute_models.DiskCreateOption.empty
-        if self.create_option == 'import':
+        if spec['create_option'] == 'import':
             creation_data['create_option'] = self.compute_models.DiskCreateOption.import_enum
-            creation_data['source_uri'] = self.source_uri
-        elif self.create_option == 'copy':
+            creation_data['source_uri'] = spec['source_uri']
+        elif spec['create_option'] == 'copy':
             creation_data['create_option'] = self.compute_models.DiskCreateOption.copy
-            creation_data['source_resource_id'] = self.source_resource_uri
+            creation_data['source_resource_id'] = spec['source_resource_uri']
         disk_params['creation_data'] = creation_data
         return disk_params
 
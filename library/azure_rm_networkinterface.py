@@ -35,8 +35,7 @@ options:
         required: true
     name:
         description:
-            - Name of the network interface.
-        required: true
+            - Name of the network interface. Required unless I(interfaces) is used.
     state:
         description:
             - Assert the state of the network interface. Use 'present' to create or update an interface and
@@ -66,10 +65,9 @@ options:
     subnet_name:
         description:
             - Name of an existing subnet within the specified virtual network. Required when creating a network
-              interface
+              interface, unless every entry of I(interfaces) sets its own C(subnet_name).
         aliases:
             - subnet
-        required: true
         default: null
     os_type:
         description:
@@ -88,7 +86,7 @@ options:
     private_ip_allocation_method:
         description:
             - "(Deprecate) Specify whether or not the assigned IP address is permanent. NOTE: when creating a network interface
-              specifying a value of 'Static' requires that a private_ip_address value be provided. You can update
+              with a value of 'Static' and no private_ip_address, a free address of the subnet is allocated. You can update
               the allocation method to 'Static' after a dynamic private ip address has been assigned."
             - This option will be deprecated in 2.9, use I(ip_configurations) instead.
         default: Dynamic
@@ -134,6 +132,9 @@ options:
             private_ip_allocation_method:
                 description:
                     - private ip allocation method.
+                    - With C(Static) and no I(private_ip_address), a free address of the subnet is allocated. Allocated
+                      addresses are reserved in a local lock file, so parallel tasks on the same host never get the same
+                      address.
                 choices:
                     - Dynamic
                     - Static
@@ -166,6 +167,24 @@ options:
               connections to the default SSH port 22, and for a Windows host rules will be added allowing inbound
               access to RDP ports 3389 and 5986. Override the default ports by providing a list of open ports.
         default: null
+    interfaces:
+        description:
+            - Manage a batch of network interfaces in one task instead of I(name). Every entry is a dict with the name of
+              the interface and optionally C(subnet_name), C(security_group_name), C(private_ip_address),
+              C(public_ip_address_name) or C(ip_configurations); all other options apply to every interface.
+            - Entries without C(subnet_name) use I(subnet_name). Entries without C(ip_configurations),
+              C(private_ip_address) or C(public_ip_address_name) use I(ip_configurations) when it is set.
+            - Existing interfaces, public IP addresses and security groups are read once for the whole batch, and the
+              interfaces are created, updated or deleted concurrently.
+            - Existing interfaces without I(security_group_name) keep their security group. New ones get a default
+              security group named after the interface, as with I(name). Missing public IP addresses are created
+              once, before the interfaces are written.
+        version_added: "2.7"
+    max_concurrency:
+        description:
+            - Maximum number of network interfaces written at the same time when using I(interfaces).
+        default: 10
+        version_added: "2.7"
 extends_documentation_fragment:
     - azure
     - azure_tags
@@ -235,6 +254,20 @@ EXAMPLES = '''
                   primary: True
                 - name: ipconfig2
 
+    - name: Create a batch of network interfaces sharing a subnet and security group
+      azure_rm_networkinterface:
+            resource_group: Testing
+            virtual_network_name: vnet001
+            subnet_name: subnet001
+            security_group_name: secgroup001
+            public_ip: no
+            max_concurrency: 20
+            interfaces:
+                - name: node001-nic
+                - name: node002-nic
+                - name: node003-nic
+                  private_ip_address: 10.0.0.10
+
     - name: Delete network interface
       azure_rm_networkinterface:
             resource_group: Testing
@@ -243,6 +276,22 @@ EXAMPLES = '''
 '''
 
 RETURN = '''
+interfaces:
+    description:
+        - Per interface results when using I(interfaces). Each entry holds the name, whether it changed, its state and,
+          if the write failed, C(failed) and C(msg).
+    returned: when I(interfaces) is set
+    type: list
+    sample: [
+        {
+            "changed": true,
+            "name": "node001-nic",
+            "state": {
+                "id": "/subscriptions/XXXX/resourceGroups/Testing/providers/Microsoft.Network/networkInterfaces/node001-nic",
+                "name": "node001-nic"
+            }
+        }
+    ]
 state:
     description: The current state of the network interface.
     returned: always
@@ -278,6 +327,8 @@ state:
     }
 '''
 
+import copy
+
 try:
     from msrestazure.tools import parse_resource_id
     from msrestazure.azure_exceptions import CloudError
@@ -285,7 +336,7 @@ except ImportError:
     # This is handled in azure_rm_common
     pass
 
-from ansible.module_utils.azure_rm_common import AzureRMModuleBase, azure_id_to_dict
+from ansible.module_utils.azure_rm_common import AzureRMModuleBase, azure_id_to_dict, run_concurrently
 from ansible.module_utils._text import to_native
 
 
@@ -358,6 +409,15 @@ ip_configuration_spec = dict(
     primary=dict(type='bool', default=False)
 )
 
+interface_spec = dict(
+    name=dict(type='str', required=True),
+    subnet_name=dict(type='str', aliases=['subnet']),
+    security_group_name=dict(type='str', aliases=['security_group']),
+    private_ip_address=dict(type='str'),
+    public_ip_address_name=dict(type='str', aliases=['public_ip_address', 'public_ip_name']),
+    ip_configurations=dict(type='list', elements='dict', options=ip_configuration_spec)
+)
+
 
 class AzureRMNetworkInterface(AzureRMModuleBase):
 
@@ -365,7 +425,7 @@ class AzureRMNetworkInterface(AzureRMModuleBase):
 
         self.module_arg_spec = dict(
             resource_group=dict(type='str', required=True),
-            name=dict(type='str', required=True),
+            name=dict(type='str'),
             location=dict(type='str'),
             security_group_name=dict(type='str', aliases=['security_group']),
             state=dict(default='present', choices=['present', 'absent']),
@@ -380,10 +440,21 @@ class AzureRMNetworkInterface(AzureRMModuleBase):
             ip_configurations=dict(type='list', default=None, elements='dict', options=ip_configuration_spec),
             os_type=dict(type='str', choices=['Windows', 'Linux'], default='Linux'),
             open_ports=dict(type='list'),
+            interfaces=dict(type='list', elements='dict', options=interface_spec),
+            max_concurrency=dict(type='int', default=10),
         )
 
+        # subnet_name is checked in exec_module, entries of interfaces can set their own
         required_if = [
-            ('state', 'present', ['subnet_name', 'virtual_network_name'])
+            ('state', 'present', ['virtual_network_name'])
+        ]
+
+        mutually_exclusive = [
+            ('name', 'interfaces')
+        ]
+
+        required_one_of = [
+            ('name', 'interfaces')
         ]
 
         self.resource_group = None
@@ -404,6 +475,8 @@ class AzureRMNetworkInterface(AzureRMModuleBase):
         self.os_type = None
         self.open_ports = None
         self.ip_configurations = None
+        self.interfaces = None
+        self.max_concurrency = None
 
         self.results = dict(
             changed=False,
@@ -412,7 +485,9 @@ class AzureRMNetworkInterface(AzureRMModuleBase):
 
         super(AzureRMNetworkInterface, self).__init__(derived_arg_spec=self.module_arg_spec,
                                                       supports_check_mode=True,
-                                                      required_if=required_if)
+                                                      required_if=required_if,
+                                                      mutually_exclusive=mutually_exclusive,
+                                                      required_one_of=required_one_of)
 
     def exec_module(self, **kwargs):
 
@@ -437,6 +512,12 @@ class AzureRMNetworkInterface(AzureRMModuleBase):
         if virtual_network_resource_group is None:
             virtual_network_resource_group = self.resource_group
 
+        if self.interfaces:
+            return self.exec_batch(virtual_network_name, virtual_network_resource_group)
+
+        if self.state == 'present' and not self.subnet_name:
+            self.fail("state is present but all of the following are missing: subnet_name")
+
         if self.state == 'present' and not self.ip_configurations:
             # construct the ip_configurations array for compatiable
             self.deprecate('Setting ip_configuration flatten is deprecated and will be removed.'
@@ -469,30 +550,9 @@ class AzureRMNetworkInterface(AzureRMModuleBase):
 
                 if self.security_group_name:
                     nsg = self.get_security_group(self.security_group_name)
-                    if nsg and results['network_security_group'].get('id') != nsg.id:
-                        self.log("CHANGED: network interface {0} network security group".format(self.name))
-                        changed = True
-
-                if results['ip_configurations'][0]['subnet']['virtual_network_name'] != virtual_network_name:
-                    self.log("CHANGED: network interface {0} virtual network name".format(self.name))
-                    changed = True
-
-                if results['ip_configurations'][0]['subnet']['resource_group'] != virtual_network_resource_group:
-                    self.log("CHANGED: network interface {0} virtual network resource group".format(self.name))
-                    changed = True
-
-                if results['ip_configurations'][0]['subnet']['name'] != self.subnet_name:
-                    self.log("CHANGED: network interface {0} subnet name".format(self.name))
-                    changed = True
 
-                # check the ip_configuration is changed
-                # construct two set with the same structure and then compare
-                # the list should contains:
-                # name, private_ip_address, public_ip_address_name, private_ip_allocation_method, subnet_name
-                ip_configuration_result = construct_ip_configuration_set(results['ip_configurations'])
-                ip_configuration_request = construct_ip_configuration_set(self.ip_configurations)
-                if ip_configuration_result != ip_configuration_request:
-                    self.log("CHANGED: network interface {0} ip configurations".format(self.name))
+                if self.nic_changed(results, nsg, virtual_network_name, virtual_network_resource_group, self.subnet_name,
+                                    self.ip_configurations):
                     changed = True
 
             elif self.state == 'absent':
@@ -519,6 +579,9 @@ class AzureRMNetworkInterface(AzureRMModuleBase):
                                                          virtual_network_name,
                                                          self.subnet_name))
 
+                self.assign_private_ip_addresses([(self.subnet_name, self.ip_configurations, results)],
+                                                 virtual_network_resource_group, virtual_network_name)
+
                 nic_ip_configurations = [
                     self.network_models.NetworkInterfaceIPConfiguration(
                         private_ip_allocation_method=ip_config.get('private_ip_allocation_method'),
@@ -548,21 +611,260 @@ class AzureRMNetworkInterface(AzureRMModuleBase):
 
         return self.results
 
+    def nic_changed(self, results, nsg, virtual_network_name, virtual_network_resource_group, subnet_name, ip_configurations):
+        '''
+        Compare an existing network interface with the requested security group, subnet and ip configurations.
+
+        :param results: existing network interface as returned by nic_to_dict
+        :return: bool
+        '''
+        changed = False
+        if nsg and (results['network_security_group'] or dict()).get('id') != nsg.id:
+            self.log("CHANGED: network interface {0} network security group".format(results['name']))
+            changed = True
+
+        if results['ip_configurations'][0]['subnet']['virtual_network_name'] != virtual_network_name:
+            self.log("CHANGED: network interface {0} virtual network name".format(results['name']))
+            changed = True
+
+        if results['ip_configurations'][0]['subnet']['resource_group'] != virtual_network_resource_group:
+            self.log("CHANGED: network interface {0} virtual network resource group".format(results['name']))
+            changed = True
+
+        if results['ip_configurations'][0]['subnet']['name'] != subnet_name:
+            self.log("CHANGED: network interface {0} subnet name".format(results['name']))
+            changed = True
+
+        # check the ip_configuration is changed
+        # construct two set with the same structure and then compare
+        # the list should contains:
+        # name, private_ip_address, public_ip_address_name, private_ip_allocation_method, subnet_name
+        ip_configuration_result = construct_ip_configuration_set(results['ip_configurations'])
+        ip_configuration_request = construct_ip_configuration_set(ip_configurations)
+        if ip_configuration_result != ip_configuration_request:
+            self.log("CHANGED: network interface {0} ip configurations".format(results['name']))
+            changed = True
+        return changed
+
+    def exec_batch(self, virtual_network_name, virtual_network_resource_group):
+        '''
+        Create, update or delete every network interface listed in interfaces. Existing interfaces, public IP
+        addresses and security groups are read once for the whole batch, and the writes run on up to
+        max_concurrency threads.
+        '''
+        if self.max_concurrency < 1:
+            self.fail("Parameter error: max_concurrency must be at least 1")
+
+        names = [spec['name'] for spec in self.interfaces]
+        if len(set(names)) != len(names):
+            self.fail("Parameter error: network interface names in interfaces must be unique")
+
+        existing = dict()
+        try:
+            for nic in self.network_client.network_interfaces.list(self.resource_group):
+                existing[nic.name] = nic
+        except CloudError as exc:
+            self.fail("Error listing network interfaces in resource group {0} - {1}".format(self.resource_group, str(exc)))
+
+        if self.state == 'absent':
+            to_delete = [name for name in names if name in existing]
+            self.results['changed'] = len(to_delete) > 0
+            self.results['interfaces'] = [dict(name=name, changed=name in existing) for name in names]
+            if to_delete and not self.check_mode:
+                outcomes = run_concurrently(self.delete_nic_by_name, to_delete, self.max_concurrency)
+                self.report_batch(dict(zip(to_delete, outcomes)), lambda result: dict(status='Deleted'))
+            return self.results
+
+        public_ips = dict()
+        try:
+            for pip in self.network_client.public_ip_addresses.list(self.resource_group):
+                public_ips[pip.name] = pip
+        except CloudError as exc:
+            self.fail("Error listing public IP addresses in resource group {0} - {1}".format(self.resource_group, str(exc)))
+
+        security_groups = dict()
+        pending = []
+        for spec in self.interfaces:
+            spec = self.batch_spec(spec)
+            nsg_name = spec['security_group_name']
+            if nsg_name and nsg_name not in security_groups:
+                security_groups[nsg_name] = self.get_security_group(nsg_name)
+            nsg = security_groups.get(nsg_name)
+            results = nic_to_dict(existing[spec['name']]) if spec['name'] in existing else None
+            changed = results is None
+            if results:
+                update_tags, results['tags'] = self.update_tags(results['tags'])
+                changed = self.nic_changed(results, nsg, virtual_network_name, virtual_network_resource_group,
+                                           spec['subnet_name'], spec['ip_configurations']) or update_tags
+            spec.update(results=results, nsg=nsg, changed=changed)
+            pending.append(spec)
+
+        to_write = [spec for spec in pending if spec['changed']]
+        self.results['changed'] = len(to_write) > 0
+        self.results['interfaces'] = [dict(name=spec['name'], changed=spec['changed'], state=spec['results']) for spec in pending]
+        if not to_write or self.check_mode:
+            return self.results
+
+        for spec in to_write:
+            if spec['nsg']:
+                continue
+            current = existing.get(spec['name'])
+            if current and current.network_security_group:
+                spec['nsg'] = current.network_security_group
+            else:
+                spec['nsg'] = self.create_default_securitygroup(self.resource_group, self.location, spec['name'],
+                                                                self.os_type, self.open_ports)
+
+        # create every missing public IP address once, the writes below only look them up
+        missing_pips = []
+        for spec in to_write:
+            for ip_config in spec['ip_configurations']:
+                pip_name = ip_config.get('public_ip_address_name')
+                if self.public_ip and pip_name and pip_name not in public_ips and \
+                   pip_name not in [name for name, method in missing_pips]:
+                    missing_pips.append((pip_name, ip_config.get('public_ip_allocation_method')))
+        if missing_pips:
+            outcomes = self.run_pollers(
+                lambda item: self.network_client.public_ip_addresses.create_or_update(
+                    self.resource_group, item[0], self.network_models.PublicIPAddress(location=self.location,
+                                                                                      public_ip_allocation_method=item[1])),
+                missing_pips, self.max_concurrency)
+            failed = dict()
+            for (pip_name, method), (pip, exc, seconds) in zip(missing_pips, outcomes):
+                if exc:
+                    failed[pip_name] = str(exc)
+                else:
+                    public_ips[pip_name] = pip
+            if failed:
+                self.fail("Error creating public IP addresses {0}".format(', '.join(sorted(failed))), errors=failed)
+
+        self.assign_private_ip_addresses([(spec['subnet_name'], spec['ip_configurations'], spec['results']) for spec in to_write],
+                                         virtual_network_resource_group, virtual_network_name)
+
+        def write(spec):
+            subnet = self.network_models.SubResource(
+                '/subscriptions/{0}/resourceGroups/{1}/providers/Microsoft.Network/virtualNetworks/{2}/subnets/{3}'.format(
+                    self.subscription_id, virtual_network_resource_group, virtual_network_name, spec['subnet_name']))
+            ip_configurations = []
+            for ip_config in spec['ip_configurations']:
+                pip = None
+                pip_name = ip_config.get('public_ip_address_name')
+                if self.public_ip and pip_name:
+                    pip = public_ips[pip_name]
+                ip_configurations.append(self.network_models.NetworkInterfaceIPConfiguration(
+                    private_ip_allocation_method=ip_config.get('private_ip_allocation_method'),
+                    private_ip_address=ip_config.get('private_ip_address'),
+                    name=ip_config.get('name'),
+                    subnet=subnet,
+                    public_ip_address=pip,
+                    primary=ip_config.get('primary')
+                ))
+            nic = self.network_models.NetworkInterface(
+                id=spec['results']['id'] if spec['results'] else None,
+                location=self.location,
+                tags=spec['results']['tags'] if spec['results'] else self.tags,
+                ip_configurations=ip_configurations,
+                network_security_group=spec['nsg']
+            )
+            poller = self.network_client.network_interfaces.create_or_update(self.resource_group, spec['name'], nic)
+            return nic_to_dict(self.get_poller_result(poller))
+
+        outcomes = run_concurrently(write, to_write, self.max_concurrency)
+        self.report_batch(dict(zip([spec['name'] for spec in to_write], outcomes)), lambda result: result)
+        return self.results
+
+    def assign_private_ip_addresses(self, items, virtual_network_resource_group, virtual_network_name):
+        '''
+        Fill in the address of Static ip configurations that have none. Existing configurations keep their address,
+        the others get free addresses allocated with one call per subnet.
+
+        :param items: list of (subnet name, list of ip configuration dicts, existing interface dict or None) tuples
+        '''
+        pending = dict()
+        for subnet_name, ip_configurations, results in items:
+            existing = dict((config['name'], config['private_ip_address']) for config in results['ip_configurations']) if results else dict()
+            for config in ip_configurations:
+                if config.get('private_ip_allocation_method') != 'Static' or config.get('private_ip_address'):
+                    continue
+                if existing.get(config.get('name')):
+                    config['private_ip_address'] = existing[config['name']]
+                else:
+                    pending.setdefault(subnet_name, []).append(config)
+
+        for subnet_name, configs in pending.items():
+            try:
+                addresses = self.allocate_private_ip_addresses(virtual_network_resource_group, virtual_network_name,
+                                                               subnet_name, len(configs))
+            except (CloudError, ValueError, IOError, OSError) as exc:
+                self.fail("Error allocating private IP addresses in subnet {0} - {1}".format(subnet_name, str(exc)))
+            for config, address in zip(configs, addresses):
+                config['private_ip_address'] = address
+
+    def batch_spec(self, spec):
+        '''
+        Fill in an entry of interfaces with the module level options.
+        '''
+        spec = dict(spec)
+        spec['subnet_name'] = spec.get('subnet_name') or self.subnet_name
+        if not spec['subnet_name']:
+            self.fail("Parameter error: network interface {0} has no subnet_name and none is set for the task".format(spec['name']))
+        spec['security_group_name'] = spec.get('security_group_name') or self.security_group_name
+        if not spec.get('ip_configurations') and self.ip_configurations and \
+           not spec.get('private_ip_address') and not spec.get('public_ip_address_name'):
+            # every interface gets its own copy, addresses are filled in per configuration
+            spec['ip_configurations'] = copy.deepcopy(self.ip_configurations)
+        elif not spec.get('ip_configurations'):
+            spec['ip_configurations'] = [
+                dict(
+                    private_ip_address=spec.get('private_ip_address'),
+                    private_ip_allocation_method='Static' if spec.get('private_ip_address') else self.private_ip_allocation_method,
+                    public_ip_address_name=spec.get('public_ip_address_name') if self.public_ip else None,
+                    public_ip_allocation_method=self.public_ip_allocation_method,
+                    primary=True,
+                    name='default'
+                )
+            ]
+        return spec
+
+    def report_batch(self, outcomes, to_state):
+        '''
+        Merge the outcome of concurrent writes into the per interface results and fail if any write failed.
+
+        :param outcomes: dict of interface name to a (result, exception) tuple
+        :param to_state: callable turning a result into the reported state
+        '''
+        failed = []
+        for entry in self.results['interfaces']:
+            if entry['name'] not in outcomes:
+                continue
+            result, exc = outcomes[entry['name']]
+            if exc:
+                entry['failed'] = True
+                entry['msg'] = str(exc)
+                failed.append(entry['name'])
+            else:
+                entry['state'] = to_state(result)
+        if failed:
+            self.fail("Error processing network interfaces {0}".format(', '.join(failed)), **self.results)
+
     def get_or_create_public_ip_address(self, ip_config):
         name = ip_config.get('public_ip_address_name')
         pip = self.get_public_ip_address(name)
         if not pip:
-            params = self.network_models.PublicIPAddress(
-                location=self.location,
-                public_ip_allocation_method=ip_config.get('public_ip_allocation_method'),
-            )
             try:
-                poller = self.network_client.public_ip_addresses.create_or_update(self.resource_group, name, params)
-                pip = self.get_poller_result(poller)
+                pip = self.create_public_ip_address(name, ip_config.get('public_ip_allocation_method'))
             except CloudError as exc:
                 self.fail("Error creating {0} - {1}".format(name, str(exc)))
         return pip
 
+    def create_public_ip_address(self, name, allocation_method):
+        params = self.network_models.PublicIPAddress(
+            location=self.location,
+            public_ip_allocation_method=allocation_method,
+        )
+        poller = self.network_client.public_ip_addresses.create_or_update(self.resource_group, name, params)
+        return self.get_poller_result(poller)
+
     def create_or_update_nic(self, nic):
         try:
             poller = self.network_client.network_interfaces.create_or_update(self.resource_group, self.name, nic)
@@ -579,6 +881,11 @@ class AzureRMNetworkInterface(AzureRMModuleBase):
             self.fail("Error deleting network interface {0} - {1}".format(self.name, str(exc)))
         return True
 
+    def delete_nic_by_name(self, name):
+        poller = self.network_client.network_interfaces.delete(self.resource_group, name)
+        self.get_poller_result(poller)
+        return True
+
     def get_public_ip_address(self, name):
         self.log("Fetching public ip address {0}".format(name))
         try:
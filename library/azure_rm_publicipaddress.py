@@ -50,8 +50,26 @@ options:
         default: null
     name:
         description:
-            - Name of the Public IP.
-        required: true
+            - Name of the Public IP. With I(count), the prefix of the names of a batch of Public IPs.
+    names:
+        description:
+            - Names of a batch of Public IPs to create, update or delete in one task. All other options apply to every
+              address; I(domain_name) cannot be used.
+            - The resource group is listed once, and missing addresses are created concurrently.
+        type: list
+        version_added: "2.7"
+    count:
+        description:
+            - Manage a batch of I(count) Public IPs named C(<name>-1) to C(<name>-<count>). Mutually exclusive with
+              I(names).
+        type: int
+        version_added: "2.7"
+    max_concurrency:
+        description:
+            - Maximum number of Public IPs written at the same time in batch mode.
+        type: int
+        default: 10
+        version_added: "2.7"
     state:
         description:
             - Assert the state of the Public IP. Use 'present' to create or update a and
@@ -84,6 +102,18 @@ EXAMPLES = '''
         allocation_method: Static
         domain_name: foobar
 
+    - name: Pre-allocate 200 static public ip addresses
+      azure_rm_publicipaddress:
+        resource_group: testing
+        name: green-pip
+        count: 200
+        allocation_method: Static
+        max_concurrency: 20
+      register: green
+
+    - debug:
+        msg: "{{ green.addresses['green-pip-1'] }}"
+
     - name: Delete public ip
       azure_rm_publicipaddress:
         resource_group: testing
@@ -92,6 +122,16 @@ EXAMPLES = '''
 '''
 
 RETURN = '''
+addresses:
+    description:
+        - Map of the name of every Public IP in the batch to its IP address. Addresses that are not allocated yet, e.g.
+          dynamic ones, map to null.
+    returned: in batch mode with I(state=present)
+    type: dict
+    sample: {
+        "green-pip-1": "52.160.10.1",
+        "green-pip-2": "52.160.10.2"
+    }
 state:
     description: Facts about the current state of the object.
     returned: always
@@ -110,7 +150,7 @@ state:
     }
 '''
 
-from ansible.module_utils.azure_rm_common import AzureRMModuleBase
+from ansible.module_utils.azure_rm_common import AzureRMModuleBase, run_concurrently
 
 try:
     from msrestazure.azure_exceptions import CloudError
@@ -145,15 +185,32 @@ class AzureRMPublicIPAddress(AzureRMModuleBase):
 
         self.module_arg_spec = dict(
             resource_group=dict(type='str', required=True),
-            name=dict(type='str', required=True),
+            name=dict(type='str'),
+            names=dict(type='list'),
+            count=dict(type='int'),
+            max_concurrency=dict(type='int', default=10),
             state=dict(type='str', default='present', choices=['present', 'absent']),
             location=dict(type='str'),
             allocation_method=dict(type='str', default='Dynamic', choices=['Dynamic', 'Static']),
             domain_name=dict(type='str', aliases=['domain_name_label']),
         )
 
+        mutually_exclusive = [
+            ('name', 'names'),
+            ('names', 'count'),
+            ('names', 'domain_name'),
+            ('count', 'domain_name')
+        ]
+
+        required_one_of = [
+            ('name', 'names')
+        ]
+
         self.resource_group = None
         self.name = None
+        self.names = None
+        self.count = None
+        self.max_concurrency = None
         self.location = None
         self.state = None
         self.tags = None
@@ -166,6 +223,8 @@ class AzureRMPublicIPAddress(AzureRMModuleBase):
         )
 
         super(AzureRMPublicIPAddress, self).__init__(derived_arg_spec=self.module_arg_spec,
+                                                     mutually_exclusive=mutually_exclusive,
+                                                     required_one_of=required_one_of,
                                                      supports_check_mode=True)
 
     def exec_module(self, **kwargs):
@@ -182,6 +241,13 @@ class AzureRMPublicIPAddress(AzureRMModuleBase):
             # Set default location
             self.location = resource_group.location
 
+        if self.count is not None:
+            if self.count < 1:
+                self.fail("Parameter error: count must be at least 1")
+            self.names = ['{0}-{1}'.format(self.name, index) for index in range(1, self.count + 1)]
+        if self.names is not None:
+            return self.exec_batch()
+
         try:
             self.log("Fetch public ip {0}".format(self.name))
             pip = self.network_client.public_ip_addresses.get(self.resource_group, self.name)
@@ -250,6 +316,80 @@ class AzureRMPublicIPAddress(AzureRMModuleBase):
 
         return self.results
 
+    def exec_batch(self):
+        '''
+        Create, update or delete every Public IP in names. The resource group is listed once and the writes run on
+        up to max_concurrency threads.
+        '''
+        if self.max_concurrency < 1:
+            self.fail("Parameter error: max_concurrency must be at least 1")
+        if len(set(self.names)) != len(self.names):
+            self.fail("Parameter error: names must be unique")
+
+        existing = dict()
+        try:
+            for pip in self.network_client.public_ip_addresses.list(self.resource_group):
+                existing[pip.name] = pip
+        except CloudError as exc:
+            self.fail("Error listing public ips in resource group {0} - {1}".format(self.resource_group, str(exc)))
+
+        if self.state == 'absent':
+            to_delete = [name for name in self.names if name in existing]
+            self.results['changed'] = len(to_delete) > 0
+            self.results['state'] = dict(deleted=to_delete)
+            if to_delete and not self.check_mode:
+                outcomes = run_concurrently(self.delete_pip_by_name, to_delete, self.max_concurrency)
+                failed = dict((name, str(exc)) for name, (result, exc) in zip(to_delete, outcomes) if exc)
+                if failed:
+                    self.fail("Error deleting public ips {0}".format(', '.join(sorted(failed))), errors=failed)
+            return self.results
+
+        to_write = []
+        addresses = dict()
+        for name in self.names:
+            pip = existing.get(name)
+            if not pip:
+                self.log("CHANGED: pip {0} does not exist but requested state is 'present'".format(name))
+                params = self.network_models.PublicIPAddress(
+                    location=self.location,
+                    public_ip_allocation_method=self.allocation_method,
+                    tags=self.tags
+                )
+                to_write.append((name, params))
+                addresses[name] = None
+                continue
+            addresses[name] = pip.ip_address
+            update_tags, tags = self.update_tags(pip.tags)
+            if update_tags or pip.public_ip_allocation_method != self.allocation_method:
+                self.log("CHANGED: pip {0} allocation_method or tags".format(name))
+                pip.public_ip_allocation_method = self.allocation_method
+                pip.tags = tags
+                to_write.append((name, pip))
+
+        self.results['changed'] = len(to_write) > 0
+        if to_write and not self.check_mode:
+            outcomes = run_concurrently(lambda item: self.write_pip(*item), to_write, self.max_concurrency)
+            failed = dict()
+            for (name, params), (pip, exc) in zip(to_write, outcomes):
+                if exc:
+                    failed[name] = str(exc)
+                else:
+                    addresses[name] = pip.ip_address
+            if failed:
+                self.fail("Error creating or updating public ips {0}".format(', '.join(sorted(failed))),
+                          errors=failed, addresses=addresses)
+        self.results['addresses'] = addresses
+        return self.results
+
+    def write_pip(self, name, pip):
+        poller = self.network_client.public_ip_addresses.create_or_update(self.resource_group, name, pip)
+        return self.get_poller_result(poller)
+
+    def delete_pip_by_name(self, name):
+        poller = self.network_client.public_ip_addresses.delete(self.resource_group, name)
+        self.get_poller_result(poller)
+        return True
+
     def create_or_update_pip(self, pip):
         try:
             poller = self.network_client.public_ip_addresses.create_or_update(self.resource_group, self.name, pip)
@@ -36,6 +36,12 @@ options:
             - Limit results by providing a list of tags. Format tags as 'key' or 'key:value'.
         required: false
         default: null
+    fields:
+        description:
+            - Only return these fields of each object, given as dotted paths such as C(name) or C(tags).
+        required: false
+        default: null
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -110,7 +116,8 @@ class AzureRMResourceGroupFacts(AzureRMModuleBase):
 
         super(AzureRMResourceGroupFacts, self).__init__(self.module_arg_spec,
                                                         supports_tags=False,
-                                                        facts_module=True)
+                                                        facts_module=True,
+                                                        supports_fields=True)
 
     def exec_module(self, **kwargs):
 
@@ -117,6 +117,16 @@ options:
                   - Inbound
                   - Outbound
                 default: Inbound
+    rules_file:
+        description:
+            - Path of a YAML or CSV file with additional rules, merged with I(rules). Use it for large rule sets
+              generated from an inventory.
+            - A C(.csv) file needs a header row with the rule attribute names, e.g.
+              C(name,protocol,destination_port_range,source_address_prefix,access,priority,direction). Empty cells
+              use the defaults.
+            - Any other file is read as YAML holding a list of rules or a dict with a C(rules) key.
+            - Rules are matched by I(name); only added, changed and, with I(purge_rules), removed rules cause an update.
+        version_added: "2.7"
     state:
         description:
             - Assert the state of the security group. Set to 'present' to create or update a security group. Set to
@@ -181,6 +191,13 @@ EXAMPLES = '''
           testing: testing
           delete: on-exit
 
+# Manage a large rule set kept in a CSV file next to the playbook
+- azure_rm_securitygroup:
+      resource_group: mygroup
+      name: mysecgroup
+      purge_rules: yes
+      rules_file: "{{ playbook_dir }}/files/firewall_rules.csv"
+
 # Delete security group
 - azure_rm_securitygroup:
       resource_group: mygroup
@@ -189,6 +206,26 @@ EXAMPLES = '''
 '''
 
 RETURN = '''
+rule_changes:
+    description:
+        - Names of the rules added, updated and, when I(purge_rules) is set, removed by this task.
+    returned: when I(state=present)
+    type: dict
+    sample: {
+        "added": ["AllowSSHFromHome"],
+        "updated": ["AllowSSH"],
+        "removed": []
+    }
+default_rule_changes:
+    description:
+        - Names of the default rules added, updated and, when I(purge_default_rules) is set, removed by this task.
+    returned: when I(state=present)
+    type: dict
+    sample: {
+        "added": [],
+        "updated": [],
+        "removed": []
+    }
 state:
     description: Current state of the security group.
     returned: always
@@ -339,6 +376,14 @@ except ImportError:
     # This is handled in azure_rm_common
     pass
 
+import csv
+
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
 from ansible.module_utils.azure_rm_common import AzureRMModuleBase
 from ansible.module_utils.six import integer_types
 
@@ -401,36 +446,89 @@ def validate_rule(self, rule, rule_type=None):
         rule['destination_port_range'] = '*'
 
 
-def compare_rules(r, rule):
-    matched = False
-    changed = False
-    if r['name'] == rule['name']:
-        matched = True
-        if rule.get('description', None) != r['description']:
-            changed = True
-            r['description'] = rule['description']
-        if rule['protocol'] != r['protocol']:
-            changed = True
-            r['protocol'] = rule['protocol']
-        if str(rule['source_port_range']) != str(r['source_port_range']):
-            changed = True
-            r['source_port_range'] = str(rule['source_port_range'])
-        if str(rule['destination_port_range']) != str(r['destination_port_range']):
-            changed = True
-            r['destination_port_range'] = str(rule['destination_port_range'])
-        if rule['access'] != r['access']:
-            changed = True
-            r['access'] = rule['access']
-        if rule['priority'] != r['priority']:
-            changed = True
-            r['priority'] = rule['priority']
-        if rule['direction'] != r['direction']:
-            changed = True
-            r['direction'] = rule['direction']
-        if rule['source_address_prefix'] != str(r['source_address_prefix']):
-            changed = True
-            r['source_address_prefix'] = rule['source_address_prefix']
-    return matched, changed
+# Attributes that define a rule; two rules with the same name and the same values here are equal
+RULE_ATTRIBUTES = ('description', 'protocol', 'source_port_range', 'destination_port_range', 'source_address_prefix',
+                   'destination_address_prefix', 'access', 'priority', 'direction')
+
+
+def normalize_rule(rule):
+    '''
+    Return a canonical tuple of the attributes of a rule dict, so rules can be compared in one step.
+
+    :param rule: rule dict, either validated module input or the output of create_rule_dict_from_obj
+    :return: tuple
+    '''
+    return (
+        rule.get('description') or None,
+        rule.get('protocol'),
+        str(rule.get('source_port_range')),
+        str(rule.get('destination_port_range')),
+        str(rule.get('source_address_prefix')),
+        str(rule.get('destination_address_prefix')),
+        rule.get('access'),
+        int(rule['priority']) if rule.get('priority') is not None else None,
+        rule.get('direction'),
+    )
+
+
+def reconcile_rules(existing, desired, purge=False):
+    '''
+    Merge the desired rules into the existing ones. Rules are matched by name and compared by their
+    normalized tuple, so the cost grows linearly with the number of rules.
+
+    :param existing: list of rule dicts currently on the security group
+    :param desired: list of validated rule dicts
+    :param purge: drop existing rules that are not in desired
+    :return: tuple of the new list of rule dicts and a dict of added, updated and removed rule names
+    '''
+    changes = dict(added=[], updated=[], removed=[])
+    index = dict((rule['name'], rule) for rule in existing)
+    wanted = set()
+
+    for rule in desired:
+        wanted.add(rule['name'])
+        current = index.get(rule['name'])
+        if current is None:
+            changes['added'].append(rule['name'])
+        elif normalize_rule(current) != normalize_rule(rule):
+            changes['updated'].append(rule['name'])
+            for attribute in RULE_ATTRIBUTES:
+                current[attribute] = rule.get(attribute)
+            current['source_port_range'] = str(rule['source_port_range'])
+            current['destination_port_range'] = str(rule['destination_port_range'])
+
+    rules = []
+    for rule in existing:
+        if purge and rule['name'] not in wanted:
+            changes['removed'].append(rule['name'])
+        else:
+            rules.append(rule)
+    added = set(changes['added'])
+    rules.extend(rule for rule in desired if rule['name'] in added)
+    return rules, changes
+
+
+def load_rules_file(path):
+    '''
+    Read a list of rule dicts from a YAML or CSV file. A CSV file needs a header row naming the rule
+    attributes; empty cells fall back to the rule defaults. A YAML file holds a list of rules or a dict
+    with a 'rules' key.
+
+    :param path: path of the file
+    :return: list of rule dicts
+    '''
+    with open(path) as f:
+        if path.lower().endswith('.csv'):
+            return [dict((k.strip(), v.strip()) for k, v in row.items() if k and v and v.strip())
+                    for row in csv.DictReader(f)]
+        if not HAS_YAML:
+            raise Exception("PyYAML is required to read rules from {0}".format(path))
+        content = yaml.safe_load(f)
+    if isinstance(content, dict):
+        content = content.get('rules')
+    if not isinstance(content, list) or not all(isinstance(rule, dict) for rule in content):
+        raise Exception("expected a list of rules in {0}".format(path))
+    return content
 
 
 def create_rule_instance(self, rule):
@@ -524,6 +622,7 @@ class AzureRMSecurityGroup(AzureRMModuleBase):
             purge_rules=dict(type='bool', default=False),
             resource_group=dict(required=True, type='str'),
             rules=dict(type='list'),
+            rules_file=dict(type='path'),
             state=dict(type='str', default='present', choices=['present', 'absent']),
         )
 
@@ -534,6 +633,7 @@ class AzureRMSecurityGroup(AzureRMModuleBase):
         self.purge_rules = None
         self.resource_group = None
         self.rules = None
+        self.rules_file = None
         self.state = None
         self.tags = None
         self.client = None  # type: azure.mgmt.network.NetworkManagementClient
@@ -565,6 +665,12 @@ class AzureRMSecurityGroup(AzureRMModuleBase):
             # Set default location
             self.location = resource_group.location
 
+        if self.rules_file:
+            try:
+                self.rules = (self.rules or []) + load_rules_file(self.rules_file)
+            except Exception as exc:
+                self.fail("Error loading rules from {0} - {1}".format(self.rules_file, str(exc)))
+
         if self.rules:
             for rule in self.rules:
                 try:
@@ -579,6 +685,13 @@ class AzureRMSecurityGroup(AzureRMModuleBase):
                 except Exception as exc:
                     self.fail("Error validating default rule {0} - {1}".format(rule, str(exc)))
 
+        for rules, option in ((self.rules, 'rules'), (self.default_rules, 'default_rules')):
+            names = set()
+            for rule in rules or []:
+                if rule['name'] in names:
+                    self.fail("Rule name {0} appears more than once in {1}".format(rule['name'], option))
+                names.add(rule['name'])
+
         try:
             nsg = self.client.network_security_groups.get(self.resource_group, self.name)
             results = create_network_security_group_dict(nsg)
@@ -599,48 +712,16 @@ class AzureRMSecurityGroup(AzureRMModuleBase):
             # update the security group
             self.log("Update security group {0}".format(self.name))
 
-            if self.rules:
-                for rule in self.rules:
-                    rule_matched = False
-                    for r in results['rules']:
-                        match, changed = compare_rules(r, rule)
-                        if changed:
-                            changed = True
-                        if match:
-                            rule_matched = True
-
-                    if not rule_matched:
-                        changed = True
-                        results['rules'].append(rule)
-
-            if self.purge_rules:
-                new_rules = []
-                for rule in results['rules']:
-                    for r in self.rules:
-                        if rule['name'] == r['name']:
-                            new_rules.append(rule)
-                results['rules'] = new_rules
+            results['rules'], rule_changes = reconcile_rules(results['rules'], self.rules or [], self.purge_rules)
+            if any(rule_changes.values()):
+                changed = True
+            self.results['rule_changes'] = rule_changes
 
-            if self.default_rules:
-                for rule in self.default_rules:
-                    rule_matched = False
-                    for r in results['default_rules']:
-                        match, changed = compare_rules(r, rule)
-                        if changed:
-                            changed = True
-                        if match:
-                            rule_matched = True
-                    if not rule_matched:
-                        changed = True
-                        results['default_rules'].append(rule)
-
-            if self.purge_default_rules:
-                new_default_rules = []
-                for rule in results['default_rules']:
-                    for r in self.default_rules:
-                        if rule['name'] == r['name']:
-                            new_default_rules.append(rule)
-                results['default_rules'] = new_default_rules
+            results['default_rules'], default_rule_changes = reconcile_rules(results['default_rules'], self.default_rules or [],
+                                                                             self.purge_default_rules)
+            if any(default_rule_changes.values()):
+                changed = True
+            self.results['default_rule_changes'] = default_rule_changes
 
             update_tags, results['tags'] = self.update_tags(results['tags'])
             if update_tags:
@@ -668,6 +749,8 @@ class AzureRMSecurityGroup(AzureRMModuleBase):
                 results['rules'] = self.rules
             if self.default_rules:
                 results['default_rules'] = self.default_rules
+            self.results['rule_changes'] = dict(added=[r['name'] for r in results['rules']], updated=[], removed=[])
+            self.results['default_rule_changes'] = dict(added=[r['name'] for r in results['default_rules']], updated=[], removed=[])
             if self.tags:
                 results['tags'] = self.tags
 
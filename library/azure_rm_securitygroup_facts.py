@@ -24,6 +24,7 @@ short_description: Get security group facts.
 
 description:
     - Get facts for a specific security group or all security groups within a resource group.
+    - Evaluate whether network flows are allowed by the rules of the security groups.
 
 options:
     name:
@@ -34,12 +35,77 @@ options:
     resource_group:
         description:
             - Name of the resource group to use.
-        required: true
+            - Omit to get all security groups of the subscription. Required with I(name).
+        required: false
     tags:
         description:
             - Limit results by providing a list of tags. Format tags as 'key' or 'key:value'.
         required: false
         default: null
+    flows:
+        description:
+            - List of flows to evaluate against the security rules and default security rules of every security group
+              selected by I(name), I(resource_group) and I(tags).
+            - The rules of each group are compiled once into priority ordered port and address interval sets, so large
+              batches of flows are answered without further requests.
+            - The verdict of a group is the access of the highest priority rule covering the whole flow. Rules that
+              only name application security groups never match.
+            - When set, I(azure_securitygroups) is not returned.
+        required: false
+        default: null
+        version_added: "2.7"
+        suboptions:
+            direction:
+                description:
+                    - Direction of the flow.
+                choices:
+                    - Inbound
+                    - Outbound
+                default: Inbound
+            protocol:
+                description:
+                    - Protocol of the flow. C(*) only matches rules allowing any protocol.
+                choices:
+                    - Tcp
+                    - Udp
+                    - Icmp
+                    - '*'
+                default: Tcp
+            source_address:
+                description:
+                    - Source IPv4 address, CIDR block, service tag or C(*).
+                    - A CIDR block is covered by a rule only when the rule covers every address in it.
+                default: '*'
+            source_port:
+                description:
+                    - Source port, port range such as C(1000-2000), or C(*).
+                default: '*'
+            destination_address:
+                description:
+                    - Destination IPv4 address, CIDR block, service tag or C(*).
+                default: '*'
+            destination_port:
+                description:
+                    - Destination port, port range such as C(1000-2000), or C(*).
+                required: true
+            security_groups:
+                description:
+                    - Only evaluate the flow against these security groups, given as names or resource IDs.
+                    - For traffic to a network interface, list the groups of the interface and of its subnet.
+    service_tags:
+        description:
+            - Dict mapping service tags such as C(VirtualNetwork) to lists of CIDR blocks, used to match rules and
+              flows naming the tag against addresses.
+            - Unresolved service tags only match flows naming the same tag.
+        required: false
+        default: null
+        version_added: "2.7"
+    fields:
+        description:
+            - Only return these fields of each object, given as dotted paths such as C(name) or C(tags).
+        required: false
+        default: null
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -60,6 +126,23 @@ EXAMPLES = '''
       azure_rm_securitygroup_facts:
         resource_group: Testing
 
+    - name: Check HTTPS from the office network to a NIC and its subnet
+      azure_rm_securitygroup_facts:
+        flows:
+          - source_address: 10.1.0.0/16
+            destination_address: 10.0.1.4
+            destination_port: 443
+            security_groups:
+              - nic001
+              - subnet001
+        service_tags:
+          VirtualNetwork:
+            - 10.0.0.0/16
+      register: output
+
+    - debug:
+        msg: "{{ azure_securitygroup_flows[0].allowed }}"
+
 '''
 
 RETURN = '''
@@ -190,28 +273,280 @@ azure_securitygroups:
         "type": "Microsoft.Network/networkSecurityGroups"
     }]
 
+azure_securitygroup_flows:
+    description: List of the evaluated flows, in the order of I(flows).
+    returned: when I(flows) is set
+    type: list
+    contains:
+        allowed:
+            description: Whether every evaluated security group allows the whole flow.
+            type: bool
+        results:
+            description:
+                - Verdict of every evaluated security group, with the deciding rule.
+                - I(partial_rules) lists higher priority rules with the opposite access that cover part of the flow,
+                  so the verdict does not hold for all of it.
+            type: list
+    example: [{
+        "direction": "Inbound",
+        "protocol": "Tcp",
+        "source_address": "10.1.0.0/16",
+        "source_port": "*",
+        "destination_address": "10.0.1.4",
+        "destination_port": "443",
+        "allowed": true,
+        "results": [{
+            "security_group": "nic001",
+            "id": "/subscriptions/XXXXXXX-XXXX-XXXX-XXXX-XXXXXXXXXX/resourceGroups/Testing/providers/Microsoft.Network/networkSecurityGroups/nic001",
+            "access": "Allow",
+            "rule": "HTTPS",
+            "priority": 100,
+            "partial_rules": []
+        }]
+    }]
+
 '''  # NOQA
 
+from bisect import bisect_right
+from collections import defaultdict
+
 try:
     from msrestazure.azure_exceptions import CloudError
 except:
     # This is handled in azure_rm_common
     pass
 
-from ansible.module_utils.azure_rm_common import AzureRMModuleBase
+from ansible.module_utils.azure_rm_common import AzureRMModuleBase, cidr_to_range
+from ansible.module_utils.six import string_types
 
 
 AZURE_OBJECT_CLASS = 'NetworkSecurityGroup'
 
+ADDRESS_SPACE = (0, 0xffffffff)
+PORT_SPACE = (0, 65535)
+
+
+def merge_ranges(ranges):
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return merged
+
+
+def parse_port_range(value):
+    '''
+    :return: (first, last) port
+    :raises ValueError: for anything but a port, a port range or *
+    '''
+    value = str(value).strip()
+    if value == '*':
+        return PORT_SPACE
+    try:
+        first, last = [int(port) for port in value.split('-', 1)] if '-' in value else (int(value), int(value))
+    except ValueError:
+        raise ValueError("{0} is not a port or port range".format(value))
+    if not PORT_SPACE[0] <= first <= last <= PORT_SPACE[1]:
+        raise ValueError("{0} is not a port or port range".format(value))
+    return first, last
+
+
+def parse_address(value, service_tags):
+    '''
+    Split an address prefix into address ranges and lowercase service tags.
+
+    :return: tuple of a list of (first, last) addresses and a list of tags
+    '''
+    value = value.strip()
+    if value == '*':
+        return [ADDRESS_SPACE], ['*']
+    if value.lower() in service_tags:
+        return [cidr_to_range(cidr) for cidr in service_tags[value.lower()]], [value.lower()]
+    try:
+        return [cidr_to_range(value if '/' in value else value + '/32')], []
+    except ValueError:
+        return [], [value.lower()]
+
+
+def rule_values(rule, single, multiple):
+    values = list(getattr(rule, multiple, None) or [])
+    if getattr(rule, single, None):
+        values.append(getattr(rule, single))
+    return values
+
+
+class IntervalIndex(object):
+    '''
+    Rule bitmasks of the elementary segments of an integer space. Bit i of a mask stands for the rule with the i-th
+    highest precedence.
+    '''
+
+    def __init__(self, rule_ranges, space):
+        toggles = defaultdict(int)
+        toggles[space[0]] = 0
+        for bit, ranges in rule_ranges:
+            # merged ranges are disjoint, so toggling at both ends marks exactly the covered segments
+            for first, last in merge_ranges(ranges):
+                toggles[first] ^= bit
+                toggles[last + 1] ^= bit
+        self.starts = sorted(toggles)
+        self.masks = []
+        mask = 0
+        for start in self.starts:
+            mask ^= toggles[start]
+            self.masks.append(mask)
+
+    def match(self, first, last):
+        '''
+        :return: masks of the rules covering all of [first, last] and of the rules covering any of it
+        '''
+        start = bisect_right(self.starts, first) - 1
+        end = bisect_right(self.starts, last)
+        full = self.masks[start]
+        partial = 0
+        for mask in self.masks[start:end]:
+            full &= mask
+            partial |= mask
+        return full, partial
+
+
+class AddressMatcher(object):
+
+    def __init__(self, rule_prefixes, service_tags):
+        rule_ranges = []
+        self.tags = defaultdict(int)
+        for bit, prefixes in rule_prefixes:
+            ranges = []
+            for prefix in prefixes:
+                prefix_ranges, tags = parse_address(prefix, service_tags)
+                ranges.extend(prefix_ranges)
+                for tag in tags:
+                    self.tags[tag] |= bit
+            rule_ranges.append((bit, ranges))
+        self.index = IntervalIndex(rule_ranges, ADDRESS_SPACE)
+
+    def match(self, ranges, tags):
+        if not ranges:
+            # an unresolved tag only matches rules naming it or any address
+            mask = self.tags['*'] | self.tags[tags[0]]
+            return mask, mask
+        full, partial = -1, 0
+        for first, last in ranges:
+            range_full, range_partial = self.index.match(first, last)
+            full &= range_full
+            partial |= range_partial
+        for tag in tags:
+            # a resolved tag also matches rules naming the tag
+            full |= self.tags[tag]
+            partial |= self.tags[tag]
+        return full, partial
+
+
+class CompiledRules(object):
+    '''
+    The rules of one direction of a security group, ordered by priority and compiled into one matcher per flow field.
+    '''
+
+    def __init__(self, rules, service_tags):
+        self.rules = sorted(rules, key=lambda rule: rule.priority)
+        bits = [1 << i for i in range(len(self.rules))]
+        self.protocols = defaultdict(int)
+        for bit, rule in zip(bits, self.rules):
+            self.protocols[(rule.protocol or '*').lower()] |= bit
+        self.source_addresses = AddressMatcher([(bit, rule_values(rule, 'source_address_prefix', 'source_address_prefixes'))
+                                                for bit, rule in zip(bits, self.rules)], service_tags)
+        self.destination_addresses = AddressMatcher([(bit, rule_values(rule, 'destination_address_prefix',
+                                                                       'destination_address_prefixes'))
+                                                     for bit, rule in zip(bits, self.rules)], service_tags)
+        self.source_ports = IntervalIndex([(bit, [parse_port_range(port) for port in
+                                                  rule_values(rule, 'source_port_range', 'source_port_ranges')])
+                                           for bit, rule in zip(bits, self.rules)], PORT_SPACE)
+        self.destination_ports = IntervalIndex([(bit, [parse_port_range(port) for port in
+                                                       rule_values(rule, 'destination_port_range', 'destination_port_ranges')])
+                                                for bit, rule in zip(bits, self.rules)], PORT_SPACE)
+
+    def evaluate(self, flow):
+        '''
+        :param flow: flow from compile_flow
+        :return: the deciding rule or None, and the higher priority rules of opposite access covering part of the flow
+        '''
+        if flow['protocol'] == '*':
+            full, partial = self.protocols['*'], (1 << len(self.rules)) - 1
+        else:
+            full = partial = self.protocols['*'] | self.protocols[flow['protocol']]
+        for field_full, field_partial in (self.source_addresses.match(*flow['source_address']),
+                                          self.source_ports.match(*flow['source_port']),
+                                          self.destination_addresses.match(*flow['destination_address']),
+                                          self.destination_ports.match(*flow['destination_port'])):
+            full &= field_full
+            partial &= field_partial
+        if not full:
+            return None, []
+        lowest = full & -full
+        decision = self.rules[lowest.bit_length() - 1]
+        partial &= lowest - 1
+        partial_rules = [rule for i, rule in enumerate(self.rules) if partial >> i & 1 and rule.access != decision.access]
+        return decision, partial_rules
+
+
+class CompiledSecurityGroup(object):
+
+    def __init__(self, group, service_tags):
+        self.name = group.name
+        self.id = group.id
+        rules = list(group.security_rules or []) + list(group.default_security_rules or [])
+        self.directions = dict((direction, CompiledRules([rule for rule in rules if rule.direction == direction], service_tags))
+                               for direction in ('Inbound', 'Outbound'))
+
+    def evaluate(self, flow):
+        decision, partial_rules = self.directions[flow['direction']].evaluate(flow)
+        return dict(
+            security_group=self.name,
+            id=self.id,
+            access=decision.access if decision else None,
+            rule=decision.name if decision else None,
+            priority=decision.priority if decision else None,
+            partial_rules=[rule.name for rule in partial_rules]
+        )
+
+
+def compile_flow(flow, service_tags):
+    '''
+    Parse the addresses and ports of a flow.
+
+    :raises ValueError: for an invalid port or CIDR block
+    '''
+    compiled = dict(direction=flow['direction'], protocol=flow['protocol'].lower())
+    for key in ('source_address', 'destination_address'):
+        ranges, tags = parse_address(str(flow[key]), service_tags)
+        compiled[key] = (ranges, tags)
+    for key in ('source_port', 'destination_port'):
+        compiled[key] = parse_port_range(flow[key])
+    return compiled
+
 
 class AzureRMSecurityGroupFacts(AzureRMModuleBase):
 
     def __init__(self):
 
+        flow_spec = dict(
+            direction=dict(type='str', choices=['Inbound', 'Outbound'], default='Inbound'),
+            protocol=dict(type='str', choices=['Tcp', 'Udp', 'Icmp', '*'], default='Tcp'),
+            source_address=dict(type='str', default='*'),
+            source_port=dict(type='str', default='*'),
+            destination_address=dict(type='str', default='*'),
+            destination_port=dict(type='str', required=True),
+            security_groups=dict(type='list')
+        )
+
         self.module_arg_spec = dict(
             name=dict(type='str'),
-            resource_group=dict(required=True, type='str'),
+            resource_group=dict(type='str'),
             tags=dict(type='list'),
+            flows=dict(type='list', elements='dict', options=flow_spec),
+            service_tags=dict(type='dict')
         )
 
         self.results = dict(
@@ -222,16 +557,24 @@ class AzureRMSecurityGroupFacts(AzureRMModuleBase):
         self.name = None
         self.resource_group = None
         self.tags = None
+        self.flows = None
+        self.service_tags = None
 
         super(AzureRMSecurityGroupFacts, self).__init__(self.module_arg_spec,
                                                         supports_tags=False,
-                                                        facts_module=True)
+                                                        facts_module=True,
+                                                        supports_fields=True)
 
     def exec_module(self, **kwargs):
         for key in self.module_arg_spec:
             setattr(self, key, kwargs[key])
 
-        if self.name is not None:
+        if self.name is not None and self.resource_group is None:
+            self.fail("Parameter error: resource_group is required when name is set.")
+
+        if self.flows:
+            self.results['ansible_facts']['azure_securitygroup_flows'] = self.evaluate_flows()
+        elif self.name is not None:
             self.results['ansible_facts']['azure_securitygroups'] = self.get_item()
         else:
             self.results['ansible_facts']['azure_securitygroups'] = self.list_items()
@@ -258,7 +601,10 @@ class AzureRMSecurityGroupFacts(AzureRMModuleBase):
     def list_items(self):
         self.log('List all items')
         try:
-            response = self.network_client.network_security_groups.list(self.resource_group)
+            if self.resource_group:
+                response = self.network_client.network_security_groups.list(self.resource_group)
+            else:
+                response = self.network_client.network_security_groups.list_all()
         except Exception as exc:
             self.fail("Error listing all items - {0}".format(str(exc)))
 
@@ -270,6 +616,53 @@ class AzureRMSecurityGroupFacts(AzureRMModuleBase):
                 results.append(grp)
         return results
 
+    def get_groups(self):
+        if self.name is not None:
+            try:
+                groups = [self.network_client.network_security_groups.get(self.resource_group, self.name)]
+            except CloudError:
+                groups = []
+        else:
+            try:
+                if self.resource_group:
+                    groups = list(self.network_client.network_security_groups.list(self.resource_group))
+                else:
+                    groups = list(self.network_client.network_security_groups.list_all())
+            except Exception as exc:
+                self.fail("Error listing all items - {0}".format(str(exc)))
+        return [group for group in groups if self.has_tags(group.tags, self.tags)]
+
+    def evaluate_flows(self):
+        service_tags = dict((tag.lower(), cidrs if not isinstance(cidrs, string_types) else [cidrs])
+                            for tag, cidrs in (self.service_tags or dict()).items())
+        try:
+            compiled_flows = [compile_flow(flow, service_tags) for flow in self.flows]
+            groups = [CompiledSecurityGroup(group, service_tags) for group in self.get_groups()]
+        except ValueError as exc:
+            self.fail("Error evaluating flows - {0}".format(str(exc)))
+
+        by_key = dict()
+        for group in groups:
+            by_key[group.name.lower()] = group
+            by_key[group.id.lower()] = group
+
+        results = []
+        for flow, compiled in zip(self.flows, compiled_flows):
+            if flow['security_groups']:
+                selected = [by_key.get(str(key).lower()) for key in flow['security_groups']]
+                missing = [key for key, group in zip(flow['security_groups'], selected) if group is None]
+                if missing:
+                    self.fail("Error evaluating flows - security groups {0} not found".format(', '.join(missing)))
+            else:
+                selected = groups
+            result = dict(flow)
+            result.pop('security_groups')
+            result['results'] = [group.evaluate(compiled) for group in selected]
+            result['allowed'] = bool(selected) and all(item['access'] == 'Allow' and not item['partial_rules']
+                                                       for item in result['results'])
+            results.append(result)
+        return results
+
 
 def main():
     AzureRMSecurityGroupFacts()
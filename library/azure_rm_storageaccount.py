@@ -445,7 +445,7 @@ class AzureRMStorageAccount(AzureRMModuleBase):
         self.log('Checking for existing blob containers')
         blob_service = self.get_blob_client(self.resource_group, self.name)
         try:
-            response = blob_service.list_containers()
+            response = blob_service.list_containers(num_results=1)
         except AzureMissingResourceHttpError:
             # No blob storage available?
             return False
@@ -133,6 +133,41 @@ options:
         choices:
             - container
             - blob
+    sparse:
+        description:
+            - Upload only the non-zero parts of I(src) to a page blob, for example a fixed size VHD.
+            - The file is memory mapped and scanned in 4 MB pages. Pages holding only zeros are skipped, since a new
+              page blob reads as zeros, and the other pages are written concurrently.
+            - Requires I(blob_type=page). The size of I(src) must be a multiple of 512 bytes.
+        type: bool
+        default: false
+        version_added: "2.7"
+    max_concurrency:
+        description:
+            - Maximum number of pages written at the same time with I(sparse).
+        type: int
+        default: 8
+        version_added: "2.7"
+    compress:
+        description:
+            - Compress I(src) while uploading it to a block blob, without a temporary file.
+            - Sets the content-encoding header to C(gzip) and, unless I(content_type) is given, the content-type header
+              to the type guessed from the file name.
+        choices:
+            - gzip
+        version_added: "2.7"
+    copy_source:
+        description:
+            - List of blobs to copy into I(container) on the server side, so the data never passes through the Ansible
+              host. Mutually exclusive with I(src) and I(dest).
+            - Give each source as a blob URL, which must be readable by the storage service, or as a dict with
+              I(storage_account_name), I(container), I(blob) and optionally I(resource_group). A read only SAS token
+              valid for 24 hours is then generated from the keys of the source storage account.
+            - With a single source, I(blob) names the copy and defaults to the source blob name. With several sources,
+              every copy keeps the name of its source blob and I(blob) cannot be used.
+            - Existing blobs are only replaced with I(force). The task waits until every copy has completed.
+        type: list
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -162,6 +197,39 @@ EXAMPLES = '''
     public_access: container
     content_type: 'application/image'
 
+- name: Upload a compressed stylesheet
+  azure_rm_storageblob:
+    resource_group: Testing
+    storage_account_name: clh0002
+    container: '$web'
+    blob: css/site.css
+    src: ./dist/css/site.css
+    compress: gzip
+    cache_control: 'public, max-age=86400'
+    force: yes
+
+- name: Upload a VHD, skipping its empty pages
+  azure_rm_storageblob:
+    resource_group: Testing
+    storage_account_name: clh0002
+    container: vhds
+    blob: image.vhd
+    src: ./image.vhd
+    blob_type: page
+    sparse: yes
+
+- name: Copy blobs from another storage account
+  azure_rm_storageblob:
+    resource_group: Testing
+    storage_account_name: clh0002
+    container: backup
+    copy_source:
+      - storage_account_name: clh0001
+        resource_group: Production
+        container: vhds
+        blob: image.vhd
+      - https://clh0001.blob.core.windows.net/public/graylog.png
+
 - name: Download the file
   azure_rm_storageblob:
     resource_group: Testing
@@ -191,6 +259,37 @@ blob:
         "tags": {},
         "type": "BlockBlob"
     }
+bytes_uploaded:
+    description: Number of bytes written by a I(sparse) upload.
+    returned: when a blob is uploaded with I(sparse)
+    type: int
+    sample: 1572864000
+bytes_skipped:
+    description: Number of zero bytes a I(sparse) upload did not transfer.
+    returned: when a blob is uploaded with I(sparse)
+    type: int
+    sample: 135367393792
+original_size:
+    description: Size of I(src) in bytes.
+    returned: when a blob is uploaded with I(compress)
+    type: int
+    sample: 184320
+compressed_size:
+    description: Size of the uploaded blob in bytes.
+    returned: when a blob is uploaded with I(compress)
+    type: int
+    sample: 31744
+copies:
+    description: Completed copies, in the order of I(copy_source).
+    returned: when I(copy_source) is set
+    type: list
+    sample: [{
+        "source": "https://clh0001.blob.core.windows.net/vhds/image.vhd",
+        "blob": "image.vhd",
+        "copy_id": "8fb3e7a9-7cad-4a30-8f3b-8bdb3e2fe4d4",
+        "status": "success",
+        "seconds": 41.3
+    }]
 container:
     description: Facts about the current state of the selected container.
     returned: always
@@ -202,16 +301,54 @@ container:
     }
 '''
 
+import mimetypes
+import mmap
 import os
+import time
+import zlib
+from datetime import datetime, timedelta
 
 try:
-    from azure.storage.blob.models import ContentSettings
+    from azure.storage.blob.models import BlobBlock, BlobPermissions, ContentSettings
+    from azure.storage.cloudstorageaccount import CloudStorageAccount
     from azure.common import AzureMissingResourceHttpError, AzureHttpError
 except ImportError:
     # This is handled in azure_rm_common
     pass
 
-from ansible.module_utils.azure_rm_common import AzureRMModuleBase
+from ansible.module_utils.azure_rm_common import AzureRMModuleBase, run_concurrently
+from ansible.module_utils.six import string_types
+from ansible.module_utils.six.moves.urllib.parse import unquote, urlparse
+
+
+# Largest range a single Put Page request may write
+PAGE_RANGE_SIZE = 4 * 1024 * 1024
+PAGE_SIZE = 512
+
+ZERO_RANGE = b'\0' * PAGE_RANGE_SIZE
+
+# Size of the blocks of a compressed upload
+COMPRESSED_BLOCK_SIZE = 4 * 1024 * 1024
+# gzip container rather than a raw zlib stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# Copies between accounts run asynchronously, so the source SAS must outlive large copies
+COPY_SAS_HOURS = 24
+COPY_POLL_MAX_DELAY = 30
+
+
+def nonzero_ranges(data, size):
+    '''
+    Yield the (start, end) offsets, end inclusive, of the PAGE_RANGE_SIZE aligned ranges of data that are not all
+    zeros. Each range is compared with a block of zeros, a single memcmp.
+
+    :param data: bytes or mmap
+    :param size: length of data
+    '''
+    for start in range(0, size, PAGE_RANGE_SIZE):
+        end = min(start + PAGE_RANGE_SIZE, size)
+        if data[start:end] != ZERO_RANGE[:end - start]:
+            yield start, end - 1
 
 
 class AzureRMStorageBlob(AzureRMModuleBase):
@@ -235,9 +372,13 @@ class AzureRMStorageBlob(AzureRMModuleBase):
             content_disposition=dict(type='str'),
             cache_control=dict(type='str'),
             content_md5=dict(type='str'),
+            sparse=dict(type='bool', default=False),
+            max_concurrency=dict(type='int', default=8),
+            copy_source=dict(type='list'),
+            compress=dict(type='str', choices=['gzip']),
         )
 
-        mutually_exclusive = [('src', 'dest')]
+        mutually_exclusive = [('src', 'dest'), ('src', 'copy_source'), ('dest', 'copy_source'), ('sparse', 'compress')]
 
         self.blob_client = None
         self.blob_details = None
@@ -254,6 +395,10 @@ class AzureRMStorageBlob(AzureRMModuleBase):
         self.state = None
         self.tags = None
         self.public_access = None
+        self.sparse = None
+        self.max_concurrency = None
+        self.copy_source = None
+        self.compress = None
         self.results = dict(
             changed=False,
             actions=[],
@@ -274,6 +419,23 @@ class AzureRMStorageBlob(AzureRMModuleBase):
         self.results['check_mode'] = self.check_mode
 
         # add file path validation
+        if self.sparse and self.blob_type != 'page':
+            self.fail("Parameter error: sparse requires blob_type page.")
+        if self.max_concurrency < 1:
+            self.fail("Parameter error: max_concurrency must be at least 1")
+        if self.compress:
+            if self.blob_type != 'block':
+                self.fail("Parameter error: compress requires blob_type block.")
+            if self.content_encoding and self.content_encoding != self.compress:
+                self.fail("Parameter error: content_encoding must be {0} or unset with compress.".format(self.compress))
+            # also compared with the settings of an existing blob
+            self.content_encoding = self.compress
+            if self.src and not self.content_type:
+                self.content_type = mimetypes.guess_type(self.src)[0] or 'application/octet-stream'
+
+        copy_sources = self.parse_copy_sources() if self.copy_source else None
+        if copy_sources and len(copy_sources) == 1 and not self.blob:
+            self.blob = copy_sources[0]['blob']
 
         self.blob_client = self.get_blob_client(self.resource_group, self.storage_account_name, self.blob_type)
         self.container_obj = self.get_container()
@@ -291,6 +453,9 @@ class AzureRMStorageBlob(AzureRMModuleBase):
                 if update_tags:
                     self.update_container_tags(self.container_obj['tags'])
 
+            if copy_sources:
+                self.copy_blobs(copy_sources)
+
             if self.blob:
                 # create, update or download blob
                 if self.src and self.src_is_valid():
@@ -402,8 +567,13 @@ class AzureRMStorageBlob(AzureRMModuleBase):
             )
         if not self.check_mode:
             try:
-                self.blob_client.create_blob_from_path(self.container, self.blob, self.src,
-                                                       metadata=self.tags, content_settings=content_settings)
+                if self.sparse:
+                    self.upload_sparse_page_blob(content_settings)
+                elif self.compress:
+                    self.upload_compressed_blob(content_settings)
+                else:
+                    self.blob_client.create_blob_from_path(self.container, self.blob, self.src,
+                                                           metadata=self.tags, content_settings=content_settings)
             except AzureHttpError as exc:
                 self.fail("Error creating blob {0} - {1}".format(self.blob, str(exc)))
 
@@ -413,6 +583,175 @@ class AzureRMStorageBlob(AzureRMModuleBase):
         self.results['container'] = self.container_obj
         self.results['blob'] = self.blob_obj
 
+    def upload_compressed_blob(self, content_settings):
+        '''
+        Stream src through a gzip compressor into blocks of COMPRESSED_BLOCK_SIZE bytes. Output that fits in one block
+        is uploaded with a single request.
+        '''
+        compressor = zlib.compressobj(9, zlib.DEFLATED, GZIP_WBITS)
+        pending = []
+        pending_size = 0
+        block_ids = []
+        original_size = 0
+        compressed_size = 0
+        with open(self.src, 'rb') as f:
+            while True:
+                chunk = f.read(COMPRESSED_BLOCK_SIZE)
+                original_size += len(chunk)
+                data = compressor.compress(chunk) if chunk else compressor.flush()
+                pending.append(data)
+                pending_size += len(data)
+                while pending_size >= COMPRESSED_BLOCK_SIZE or (not chunk and pending_size and block_ids):
+                    buffered = b''.join(pending)
+                    block, rest = buffered[:COMPRESSED_BLOCK_SIZE], buffered[COMPRESSED_BLOCK_SIZE:]
+                    block_ids.append('{0:08d}'.format(len(block_ids)))
+                    self.blob_client.put_block(self.container, self.blob, block, block_ids[-1])
+                    compressed_size += len(block)
+                    pending, pending_size = [rest], len(rest)
+                if not chunk:
+                    break
+
+        if block_ids:
+            self.blob_client.put_block_list(self.container, self.blob, [BlobBlock(id=block_id) for block_id in block_ids],
+                                            content_settings=content_settings, metadata=self.tags)
+        else:
+            data = b''.join(pending)
+            compressed_size = len(data)
+            self.blob_client.create_blob_from_bytes(self.container, self.blob, data,
+                                                    content_settings=content_settings, metadata=self.tags)
+        self.results['original_size'] = original_size
+        self.results['compressed_size'] = compressed_size
+
+    def upload_sparse_page_blob(self, content_settings):
+        size = os.path.getsize(self.src)
+        if size % PAGE_SIZE:
+            self.fail("Error creating blob {0} - the size of a page blob must be a multiple of {1} bytes, "
+                      "{2} is {3} bytes".format(self.blob, PAGE_SIZE, self.src, size))
+
+        self.blob_client.create_blob(self.container, self.blob, size,
+                                     content_settings=content_settings, metadata=self.tags)
+        uploaded = 0
+        if size:
+            with open(self.src, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    ranges = list(nonzero_ranges(data, size))
+                    self.log("Uploading {0} of {1} pages of {2}".format(len(ranges), (size - 1) // PAGE_RANGE_SIZE + 1,
+                                                                         self.src))
+                    outcomes = run_concurrently(lambda r: self.blob_client.update_page(self.container, self.blob,
+                                                                                      data[r[0]:r[1] + 1], r[0], r[1]),
+                                                ranges, self.max_concurrency)
+                finally:
+                    data.close()
+            for (start, end), (result, exc) in zip(ranges, outcomes):
+                if exc:
+                    self.fail("Error uploading bytes {0}-{1} of blob {2} - {3}".format(start, end, self.blob, str(exc)))
+                uploaded += end - start + 1
+        self.results['bytes_uploaded'] = uploaded
+        self.results['bytes_skipped'] = size - uploaded
+
+    def parse_copy_sources(self):
+        '''
+        Turn copy_source into dicts holding the source URL, the URL to copy from and the name of the copy.
+        '''
+        if len(self.copy_source) > 1 and self.blob:
+            self.fail("Parameter error: blob cannot be used with more than one copy_source.")
+        sources = []
+        for item in self.copy_source:
+            if isinstance(item, string_types):
+                parts = urlparse(item)
+                path = parts.path.lstrip('/').split('/', 1)
+                if parts.scheme not in ('http', 'https') or len(path) != 2 or not path[1]:
+                    self.fail("Parameter error: copy_source {0} is not a blob URL.".format(item))
+                sources.append(dict(source=item.split('?')[0], url=item, blob=unquote(path[1])))
+                continue
+
+            if not isinstance(item, dict) or not all(item.get(key) for key in ('storage_account_name', 'container', 'blob')):
+                self.fail("Parameter error: copy_source entries must be blob URLs or dicts with storage_account_name, "
+                          "container and blob.")
+            account = item['storage_account_name']
+            resource_group = item.get('resource_group') or self.resource_group
+            client = CloudStorageAccount(account, self.get_storage_account_key(resource_group, account)).create_block_blob_service()
+            sas = client.generate_blob_shared_access_signature(item['container'], item['blob'],
+                                                               permission=BlobPermissions.READ,
+                                                               expiry=datetime.utcnow() + timedelta(hours=COPY_SAS_HOURS))
+            sources.append(dict(source=client.make_blob_url(item['container'], item['blob']),
+                                url=client.make_blob_url(item['container'], item['blob'], sas_token=sas),
+                                blob=item['blob']))
+
+        names = [source['blob'] for source in sources]
+        if len(set(names)) != len(names):
+            self.fail("Parameter error: the blobs copied by copy_source must have distinct names.")
+        return sources
+
+    def copy_blobs(self, sources):
+        '''
+        Start a server side copy for every source whose target does not exist yet, or every source with force, then
+        poll the pending copies together with a growing delay.
+        '''
+        if len(sources) == 1:
+            sources[0]['blob'] = self.blob
+            existing = [sources[0]['blob']] if self.blob_obj else []
+        else:
+            try:
+                existing = [blob.name for blob in self.blob_client.list_blobs(self.container)] if self.container_obj else []
+            except AzureHttpError as exc:
+                self.fail("Error listing blobs in {0} - {1}".format(self.container, str(exc)))
+        if not self.force:
+            skipped = [source['blob'] for source in sources if source['blob'] in existing]
+            if skipped:
+                self.log("Cannot copy to {0}. Blobs with those names already exist. "
+                         "Use the force option".format(', '.join(skipped)))
+            sources = [source for source in sources if source['blob'] not in existing]
+        if not sources:
+            return
+
+        self.results['changed'] = True
+        copies = []
+        if not self.check_mode:
+            pending = []
+            for source in sources:
+                started = time.time()
+                try:
+                    properties = self.blob_client.copy_blob(self.container, source['blob'], source['url'], metadata=self.tags)
+                except AzureHttpError as exc:
+                    self.fail("Error copying {0} to blob {1} - {2}".format(source['source'], source['blob'], str(exc)))
+                copy = dict(source=source['source'], blob=source['blob'], copy_id=properties.id, status=properties.status,
+                            seconds=round(time.time() - started, 1))
+                copies.append(copy)
+                if properties.status == 'pending':
+                    pending.append((copy, started))
+
+            delay = 1
+            while pending:
+                time.sleep(delay)
+                delay = min(delay * 2, COPY_POLL_MAX_DELAY)
+                still_pending = []
+                for copy, started in pending:
+                    try:
+                        status = self.blob_client.get_blob_properties(self.container, copy['blob']).properties.copy
+                    except AzureHttpError as exc:
+                        self.fail("Error getting copy status of blob {0} - {1}".format(copy['blob'], str(exc)))
+                    copy['status'] = status.status
+                    copy['seconds'] = round(time.time() - started, 1)
+                    if status.status == 'pending':
+                        still_pending.append((copy, started))
+                    elif status.status != 'success':
+                        self.fail("Error copying {0} to blob {1} - copy {2}: {3}".format(copy['source'], copy['blob'],
+                                                                                         status.status,
+                                                                                         status.status_description),
+                                  copies=copies)
+                pending = still_pending
+        else:
+            copies = [dict(source=source['source'], blob=source['blob']) for source in sources]
+
+        self.results['actions'].append('copied {0} blobs'.format(len(copies)))
+        self.results['copies'] = copies
+        self.results['container'] = self.container_obj
+        if len(copies) == 1:
+            self.blob_obj = self.get_blob()
+            self.results['blob'] = self.blob_obj
+
     def download_blob(self):
         if not self.check_mode:
             try:
@@ -485,7 +824,7 @@ class AzureRMStorageBlob(AzureRMModuleBase):
 
     def container_has_blobs(self):
         try:
-            list_generator = self.blob_client.list_blobs(self.container)
+            list_generator = self.blob_client.list_blobs(self.container, num_results=1)
         except AzureHttpError as exc:
             self.fail("Error list blobs in {0} - {1}".format(self.container, str(exc)))
         if len(list_generator.items) > 0:
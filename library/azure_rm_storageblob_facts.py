@@ -0,0 +1,283 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2018 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+
+DOCUMENTATION = '''
+---
+module: azure_rm_storageblob_facts
+
+version_added: "2.7"
+
+short_description: Get blob container and blob facts.
+
+description:
+    - List the blob containers of a storage account, or the blobs of a container.
+    - Results are fetched lazily page by page, so large containers can be written to a local file with I(dest)
+      without holding them in memory.
+
+options:
+    resource_group:
+        description:
+            - Name of the resource group of the storage account.
+        required: true
+        aliases:
+            - resource_group_name
+    storage_account_name:
+        description:
+            - Name of the storage account.
+        required: true
+        aliases:
+            - account_name
+            - storage_account
+    container:
+        description:
+            - List the blobs of this container. Omit to list the containers of the account.
+        aliases:
+            - container_name
+    prefix:
+        description:
+            - Only list containers or blobs whose name starts with this prefix.
+    delimiter:
+        description:
+            - List the blobs of one level of a virtual directory hierarchy. Names containing the delimiter after
+              I(prefix) are rolled up into a single entry of type C(prefix), as in a directory listing.
+    num_results:
+        description:
+            - Maximum number of containers or blobs to list. When more exist, I(next_marker) is returned.
+    marker:
+        description:
+            - Continue a listing from the I(next_marker) returned by an earlier task.
+    include_metadata:
+        description:
+            - Include the metadata of every container or blob as I(tags).
+        type: bool
+        default: false
+    dest:
+        description:
+            - Write the containers or blobs to this local file, one JSON object per line, instead of returning them.
+            - The file is replaced when the listing completes.
+        type: path
+
+extends_documentation_fragment:
+    - azure
+
+author:
+    - "Zim Kalinowski (@zikalino)"
+
+'''
+
+EXAMPLES = '''
+    - name: Get facts for all containers of an account
+      azure_rm_storageblob_facts:
+        resource_group: Testing
+        storage_account_name: clh0002
+
+    - name: Get facts for the top level of a container
+      azure_rm_storageblob_facts:
+        resource_group: Testing
+        storage_account_name: clh0002
+        container: logs
+        prefix: 2018/
+        delimiter: /
+
+    - name: Write an inventory of a large container to a file
+      azure_rm_storageblob_facts:
+        resource_group: Testing
+        storage_account_name: clh0002
+        container: vhds
+        include_metadata: yes
+        dest: /tmp/vhds.jsonl
+'''
+
+RETURN = '''
+azure_storagecontainers:
+    description: List of container dicts.
+    returned: when I(container) is not set and I(dest) is not set
+    type: list
+    example: [{
+        "name": "foo",
+        "last_modified": "09-Mar-2016 19:28:26 +0000",
+        "public_access": null,
+        "tags": {}
+    }]
+azure_storageblobs:
+    description: List of blob dicts. Virtual directories rolled up by I(delimiter) have type C(prefix).
+    returned: when I(container) is set and I(dest) is not set
+    type: list
+    example: [{
+        "name": "graylog.png",
+        "type": "BlockBlob",
+        "content_length": 136532,
+        "content_type": "application/image",
+        "etag": "0x8D5A6A3C2C6E2C5",
+        "last_modified": "09-Mar-2016 22:08:25 +0000"
+    }]
+count:
+    description: Number of containers or blobs listed.
+    returned: always
+    type: int
+    sample: 1
+next_marker:
+    description: Marker to continue the listing with, when I(num_results) stopped it early.
+    returned: always
+    type: str
+    sample: null
+'''
+
+import json
+import os
+import tempfile
+
+try:
+    from azure.common import AzureMissingResourceHttpError, AzureHttpError
+    from azure.storage.blob.models import BlobPrefix, Include
+except ImportError:
+    # This is handled in azure_rm_common
+    pass
+
+from ansible.module_utils.azure_rm_common import AzureRMModuleBase
+
+
+def format_time(value):
+    return value.strftime('%d-%b-%Y %H:%M:%S %z') if value else None
+
+
+def container_to_dict(container, include_metadata):
+    result = dict(
+        name=container.name,
+        last_modified=format_time(container.properties.last_modified),
+        public_access=getattr(container.properties, 'public_access', None)
+    )
+    if include_metadata:
+        result['tags'] = container.metadata
+    return result
+
+
+def blob_to_dict(blob, include_metadata):
+    if isinstance(blob, BlobPrefix):
+        return dict(name=blob.name, type='prefix')
+    result = dict(
+        name=blob.name,
+        type=blob.properties.blob_type,
+        content_length=blob.properties.content_length,
+        content_type=blob.properties.content_settings.content_type,
+        etag=blob.properties.etag,
+        last_modified=format_time(blob.properties.last_modified)
+    )
+    if include_metadata:
+        result['tags'] = blob.metadata
+    return result
+
+
+class AzureRMStorageBlobFacts(AzureRMModuleBase):
+
+    def __init__(self):
+
+        self.module_arg_spec = dict(
+            resource_group=dict(required=True, type='str', aliases=['resource_group_name']),
+            storage_account_name=dict(required=True, type='str', aliases=['account_name', 'storage_account']),
+            container=dict(type='str', aliases=['container_name']),
+            prefix=dict(type='str'),
+            delimiter=dict(type='str'),
+            num_results=dict(type='int'),
+            marker=dict(type='str'),
+            include_metadata=dict(type='bool', default=False),
+            dest=dict(type='path'),
+        )
+
+        self.results = dict(
+            changed=False,
+            ansible_facts=dict()
+        )
+
+        self.resource_group = None
+        self.storage_account_name = None
+        self.container = None
+        self.prefix = None
+        self.delimiter = None
+        self.num_results = None
+        self.marker = None
+        self.include_metadata = None
+        self.dest = None
+
+        super(AzureRMStorageBlobFacts, self).__init__(self.module_arg_spec,
+                                                      supports_tags=False,
+                                                      facts_module=True)
+
+    def exec_module(self, **kwargs):
+
+        for key in self.module_arg_spec:
+            setattr(self, key, kwargs[key])
+
+        if self.delimiter and not self.container:
+            self.fail("Parameter error: delimiter requires container.")
+        if self.num_results is not None and self.num_results < 1:
+            self.fail("Parameter error: num_results must be at least 1.")
+
+        blob_client = self.get_blob_client(self.resource_group, self.storage_account_name)
+        try:
+            if self.container:
+                fact = 'azure_storageblobs'
+                include = Include(metadata=True) if self.include_metadata else None
+                items = blob_client.list_blobs(self.container, prefix=self.prefix, num_results=self.num_results,
+                                               include=include, delimiter=self.delimiter, marker=self.marker)
+                to_dict = blob_to_dict
+            else:
+                fact = 'azure_storagecontainers'
+                items = blob_client.list_containers(prefix=self.prefix, num_results=self.num_results,
+                                                    include_metadata=self.include_metadata, marker=self.marker)
+                to_dict = container_to_dict
+
+            if self.dest:
+                count = self.write_items(items, to_dict)
+            else:
+                self.results['ansible_facts'][fact] = [to_dict(item, self.include_metadata) for item in items]
+                count = len(self.results['ansible_facts'][fact])
+        except AzureMissingResourceHttpError:
+            self.fail("Container {0} not found in storage account {1}".format(self.container, self.storage_account_name))
+        except AzureHttpError as exc:
+            self.fail("Error listing {0} - {1}".format(self.container or self.storage_account_name, str(exc)))
+        except (IOError, OSError) as exc:
+            self.fail("Error writing {0} - {1}".format(self.dest, str(exc)))
+
+        self.results['count'] = count
+        self.results['next_marker'] = items.next_marker or None
+        return self.results
+
+    def write_items(self, items, to_dict):
+        '''
+        Write one JSON line per item as the pages arrive, then move the file to dest.
+        '''
+        directory = os.path.dirname(os.path.abspath(self.dest))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        count = 0
+        try:
+            with os.fdopen(fd, 'w') as f:
+                for item in items:
+                    f.write(json.dumps(to_dict(item, self.include_metadata)) + '\n')
+                    count += 1
+            os.rename(tmp_path, self.dest)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return count
+
+
+def main():
+    AzureRMStorageBlobFacts()
+
+
+if __name__ == '__main__':
+    main()
@@ -599,8 +599,13 @@ azure_vm:
 '''  # NOQA
 
 import base64
+import hashlib
+import json
+import os
 import random
 import re
+import tempfile
+import time
 
 try:
     from msrestazure.azure_exceptions import CloudError
@@ -610,13 +615,17 @@ except ImportError:
     pass
 
 from ansible.module_utils.basic import to_native, to_bytes
-from ansible.module_utils.azure_rm_common import AzureRMModuleBase, azure_id_to_dict
+from ansible.module_utils.azure_rm_common import AzureRMModuleBase, azure_id_to_dict, run_concurrently
 
 
 AZURE_OBJECT_CLASS = 'VirtualMachine'
 
 AZURE_ENUM_MODULES = ['azure.mgmt.compute.models']
 
+DEFAULT_SUBNET_CACHE_DIR_ENV = 'AZURE_RM_DEFAULT_NETWORK_CACHE_DIR'
+DEFAULT_SUBNET_CACHE_TTL_ENV = 'AZURE_RM_DEFAULT_NETWORK_TTL'
+DEFAULT_SUBNET_CACHE_TTL = 300
+
 
 def extract_names_from_blob_uri(blob_uri, storage_suffix):
     # HACK: ditch this once python SDK supports get by URI
@@ -1573,21 +1582,6 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
         '''
 
         network_interface_name = self.name + '01'
-        nic = None
-
-        self.log("Create default NIC {0}".format(network_interface_name))
-        self.log("Check to see if NIC {0} exists".format(network_interface_name))
-        try:
-            nic = self.network_client.network_interfaces.get(self.resource_group, network_interface_name)
-        except CloudError:
-            pass
-
-        if nic:
-            self.log("NIC {0} found.".format(network_interface_name))
-            self.check_provisioning_state(nic)
-            return nic
-
-        self.log("NIC {0} does not exist.".format(network_interface_name))
 
         virtual_network_resource_group = None
         if self.virtual_network_resource_group:
@@ -1595,68 +1589,61 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
         else:
             virtual_network_resource_group = self.resource_group
 
-        if self.virtual_network_name:
-            try:
-                self.network_client.virtual_networks.list(virtual_network_resource_group, self.virtual_network_name)
-                virtual_network_name = self.virtual_network_name
-            except CloudError as exc:
-                self.fail("Error: fetching virtual network {0} - {1}".format(self.virtual_network_name, str(exc)))
-
-        else:
-            # Find a virtual network
-            no_vnets_msg = "Error: unable to find virtual network in resource group {0}. A virtual network " \
-                           "with at least one subnet must exist in order to create a NIC for the virtual " \
-                           "machine.".format(virtual_network_resource_group)
-
-            virtual_network_name = None
-            try:
-                vnets = self.network_client.virtual_networks.list(virtual_network_resource_group)
-            except CloudError:
-                self.log('cloud error!')
-                self.fail(no_vnets_msg)
-
-            for vnet in vnets:
-                virtual_network_name = vnet.name
-                self.log('vnet name: {0}'.format(vnet.name))
-                break
-
-            if not virtual_network_name:
-                self.fail(no_vnets_msg)
-
-        if self.subnet_name:
-            try:
-                subnet = self.network_client.subnets.get(virtual_network_resource_group, virtual_network_name, self.subnet_name)
-                subnet_id = subnet.id
-            except Exception as exc:
-                self.fail("Error: fetching subnet {0} - {1}".format(self.subnet_name, str(exc)))
-        else:
-            no_subnets_msg = "Error: unable to find a subnet in virtual network {0}. A virtual network " \
-                             "with at least one subnet must exist in order to create a NIC for the virtual " \
-                             "machine.".format(virtual_network_name)
-
+        # the NIC, the default public IP and security group and the default subnet are independent lookups
+        cache_key = '/'.join([self.subscription_id, virtual_network_resource_group, self.virtual_network_name or '',
+                              self.subnet_name or '']).lower()
+        subnet_id = default_subnet_cache_get(cache_key)
+        if subnet_id and not subnet_id.lower().startswith('/subscriptions/{0}/resourcegroups/{1}/'.format(
+                self.subscription_id, virtual_network_resource_group).lower()):
             subnet_id = None
-            try:
-                subnets = self.network_client.subnets.list(virtual_network_resource_group, virtual_network_name)
-            except CloudError:
-                self.fail(no_subnets_msg)
+        # create the client before the lookups share it
+        network_client = self.network_client
+        lookups = dict(
+            nic=lambda: self.get_optional(network_client.network_interfaces.get, self.resource_group, network_interface_name),
+            nsg=lambda: self.get_optional(network_client.network_security_groups.get, self.resource_group, network_interface_name),
+        )
+        if self.public_ip_allocation_method != 'Disabled':
+            lookups['pip'] = lambda: self.get_optional(network_client.public_ip_addresses.get, self.resource_group, network_interface_name)
+        if not subnet_id:
+            lookups['subnet'] = lambda: self.find_default_subnet(virtual_network_resource_group)
+        self.log("Create default NIC {0}".format(network_interface_name))
+        names = sorted(lookups)
+        outcomes = dict(zip(names, run_concurrently(lambda name: lookups[name](), names, len(names))))
+        for name, kind in [('nic', 'network interface'), ('pip', 'public IP address'), ('nsg', 'security group')]:
+            if name in outcomes and outcomes[name][1]:
+                self.fail("Error fetching {0} {1} - {2}".format(kind, network_interface_name, str(outcomes[name][1])))
 
-            for subnet in subnets:
-                subnet_id = subnet.id
-                self.log('subnet id: {0}'.format(subnet_id))
-                break
+        nic = outcomes['nic'][0]
+        if nic:
+            self.log("NIC {0} found.".format(network_interface_name))
+            self.check_provisioning_state(nic)
+            return nic
+
+        self.log("NIC {0} does not exist.".format(network_interface_name))
 
-            if not subnet_id:
-                self.fail(no_subnets_msg)
+        if not subnet_id:
+            subnet_id, exc = outcomes['subnet']
+            if exc:
+                self.fail(str(exc))
+            default_subnet_cache_set(cache_key, subnet_id)
 
         if self.public_ip_allocation_method != 'Disabled':
-            self.results['actions'].append('Created default public IP {0}'.format(self.name + '01'))
-            pip = self.create_default_pip(self.resource_group, self.location, self.name + '01', self.public_ip_allocation_method)
+            self.results['actions'].append('Created default public IP {0}'.format(network_interface_name))
+            pip = outcomes['pip'][0]
+            if pip:
+                self.check_provisioning_state(pip)
+            else:
+                pip = self.create_default_pip(self.resource_group, self.location, network_interface_name, self.public_ip_allocation_method)
         else:
             pip = None
 
-        self.results['actions'].append('Created default security group {0}'.format(self.name + '01'))
-        group = self.create_default_securitygroup(self.resource_group, self.location, self.name + '01', self.os_type,
-                                                  self.open_ports)
+        self.results['actions'].append('Created default security group {0}'.format(network_interface_name))
+        group = outcomes['nsg'][0]
+        if group:
+            self.check_provisioning_state(group)
+        else:
+            group = self.create_default_securitygroup(self.resource_group, self.location, network_interface_name, self.os_type,
+                                                      self.open_ports)
 
         parameters = self.network_models.NetworkInterface(
             location=self.location,
@@ -1684,9 +1671,110 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
                                                                              parameters)
             new_nic = self.get_poller_result(poller)
         except Exception as exc:
+            # the cached default subnet may be gone, look it up again next time
+            default_subnet_cache_set(cache_key, None)
             self.fail("Error creating network interface {0} - {1}".format(network_interface_name, str(exc)))
         return new_nic
 
+    def get_optional(self, get, *args):
+        '''
+        Get a resource, or None if it does not exist. Other errors are raised.
+        '''
+        try:
+            return get(*args)
+        except CloudError as exc:
+            if exc.status_code == 404:
+                return None
+            raise
+
+    def find_default_subnet(self, virtual_network_resource_group):
+        '''
+        Find the subnet for a default NIC: the given or first virtual network and its given or first subnet.
+        Runs off the main thread, so errors are raised rather than passed to fail().
+
+        :return: subnet id
+        '''
+        if self.virtual_network_name:
+            virtual_network_name = self.virtual_network_name
+        else:
+            # Find a virtual network
+            no_vnets_msg = "Error: unable to find virtual network in resource group {0}. A virtual network " \
+                           "with at least one subnet must exist in order to create a NIC for the virtual " \
+                           "machine.".format(virtual_network_resource_group)
+            try:
+                vnet = next(iter(self.network_client.virtual_networks.list(virtual_network_resource_group)), None)
+            except CloudError:
+                raise Exception(no_vnets_msg)
+            if not vnet:
+                raise Exception(no_vnets_msg)
+            virtual_network_name = vnet.name
+            self.log('vnet name: {0}'.format(vnet.name))
+
+        if self.subnet_name:
+            try:
+                return self.network_client.subnets.get(virtual_network_resource_group, virtual_network_name, self.subnet_name).id
+            except Exception as exc:
+                raise Exception("Error: fetching subnet {0} - {1}".format(self.subnet_name, str(exc)))
+
+        no_subnets_msg = "Error: unable to find a subnet in virtual network {0}. A virtual network " \
+                         "with at least one subnet must exist in order to create a NIC for the virtual " \
+                         "machine.".format(virtual_network_name)
+        try:
+            subnet = next(iter(self.network_client.subnets.list(virtual_network_resource_group, virtual_network_name)), None)
+        except CloudError:
+            raise Exception(no_subnets_msg)
+        if not subnet:
+            raise Exception(no_subnets_msg)
+        self.log('subnet id: {0}'.format(subnet.id))
+        return subnet.id
+
+
+def default_subnet_cache_path(key):
+    '''
+    :return: path of the cache entry, or None when AZURE_RM_DEFAULT_NETWORK_CACHE_DIR is not set
+    '''
+    directory = os.environ.get(DEFAULT_SUBNET_CACHE_DIR_ENV)
+    if not directory:
+        return None
+    return os.path.join(os.path.expanduser(directory),
+                        'azure-default-subnet-{0}.json'.format(hashlib.sha1(key.encode('utf-8')).hexdigest()))
+
+
+def default_subnet_cache_get(key):
+    '''
+    Return the subnet a default NIC used recently for the same resource group and network options, so a play creating
+    many VMs discovers the default network once. The cache is off unless AZURE_RM_DEFAULT_NETWORK_CACHE_DIR is set.
+    '''
+    path = default_subnet_cache_path(key)
+    if not path:
+        return None
+    ttl = int(os.environ.get(DEFAULT_SUBNET_CACHE_TTL_ENV, DEFAULT_SUBNET_CACHE_TTL))
+    try:
+        if ttl <= 0 or time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path) as f:
+            return json.load(f).get('subnet_id')
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def default_subnet_cache_set(key, subnet_id):
+    path = default_subnet_cache_path(key)
+    if not path:
+        return
+    try:
+        if subnet_id is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(dict(subnet_id=subnet_id), f)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        # the cache only saves lookups
+        pass
+
 
 def main():
     AzureRMVirtualMachine()
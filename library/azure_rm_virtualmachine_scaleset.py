@@ -55,6 +55,8 @@ options:
     capacity:
         description:
             - Capacity of VMSS.
+            - When only the capacity of an existing scale set changes, only its SKU is patched; the image, size,
+              network and load balancer are not looked up again.
         required: true
     tier:
         description:
@@ -176,6 +178,61 @@ options:
             - "It can be 'all' or a list with any of the following: ['network_interfaces', 'virtual_storage', 'public_ips']."
             - Any other input will be ignored.
         default: ['all']
+    instance_action:
+        description:
+            - Run this operation on the instances of an existing scale set, with one scale set level request per batch.
+            - The operation runs before the model is updated. C(delete) lowers the capacity of the scale set by the
+              number of deleted instances, so set I(capacity) to the capacity expected afterwards.
+        choices:
+            - restart
+            - start
+            - power_off
+            - deallocate
+            - reimage
+            - delete
+        version_added: "2.7"
+    instance_ids:
+        description:
+            - Instance ids to run I(instance_action) on. Defaults to all instances of the scale set.
+            - Required when I(instance_action=delete).
+        version_added: "2.7"
+    rolling_upgrade:
+        description:
+            - Upgrade the instances that do not run the latest model of the scale set, after the model is updated, in
+              batches with I(update_instances). Use with I(upgrade_policy=Manual).
+            - After every batch the instance views of the scale set are polled, with one request per poll, until the
+              instances of the batch run and report healthy. The upgrade stops when more upgraded instances are
+              unhealthy than I(max_unhealthy_percent) allows.
+            - A changed I(image) also updates the model. An image whose version is C(latest) is only compared by
+              publisher, offer and sku.
+        type: dict
+        version_added: "2.7"
+        suboptions:
+            batch_size:
+                description:
+                    - Number of instances upgraded at a time. Overrides I(batch_percent).
+            batch_percent:
+                description:
+                    - Percentage of the instances of the scale set upgraded at a time, at least one.
+                default: 20
+            pause_seconds:
+                description:
+                    - Seconds to wait between a healthy batch and the next one.
+                default: 0
+            health_timeout:
+                description:
+                    - Seconds to wait for the instances of a batch to become healthy. Instances still not healthy then
+                      are counted as unhealthy.
+                default: 600
+            max_unhealthy_percent:
+                description:
+                    - Percentage of the upgraded instances allowed to end up unhealthy before the upgrade is aborted.
+                default: 0
+    instance_batch_size:
+        description:
+            - Run I(instance_action) on this many instances at a time, waiting for each batch to complete before
+              starting the next one. By default all instances are handled by a single request.
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -239,6 +296,39 @@ EXAMPLES = '''
     image:
       name: customimage001
       resource_group: Testing
+
+- name: Restart all instances of a VMSS, five at a time
+  azure_rm_virtualmachine_scaleset:
+    resource_group: Testing
+    name: testvmss
+    vm_size: Standard_DS1_v2
+    capacity: 10
+    instance_action: restart
+    instance_batch_size: 5
+
+- name: Remove two instances from a VMSS
+  azure_rm_virtualmachine_scaleset:
+    resource_group: Testing
+    name: testvmss
+    vm_size: Standard_DS1_v2
+    capacity: 8
+    instance_action: delete
+    instance_ids:
+      - "3"
+      - "7"
+
+- name: Move a VMSS to a new image, 10 percent of the instances at a time
+  azure_rm_virtualmachine_scaleset:
+    resource_group: Testing
+    name: testvmss
+    vm_size: Standard_DS1_v2
+    capacity: 800
+    upgrade_policy: Manual
+    image: customimage002
+    rolling_upgrade:
+      batch_percent: 10
+      pause_seconds: 60
+      max_unhealthy_percent: 5
 '''
 
 RETURN = '''
@@ -331,10 +421,26 @@ azure_vmss:
         "tags": null,
         "type": "Microsoft.Compute/virtualMachineScaleSets"
     }
+instance_batches:
+    description: Instance ids of every batch I(instance_action) ran on, in order. C(*) stands for all instances.
+    returned: when I(instance_action) is set
+    type: list
+    sample: [["0", "1"], ["2", "3"]]
+upgrade_batches:
+    description: Instance ids of every batch upgraded to the latest model, in order.
+    returned: when I(rolling_upgrade) is set
+    type: list
+    sample: [["0", "1"], ["2", "3"]]
+unhealthy_instances:
+    description: Upgraded instances that were not healthy when their batch completed.
+    returned: when I(rolling_upgrade) is set
+    type: list
+    sample: ["3"]
 '''  # NOQA
 
 import random
 import re
+import time
 
 try:
     from msrestazure.azure_exceptions import CloudError
@@ -351,6 +457,45 @@ AZURE_OBJECT_CLASS = 'VirtualMachineScaleSet'
 
 AZURE_ENUM_MODULES = ['azure.mgmt.compute.models']
 
+# instance_action choices and the scale set operations taking a list of instance ids
+INSTANCE_ACTIONS = dict(
+    restart='restart',
+    start='start',
+    power_off='power_off',
+    deallocate='deallocate',
+    reimage='reimage',
+    delete='delete_instances',
+)
+
+rolling_upgrade_spec = dict(
+    batch_size=dict(type='int'),
+    batch_percent=dict(type='int', default=20),
+    pause_seconds=dict(type='int', default=0),
+    health_timeout=dict(type='int', default=600),
+    max_unhealthy_percent=dict(type='int', default=0)
+)
+
+# seconds between two listings of the instance views while a batch becomes healthy
+UPGRADE_POLL_INTERVAL = 15
+
+
+def instance_health(vm):
+    '''
+    :return: 'healthy', 'failed' when the instance will not recover by itself, or 'pending'
+    '''
+    if vm.provisioning_state == 'Failed':
+        return 'failed'
+    view = vm.instance_view
+    if vm.provisioning_state != 'Succeeded' or not view:
+        return 'pending'
+    if 'PowerState/running' not in [status.code for status in view.statuses or []]:
+        return 'pending'
+    # reported by the application health extension, when installed
+    vm_health = getattr(view, 'vm_health', None)
+    if vm_health and vm_health.status and vm_health.status.code != 'HealthState/healthy':
+        return 'pending'
+    return 'healthy'
+
 
 class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
 
@@ -380,6 +525,10 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
             load_balancer=dict(type='str'),
             virtual_network_name=dict(type='str', aliases=['virtual_network']),
             remove_on_absent=dict(type='list', default=['all']),
+            instance_action=dict(type='str', choices=list(INSTANCE_ACTIONS)),
+            instance_ids=dict(type='list', elements='str'),
+            instance_batch_size=dict(type='int'),
+            rolling_upgrade=dict(type='dict', options=rolling_upgrade_spec),
         )
 
         self.resource_group = None
@@ -405,6 +554,10 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
         self.tags = None
         self.differences = None
         self.load_balancer = None
+        self.instance_action = None
+        self.instance_ids = None
+        self.instance_batch_size = None
+        self.rolling_upgrade = None
 
         self.results = dict(
             changed=False,
@@ -433,21 +586,29 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
         virtual_network = None
         subnet = None
         image_reference = None
-        custom_image = False
 
         resource_group = self.get_resource_group(self.resource_group)
         if not self.location:
             # Set default location
             self.location = resource_group.location
 
+        if self.instance_action and self.state != 'present':
+            self.fail("Parameter error: instance_action requires state 'present'.")
+        if self.instance_action == 'delete' and not self.instance_ids:
+            self.fail("Parameter error: instance_ids required when instance_action is 'delete'.")
+        if self.instance_batch_size is not None and self.instance_batch_size < 1:
+            self.fail("Parameter error: instance_batch_size must be at least 1.")
+        if self.rolling_upgrade:
+            if self.rolling_upgrade['batch_size'] is not None and self.rolling_upgrade['batch_size'] < 1:
+                self.fail("Parameter error: rolling_upgrade batch_size must be at least 1.")
+            if not 1 <= self.rolling_upgrade['batch_percent'] <= 100:
+                self.fail("Parameter error: rolling_upgrade batch_percent must be between 1 and 100.")
+            if not 0 <= self.rolling_upgrade['max_unhealthy_percent'] <= 100:
+                self.fail("Parameter error: rolling_upgrade max_unhealthy_percent must be between 0 and 100.")
+
         if self.state == 'present':
             # Verify parameters and resolve any defaults
 
-            if self.vm_size and not self.vm_size_is_valid():
-                self.fail("Parameter error: vm_size {0} is not valid for your subscription and location.".format(
-                    self.vm_size
-                ))
-
             # if self.virtual_network_name:
             #     virtual_network = self.get_virtual_network(self.virtual_network_name)
 
@@ -460,32 +621,6 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
                     if not key.get('path') or not key.get('key_data'):
                         self.fail(msg)
 
-            if self.image and isinstance(self.image, dict):
-                if all(key in self.image for key in ('publisher', 'offer', 'sku', 'version')):
-                    marketplace_image = self.get_marketplace_image_version()
-                    if self.image['version'] == 'latest':
-                        self.image['version'] = marketplace_image.name
-                        self.log("Using image version {0}".format(self.image['version']))
-
-                    image_reference = self.compute_models.ImageReference(
-                        publisher=self.image['publisher'],
-                        offer=self.image['offer'],
-                        sku=self.image['sku'],
-                        version=self.image['version']
-                    )
-                elif self.image.get('name'):
-                    custom_image = True
-                    image_reference = self.get_custom_image_reference(
-                        self.image.get('name'),
-                        self.image.get('resource_group'))
-                else:
-                    self.fail("parameter error: expecting image to contain [publisher, offer, sku, version] or [name, resource_group]")
-            elif self.image and isinstance(self.image, str):
-                custom_image = True
-                image_reference = self.get_custom_image_reference(self.image)
-            elif self.image:
-                self.fail("parameter error: expecting image to be a string or dict not {0}".format(type(self.image).__name__))
-
             disable_ssh_password = not self.ssh_password_enabled
 
         try:
@@ -505,13 +640,28 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
                     changed = True
                     vmss_dict['properties']['virtualMachineProfile']['storageProfile']['osDisk']['caching'] = self.os_disk_caching
 
+                if self.instance_action:
+                    self.log('CHANGED: virtual machine scale set {0} - Instance action'.format(self.name))
+                    changed = True
+
+                # deleted instances no longer count towards the capacity
+                capacity = vmss_dict['sku']['capacity']
+                if self.instance_action == 'delete':
+                    capacity -= len(self.instance_ids)
+
                 if self.capacity and \
-                   self.capacity != vmss_dict['sku']['capacity']:
+                   self.capacity != capacity:
                     self.log('CHANGED: virtual machine scale set {0} - Capacity'.format(self.name))
                     differences.append('Capacity')
                     changed = True
                     vmss_dict['sku']['capacity'] = self.capacity
 
+                if self.rolling_upgrade and self.image and \
+                   self.image_differs(vmss_dict['properties']['virtualMachineProfile']['storageProfile']['imageReference']):
+                    self.log('CHANGED: virtual machine scale set {0} - Image'.format(self.name))
+                    differences.append('Image')
+                    changed = True
+
                 if self.data_disks and \
                    len(self.data_disks) != len(vmss_dict['properties']['virtualMachineProfile']['storageProfile']['dataDisks']):
                     self.log('CHANGED: virtual machine scale set {0} - Data Disks'.format(self.name))
@@ -525,6 +675,11 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
 
                 self.differences = differences
 
+                if self.rolling_upgrade and not changed and \
+                   any(vm.latest_model_applied is False for vm in self.list_instances()):
+                    self.log('CHANGED: virtual machine scale set {0} - Instances not on the latest model'.format(self.name))
+                    changed = True
+
             elif self.state == 'absent':
                 self.log("CHANGED: virtual machine scale set {0} exists and requested state is 'absent'".format(self.name))
                 results = dict()
@@ -536,6 +691,18 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
                 self.log("CHANGED: virtual machine scale set {0} does not exist but state is 'present'.".format(self.name))
                 changed = True
 
+        if self.state == 'present' and not vmss:
+            # an existing scale set keeps its size and image, so only a new one needs them resolved
+            if self.instance_action:
+                self.fail("Parameter error: instance_action requires an existing virtual machine scale set.")
+
+            if self.vm_size and not self.vm_size_is_valid():
+                self.fail("Parameter error: vm_size {0} is not valid for your subscription and location.".format(
+                    self.vm_size
+                ))
+
+            image_reference = self.resolve_image_reference()
+
         self.results['changed'] = changed
         self.results['ansible_facts']['azure_vmss'] = results
 
@@ -544,6 +711,10 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
 
         if changed:
             if self.state == 'present':
+                updated_vmss = None
+                if self.instance_action:
+                    self.run_instance_action()
+
                 if not vmss:
                     # Create the VMSS
                     self.log("Create virtual machine scale set {0}".format(self.name))
@@ -670,6 +841,11 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
                     self.log("Create virtual machine with parameters:")
                     self.create_or_update_vmss(vmss_resource)
 
+                elif self.differences == ['Capacity']:
+                    self.log("Update capacity of virtual machine scale set {0}".format(self.name))
+                    self.results['actions'].append('Updated VMSS {0} capacity'.format(self.name))
+                    updated_vmss = self.update_capacity(vmss)
+
                 elif self.differences and len(self.differences) > 0:
                     self.log("Update virtual machine scale set {0}".format(self.name))
                     self.results['actions'].append('Updated VMSS {0}'.format(self.name))
@@ -678,23 +854,30 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
                     vmss_resource.virtual_machine_profile.storage_profile.os_disk.caching = self.os_disk_caching
                     vmss_resource.sku.capacity = self.capacity
 
-                    data_disks = []
-                    for data_disk in self.data_disks:
-                        data_disks.append(self.compute_models.VirtualMachineScaleSetDataDisk(
-                            lun=data_disk['lun'],
-                            caching=data_disk['caching'],
-                            create_option=self.compute_models.DiskCreateOptionTypes.empty,
-                            disk_size_gb=data_disk['disk_size_gb'],
-                            managed_disk=self.compute_models.VirtualMachineScaleSetManagedDiskParameters(
-                                storage_account_type=data_disk['managed_disk_type']
-                            ),
-                        ))
-                    vmss_resource.virtual_machine_profile.storage_profile.data_disks = data_disks
+                    if 'Image' in self.differences:
+                        vmss_resource.virtual_machine_profile.storage_profile.image_reference = self.resolve_image_reference()
+
+                    if self.data_disks:
+                        data_disks = []
+                        for data_disk in self.data_disks:
+                            data_disks.append(self.compute_models.VirtualMachineScaleSetDataDisk(
+                                lun=data_disk['lun'],
+                                caching=data_disk['caching'],
+                                create_option=self.compute_models.DiskCreateOptionTypes.empty,
+                                disk_size_gb=data_disk['disk_size_gb'],
+                                managed_disk=self.compute_models.VirtualMachineScaleSetManagedDiskParameters(
+                                    storage_account_type=data_disk['managed_disk_type']
+                                ),
+                            ))
+                        vmss_resource.virtual_machine_profile.storage_profile.data_disks = data_disks
 
                     self.log("Update virtual machine with parameters:")
                     self.create_or_update_vmss(vmss_resource)
 
-                self.results['ansible_facts']['azure_vmss'] = self.serialize_vmss(self.get_vmss())
+                if self.rolling_upgrade and vmss:
+                    self.upgrade_instances()
+
+                self.results['ansible_facts']['azure_vmss'] = self.serialize_vmss(updated_vmss or self.get_vmss())
 
             elif self.state == 'absent':
                 # delete the VM
@@ -773,6 +956,120 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
 
         return True
 
+    def resolve_image_reference(self):
+        '''
+        Resolve the image option, including a 'latest' marketplace version.
+
+        :return: ImageReference object, or None when no image is set
+        '''
+        if self.image and isinstance(self.image, dict):
+            if all(key in self.image for key in ('publisher', 'offer', 'sku', 'version')):
+                marketplace_image = self.get_marketplace_image_version()
+                if self.image['version'] == 'latest':
+                    self.image['version'] = marketplace_image.name
+                    self.log("Using image version {0}".format(self.image['version']))
+
+                return self.compute_models.ImageReference(
+                    publisher=self.image['publisher'],
+                    offer=self.image['offer'],
+                    sku=self.image['sku'],
+                    version=self.image['version']
+                )
+            elif self.image.get('name'):
+                return self.get_custom_image_reference(
+                    self.image.get('name'),
+                    self.image.get('resource_group'))
+            else:
+                self.fail("parameter error: expecting image to contain [publisher, offer, sku, version] or [name, resource_group]")
+        elif self.image and isinstance(self.image, str):
+            return self.get_custom_image_reference(self.image)
+        elif self.image:
+            self.fail("parameter error: expecting image to be a string or dict not {0}".format(type(self.image).__name__))
+        return None
+
+    def image_differs(self, current):
+        '''
+        Compare the image option with the image reference of the model without looking the image up, so a
+        'latest' marketplace version matches any version.
+
+        :param current: serialized image reference of the scale set model
+        :return: boolean
+        '''
+        current = current or dict()
+        if isinstance(self.image, dict) and all(key in self.image for key in ('publisher', 'offer', 'sku', 'version')):
+            keys = ['publisher', 'offer', 'sku']
+            if self.image['version'] != 'latest':
+                keys.append('version')
+            return any((current.get(key) or '').lower() != self.image[key].lower() for key in keys)
+        name = self.image.get('name') if isinstance(self.image, dict) else self.image
+        return (current.get('id') or '').split('/')[-1].lower() != (name or '').lower()
+
+    def list_instances(self, instance_view=False):
+        '''
+        List the instances of the scale set, with their instance views if instance_view is set, in one request.
+
+        :return: list of VirtualMachineScaleSetVM objects
+        '''
+        expand = 'instanceView' if instance_view else None
+        try:
+            return list(self.compute_client.virtual_machine_scale_set_vms.list(self.resource_group, self.name,
+                                                                               expand=expand))
+        except CloudError as exc:
+            self.fail("Error listing instances of virtual machine scale set {0} - {1}".format(self.name, str(exc)))
+
+    def wait_for_healthy(self, instance_ids, timeout):
+        '''
+        Poll the instance views until the instances are healthy, one of them failed or the timeout passed.
+
+        :return: set of the instance ids that are not healthy
+        '''
+        deadline = time.time() + timeout
+        pending = set(instance_ids)
+        while True:
+            states = dict((vm.instance_id, instance_health(vm)) for vm in self.list_instances(instance_view=True)
+                          if vm.instance_id in pending)
+            failed = set(instance_id for instance_id, state in states.items() if state == 'failed')
+            pending = set(instance_id for instance_id, state in states.items() if state == 'pending')
+            if not pending or time.time() >= deadline:
+                return failed | pending
+            time.sleep(max(0, min(UPGRADE_POLL_INTERVAL, deadline - time.time())))
+
+    def upgrade_instances(self):
+        '''
+        Bring the instances that do not run the latest model up to date in batches, waiting for every batch to
+        become healthy before the next one.
+        '''
+        spec = self.rolling_upgrade
+        instances = self.list_instances()
+        outdated = [vm.instance_id for vm in instances if vm.latest_model_applied is False]
+        batch_size = spec['batch_size'] or max(1, len(instances) * spec['batch_percent'] // 100)
+        max_unhealthy = len(outdated) * spec['max_unhealthy_percent'] // 100
+
+        batches = []
+        unhealthy = set()
+        for i in range(0, len(outdated), batch_size):
+            if batches and spec['pause_seconds']:
+                time.sleep(spec['pause_seconds'])
+            batch = outdated[i:i + batch_size]
+            self.log("Upgrading instances {0} of virtual machine scale set {1}".format(', '.join(batch), self.name))
+            try:
+                poller = self.compute_client.virtual_machine_scale_sets.update_instances(self.resource_group, self.name, batch)
+                self.get_poller_result(poller)
+            except CloudError as exc:
+                self.fail("Error upgrading instances {0} of virtual machine scale set {1} - {2}".format(
+                    ', '.join(batch), self.name, str(exc)), upgrade_batches=batches, unhealthy_instances=sorted(unhealthy))
+            batches.append(batch)
+
+            unhealthy |= self.wait_for_healthy(batch, spec['health_timeout'])
+            if len(unhealthy) > max_unhealthy:
+                self.fail("Stopped upgrading virtual machine scale set {0}: upgraded instances {1} are not healthy".format(
+                    self.name, ', '.join(sorted(unhealthy))), upgrade_batches=batches, unhealthy_instances=sorted(unhealthy))
+
+        if batches:
+            self.results['actions'].append('Upgraded {0} VMSS {1} instances'.format(len(outdated), self.name))
+        self.results['upgrade_batches'] = batches
+        self.results['unhealthy_instances'] = sorted(unhealthy)
+
     def get_marketplace_image_version(self):
         try:
             versions = self.compute_client.virtual_machine_images.list(self.location,
@@ -819,6 +1116,62 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
         except CloudError as exc:
             self.fail("Error creating or updating virtual machine {0} - {1}".format(self.name, str(exc)))
 
+    def update_capacity(self, vmss):
+        '''
+        Change only the capacity of the scale set, with a PATCH of its SKU when the SDK supports it.
+
+        :param vmss: VirtualMachineScaleSet object
+        :return: updated VirtualMachineScaleSet object
+        '''
+        sku = self.compute_models.Sku(name=vmss.sku.name, tier=vmss.sku.tier, capacity=self.capacity)
+        try:
+            if hasattr(self.compute_models, 'VirtualMachineScaleSetUpdate'):
+                poller = self.compute_client.virtual_machine_scale_sets.update(
+                    self.resource_group, self.name, self.compute_models.VirtualMachineScaleSetUpdate(sku=sku))
+            else:
+                # older SDKs only PUT, so send back the model fetched already rather than get it again
+                vmss.sku = sku
+                poller = self.compute_client.virtual_machine_scale_sets.create_or_update(self.resource_group, self.name, vmss)
+            return self.get_poller_result(poller)
+        except CloudError as exc:
+            self.fail("Error updating capacity of virtual machine scale set {0} - {1}".format(self.name, str(exc)))
+
+    def list_instance_ids(self):
+        try:
+            return [vm.instance_id for vm in self.compute_client.virtual_machine_scale_set_vms.list(self.resource_group, self.name)]
+        except CloudError as exc:
+            self.fail("Error listing instances of virtual machine scale set {0} - {1}".format(self.name, str(exc)))
+
+    def run_instance_action(self):
+        '''
+        Run instance_action with one scale set level request per batch of instance_batch_size instances, waiting for
+        each batch before the next one.
+        '''
+        operation = getattr(self.compute_client.virtual_machine_scale_sets, INSTANCE_ACTIONS[self.instance_action])
+        instance_ids = self.instance_ids
+        if self.instance_batch_size:
+            if not instance_ids:
+                instance_ids = self.list_instance_ids()
+            batches = [instance_ids[i:i + self.instance_batch_size]
+                       for i in range(0, len(instance_ids), self.instance_batch_size)]
+        else:
+            # no ids means every instance of the scale set
+            batches = [instance_ids]
+
+        completed = []
+        for batch in batches:
+            self.log("Running {0} on instances {1} of virtual machine scale set {2}".format(
+                self.instance_action, batch or '*', self.name))
+            try:
+                self.get_poller_result(operation(self.resource_group, self.name, instance_ids=batch))
+            except CloudError as exc:
+                self.fail("Error running {0} on instances {1} of virtual machine scale set {2} - {3}".format(
+                    self.instance_action, ', '.join(batch or ['*']), self.name, str(exc)), instance_batches=completed)
+            completed.append(batch or ['*'])
+
+        self.results['actions'].append('Ran {0} on VMSS {1} instances'.format(self.instance_action, self.name))
+        self.results['instance_batches'] = completed
+
     def vm_size_is_valid(self):
         '''
         Validate self.vm_size against the list of virtual machine sizes available for the account and location.
@@ -33,6 +33,26 @@ options:
             - The resource group to search for the desired virtual machine scale set
         required: false
         default: null
+    instances:
+        description:
+            - Return the member instances of the scale set I(name) as I(azure_vmss_instances) instead of the scale set.
+            - Instances are listed with their instance views page by page, and the private IP addresses of all
+              instances come from one listing of the scale set network interfaces.
+        type: bool
+        default: false
+        version_added: "2.7"
+    instance_states:
+        description:
+            - Only return instances whose power state, such as C(running) or C(deallocated), or provisioning state,
+              such as C(Failed) or C(Updating), is in this list. Compared case insensitively.
+        type: list
+        version_added: "2.7"
+    fields:
+        description:
+            - Only return these fields of each object, given as dotted paths such as C(name) or C(tags).
+        required: false
+        default: null
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -51,6 +71,16 @@ EXAMPLES = '''
       azure_rm_virtualmachine_scaleset_facts:
         resource_group: Testing
 
+    - name: Get the instances of a scale set that are not running
+      azure_rm_virtualmachine_scaleset_facts:
+        resource_group: Testing
+        name: testvmss001
+        instances: yes
+        instance_states:
+          - stopped
+          - deallocated
+          - failed
+
     - name: Get facts by tags
       azure_rm_virtualmachine_scaleset_facts:
         resource_group: Testing
@@ -136,9 +166,23 @@ azure_vmss:
             "tier": "Standard"
         }
     }]
+azure_vmss_instances:
+    description: List of the instances of a virtual machine scale set.
+    returned: when I(instances) is set
+    type: list
+    example: [{
+        "instance_id": "3",
+        "name": "testvmss001_3",
+        "id": "/subscriptions/XXXXXXX-XXXX-XXXX-XXXX-XXXXXXXXXX/resourceGroups/Testing/providers/Microsoft.Compute/virtualMachineScaleSets/testvmss001/virtualMachines/3",
+        "computer_name": "testvmss000003",
+        "power_state": "running",
+        "provisioning_state": "Succeeded",
+        "latest_model_applied": true,
+        "private_ip_addresses": ["10.0.1.7"]
+    }]
 '''  # NOQA
 
-from ansible.module_utils.azure_rm_common import AzureRMModuleBase
+from ansible.module_utils.azure_rm_common import AzureRMModuleBase, run_concurrently
 
 try:
     from msrestazure.azure_exceptions import CloudError
@@ -151,6 +195,26 @@ AZURE_OBJECT_CLASS = 'VirtualMachineScaleSet'
 AZURE_ENUM_MODULES = ['azure.mgmt.compute.models']
 
 
+def power_state(instance_view):
+    for status in (instance_view.statuses if instance_view else None) or []:
+        if status.code and status.code.startswith('PowerState/'):
+            return status.code.split('/', 1)[1]
+    return None
+
+
+def instance_to_dict(vm):
+    return dict(
+        instance_id=vm.instance_id,
+        name=vm.name,
+        id=vm.id,
+        computer_name=vm.os_profile.computer_name if vm.os_profile else None,
+        power_state=power_state(vm.instance_view),
+        provisioning_state=vm.provisioning_state,
+        latest_model_applied=vm.latest_model_applied,
+        private_ip_addresses=[]
+    )
+
+
 class AzureRMVirtualMachineScaleSetFacts(AzureRMModuleBase):
     """Utility class to get virtual machine scale set facts"""
 
@@ -159,7 +223,9 @@ class AzureRMVirtualMachineScaleSetFacts(AzureRMModuleBase):
         self.module_args = dict(
             name=dict(type='str'),
             resource_group=dict(type='str'),
-            tags=dict(type='list')
+            tags=dict(type='list'),
+            instances=dict(type='bool', default=False),
+            instance_states=dict(type='list')
         )
 
         self.results = dict(
@@ -172,11 +238,14 @@ class AzureRMVirtualMachineScaleSetFacts(AzureRMModuleBase):
         self.name = None
         self.resource_group = None
         self.tags = None
+        self.instances = None
+        self.instance_states = None
 
         super(AzureRMVirtualMachineScaleSetFacts, self).__init__(
             derived_arg_spec=self.module_args,
             supports_tags=False,
-            facts_module=True
+            facts_module=True,
+            supports_fields=True
         )
 
     def exec_module(self, **kwargs):
@@ -186,7 +255,11 @@ class AzureRMVirtualMachineScaleSetFacts(AzureRMModuleBase):
 
         if self.name and not self.resource_group:
             self.fail("Parameter error: resource group required when filtering by name.")
-        if self.name:
+        if self.instances:
+            if not self.name:
+                self.fail("Parameter error: name required with instances.")
+            self.results['ansible_facts']['azure_vmss_instances'] = self.list_instances()
+        elif self.name:
             self.results['ansible_facts']['azure_vmss'] = self.get_item()
         else:
             self.results['ansible_facts']['azure_vmss'] = self.list_items()
@@ -228,6 +301,43 @@ class AzureRMVirtualMachineScaleSetFacts(AzureRMModuleBase):
 
         return results
 
+    def list_instances(self):
+        """Get the instances of a virtual machine scale set with their power state and private IP addresses"""
+
+        self.log('List instances of virtual machine scale set {0}'.format(self.name))
+        states = set(state.lower() for state in self.instance_states or [])
+
+        def list_vms():
+            instances = []
+            vms = compute_client.virtual_machine_scale_set_vms.list(self.resource_group, self.name, expand='instanceView')
+            for vm in vms:
+                instance = instance_to_dict(vm)
+                if not states or (instance['power_state'] or '').lower() in states or \
+                        (instance['provisioning_state'] or '').lower() in states:
+                    instances.append(instance)
+            return instances
+
+        def list_addresses():
+            addresses = dict()
+            nics = network_client.network_interfaces.list_virtual_machine_scale_set_network_interfaces(self.resource_group,
+                                                                                                        self.name)
+            for nic in nics:
+                if nic.virtual_machine:
+                    addresses.setdefault(nic.virtual_machine.id.lower(), []).extend(
+                        config.private_ip_address for config in nic.ip_configurations or [] if config.private_ip_address)
+            return addresses
+
+        # create the clients before the listings share them
+        compute_client = self.compute_client
+        network_client = self.network_client
+        (instances, exc), (addresses, nic_exc) = run_concurrently(lambda func: func(), [list_vms, list_addresses], 2)
+        if exc or nic_exc:
+            self.fail('Failed to list instances of {0} - {1}'.format(self.name, str(exc or nic_exc)))
+
+        for instance in instances:
+            instance['private_ip_addresses'] = addresses.get(instance['id'].lower(), [])
+        return instances
+
 
 def main():
     """Main module execution code path"""
@@ -21,7 +21,8 @@ version_added: "2.1"
 short_description: Manage Azure virtual networks.
 description:
     - Create, update or delete a virtual networks. Allows setting and updating the available IPv4 address ranges
-      and setting custom DNS servers. Use the azure_rm_subnet module to associate subnets with a virtual network.
+      and setting custom DNS servers. Use the subnets option to manage all subnets of the virtual network in one
+      request, or the azure_rm_subnet module to manage a single subnet.
 options:
     resource_group:
         description:
@@ -62,6 +63,34 @@ options:
               exclusive with dns_servers.
         default: false
         required: false
+    purge_subnets:
+        description:
+            - Use with I(subnets) to remove existing subnets that are not listed.
+        default: false
+        version_added: "2.7"
+    subnets:
+        description:
+            - List of subnets of the virtual network. All subnets are validated together and written with the virtual
+              network in a single request, instead of one request per subnet.
+            - Every prefix must be a valid CIDR block inside the address space of the virtual network, and subnets must
+              not overlap each other or existing subnets that are kept.
+            - Existing subnets that are not listed are left untouched, unless I(purge_subnets) is set.
+        version_added: "2.7"
+        suboptions:
+            name:
+                description:
+                    - Name of the subnet.
+                required: true
+            address_prefix_cidr:
+                description:
+                    - CIDR defining the IPv4 address space of the subnet.
+                required: true
+                aliases:
+                    - address_prefix
+            security_group:
+                description:
+                    - Name or resource ID of a network security group to associate with the subnet. A name refers to
+                      a security group in I(resource_group).
     state:
         description:
             - Assert the state of the virtual network. Use 'present' to create or update and
@@ -97,6 +126,20 @@ EXAMPLES = '''
             testing: testing
             delete: on-exit
 
+    - name: Create a virtual network with all of its subnets in one request
+      azure_rm_virtualnetwork:
+        name: foobar
+        resource_group: Testing
+        address_prefixes_cidr:
+            - "10.1.0.0/16"
+        subnets:
+            - name: frontend
+              address_prefix_cidr: "10.1.0.0/24"
+            - name: backend
+              address_prefix_cidr: "10.1.1.0/24"
+              security_group: backend-nsg
+        purge_subnets: yes
+
     - name: Delete a virtual network
       azure_rm_virtualnetwork:
         name: foobar
@@ -122,9 +165,28 @@ state:
         "location": "eastus",
         "name": "my_test_network",
         "provisioning_state": "Succeeded",
+        "subnets": [
+            {
+                "address_prefix": "10.1.0.0/24",
+                "id": "/subscriptions/XXXXXXX-XXXX-XXXX-XXXX-XXXXXXXXXX/resourceGroups/Testing/providers/Microsoft.Network/virtualNetworks/my_test_network/subnets/frontend",
+                "name": "frontend",
+                "network_security_group": null,
+                "provisioning_state": "Succeeded"
+            }
+        ],
         "tags": null,
         "type": "Microsoft.Network/virtualNetworks"
     }
+subnet_changes:
+    description:
+        - Names of the subnets added, updated and, when I(purge_subnets) is set, removed by this task.
+    returned: when I(subnets) is set
+    type: dict
+    sample: {
+        "added": ["backend"],
+        "updated": [],
+        "removed": []
+    }
 '''
 
 try:
@@ -133,7 +195,7 @@ except ImportError:
     # This is handled in azure_rm_common
     pass
 
-from ansible.module_utils.azure_rm_common import AzureRMModuleBase, CIDR_PATTERN
+from ansible.module_utils.azure_rm_common import AzureRMModuleBase, CIDR_PATTERN, cidr_to_range, format_resource_id
 
 
 def virtual_network_to_dict(vnet):
@@ -159,9 +221,46 @@ def virtual_network_to_dict(vnet):
         results['address_prefixes'] = []
         for space in vnet.address_space.address_prefixes:
             results['address_prefixes'].append(space)
+    if vnet.subnets:
+        results['subnets'] = [subnet_to_dict(subnet) for subnet in vnet.subnets]
     return results
 
 
+def subnet_to_dict(subnet):
+    return dict(
+        id=subnet.id,
+        name=subnet.name,
+        address_prefix=subnet.address_prefix,
+        network_security_group=subnet.network_security_group.id if subnet.network_security_group else None,
+        provisioning_state=subnet.provisioning_state
+    )
+
+
+def ipv4_range(cidr):
+    '''
+    :return: first and last address of an IPv4 CIDR block as in cidr_to_range, or None for anything else, e.g. an
+             IPv6 prefix or a subnet without address_prefix
+    '''
+    try:
+        return cidr_to_range(cidr)
+    except ValueError:
+        return None
+
+
+def find_overlap(prefixes):
+    '''
+    Return the first pair of overlapping IPv4 CIDR blocks, or None. Other prefixes are ignored.
+
+    :param prefixes: list of (name, cidr) tuples
+    :return: tuple of two (name, cidr) tuples or None
+    '''
+    ranges = sorted((ipv4_range(cidr), (name, cidr)) for name, cidr in prefixes if ipv4_range(cidr))
+    for (previous, previous_subnet), (current, current_subnet) in zip(ranges, ranges[1:]):
+        if current[0] <= previous[1]:
+            return previous_subnet, current_subnet
+    return None
+
+
 class AzureRMVirtualNetwork(AzureRMModuleBase):
 
     def __init__(self):
@@ -175,6 +274,8 @@ class AzureRMVirtualNetwork(AzureRMModuleBase):
             dns_servers=dict(type='list',),
             purge_address_prefixes=dict(type='bool', default=False, aliases=['purge']),
             purge_dns_servers=dict(type='bool', default=False),
+            subnets=dict(type='list'),
+            purge_subnets=dict(type='bool', default=False),
         )
 
         mutually_exclusive = [
@@ -182,7 +283,8 @@ class AzureRMVirtualNetwork(AzureRMModuleBase):
         ]
 
         required_if = [
-            ('purge_address_prefixes', True, ['address_prefixes_cidr'])
+            ('purge_address_prefixes', True, ['address_prefixes_cidr']),
+            ('purge_subnets', True, ['subnets'])
         ]
 
         self.resource_group = None
@@ -193,6 +295,8 @@ class AzureRMVirtualNetwork(AzureRMModuleBase):
         self.purge_address_prefixes = None
         self.dns_servers = None
         self.purge_dns_servers = None
+        self.subnets = None
+        self.purge_subnets = None
 
         self.results = dict(
             changed=False,
@@ -224,8 +328,13 @@ class AzureRMVirtualNetwork(AzureRMModuleBase):
             if self.dns_servers and len(self.dns_servers) > 2:
                 self.fail("Parameter error: You can provide a maximum of 2 DNS servers.")
 
+        if self.state == 'present' and self.subnets is not None:
+            self.subnets = self.validate_subnets(self.subnets)
+
         changed = False
         results = dict()
+        subnets = None
+        subnet_changes = None
 
         try:
             self.log('Fetching vnet {0}'.format(self.name))
@@ -272,6 +381,14 @@ class AzureRMVirtualNetwork(AzureRMModuleBase):
                     self.log('CHANGED: purging existing DNS servers')
                     changed = True
                     results['dns_servers'] = []
+
+                subnets = vnet.subnets or []
+                if self.subnets is not None:
+                    subnets, subnet_changes = self.reconcile_subnets(subnets, results.get('address_prefixes', []))
+                    if any(subnet_changes.values()):
+                        self.log('CHANGED: subnets')
+                        changed = True
+                    results['subnets'] = [subnet_to_dict(subnet) for subnet in subnets]
             elif self.state == 'absent':
                 self.log("CHANGED: vnet exists but requested state is 'absent'")
                 changed = True
@@ -280,9 +397,13 @@ class AzureRMVirtualNetwork(AzureRMModuleBase):
             if self.state == 'present':
                 self.log("CHANGED: vnet {0} does not exist but requested state is 'present'".format(self.name))
                 changed = True
+                if self.subnets is not None and self.address_prefixes_cidr:
+                    subnets, subnet_changes = self.reconcile_subnets([], self.address_prefixes_cidr)
 
         self.results['changed'] = changed
         self.results['state'] = results
+        if subnet_changes is not None:
+            self.results['subnet_changes'] = subnet_changes
 
         if self.check_mode:
             return self.results
@@ -306,6 +427,8 @@ class AzureRMVirtualNetwork(AzureRMModuleBase):
                         )
                     if self.tags:
                         vnet.tags = self.tags
+                    if subnets:
+                        vnet.subnets = subnets
                     self.results['state'] = self.create_or_update_vnet(vnet)
                 else:
                     # update existing virtual network
@@ -315,7 +438,8 @@ class AzureRMVirtualNetwork(AzureRMModuleBase):
                         address_space=self.network_models.AddressSpace(
                             address_prefixes=results['address_prefixes']
                         ),
-                        tags=results['tags']
+                        tags=results['tags'],
+                        subnets=subnets
                     )
                     if results.get('dns_servers'):
                         vnet.dhcp_options = self.network_models.DhcpOptions(
@@ -328,6 +452,99 @@ class AzureRMVirtualNetwork(AzureRMModuleBase):
 
         return self.results
 
+    def validate_subnets(self, subnets):
+        '''
+        Check the requested subnets for required values, valid CIDR blocks, duplicate names and overlaps.
+
+        :param subnets: list of subnet dicts from the subnets option
+        :return: list of normalized subnet dicts
+        '''
+        validated = []
+        names = set()
+        for subnet in subnets:
+            if not isinstance(subnet, dict) or not subnet.get('name'):
+                self.fail("Parameter error: each subnet requires a name")
+            prefix = subnet.get('address_prefix_cidr', subnet.get('address_prefix'))
+            if not prefix or not CIDR_PATTERN.match(prefix):
+                self.fail("Parameter error: invalid address prefix value {0} for subnet {1}".format(prefix, subnet['name']))
+            address_range = ipv4_range(prefix)
+            if not address_range:
+                self.fail("Parameter error: invalid address prefix value {0} for subnet {1}".format(prefix, subnet['name']))
+            address = prefix.split('/')[0]
+            if cidr_to_range(address + '/32')[0] != address_range[0]:
+                self.fail("Parameter error: address prefix {0} of subnet {1} has host bits set".format(prefix, subnet['name']))
+            if subnet['name'] in names:
+                self.fail("Parameter error: subnet {0} is listed more than once".format(subnet['name']))
+            names.add(subnet['name'])
+            security_group = None
+            if subnet.get('security_group'):
+                security_group = format_resource_id(val=subnet['security_group'],
+                                                    subscription_id=self.subscription_id,
+                                                    namespace='Microsoft.Network',
+                                                    types='networkSecurityGroups',
+                                                    resource_group=self.resource_group)
+            validated.append(dict(name=subnet['name'], address_prefix=prefix, security_group=security_group))
+
+        overlap = find_overlap([(subnet['name'], subnet['address_prefix']) for subnet in validated])
+        if overlap:
+            self.fail("Parameter error: subnet {0[0]} ({0[1]}) overlaps subnet {1[0]} ({1[1]})".format(*overlap))
+        return validated
+
+    def reconcile_subnets(self, existing, address_prefixes):
+        '''
+        Merge the requested subnets into the existing subnet models of the virtual network. Existing subnets keep
+        all their other properties, e.g. route tables and service endpoints.
+
+        :param existing: list of Subnet models of the virtual network
+        :param address_prefixes: address space the virtual network will have
+        :return: tuple of the list of Subnet models to write and a dict of added, updated and removed subnet names
+        '''
+        changes = dict(added=[], updated=[], removed=[])
+        index = dict((subnet.name, subnet) for subnet in existing)
+        requested = set(subnet['name'] for subnet in self.subnets)
+
+        subnets = []
+        for subnet in existing:
+            if subnet.name in requested or not self.purge_subnets:
+                subnets.append(subnet)
+            else:
+                changes['removed'].append(subnet.name)
+
+        for subnet in self.subnets:
+            current = index.get(subnet['name'])
+            if current is None:
+                current = self.network_models.Subnet(name=subnet['name'], address_prefix=subnet['address_prefix'])
+                if subnet['security_group']:
+                    current.network_security_group = self.network_models.NetworkSecurityGroup(id=subnet['security_group'])
+                subnets.append(current)
+                changes['added'].append(subnet['name'])
+                continue
+            updated = False
+            if current.address_prefix != subnet['address_prefix']:
+                current.address_prefix = subnet['address_prefix']
+                updated = True
+            current_nsg = current.network_security_group.id if current.network_security_group else None
+            if subnet['security_group'] and (current_nsg or '').lower() != subnet['security_group'].lower():
+                current.network_security_group = self.network_models.NetworkSecurityGroup(id=subnet['security_group'])
+                updated = True
+            if updated:
+                changes['updated'].append(subnet['name'])
+
+        # only IPv4 prefixes are checked, IPv6 ones are left to Azure
+        spaces = [ipv4_range(prefix) for prefix in address_prefixes if ipv4_range(prefix)]
+        for subnet in subnets:
+            address_range = ipv4_range(subnet.address_prefix)
+            if not address_range:
+                continue
+            first, last = address_range
+            if not any(space[0] <= first and last <= space[1] for space in spaces):
+                self.fail("Parameter error: subnet {0} ({1}) is outside the address space {2} of virtual network {3}".format(
+                    subnet.name, subnet.address_prefix, ', '.join(address_prefixes), self.name))
+        overlap = find_overlap([(subnet.name, subnet.address_prefix) for subnet in subnets])
+        if overlap:
+            self.fail("Parameter error: subnet {0[0]} ({0[1]}) overlaps subnet {1[0]} ({1[1]})".format(*overlap))
+        return subnets, changes
+
     def create_or_update_vnet(self, vnet):
         try:
             poller = self.network_client.virtual_networks.create_or_update(self.resource_group, self.name, vnet)
@@ -41,6 +41,23 @@ options:
             - Limit results by providing a list of tags. Format tags as 'key' or 'key:value'.
         default: null
         required: false
+    topology:
+        description:
+            - Also return C(azure_virtualnetwork_topology), a graph of the selected virtual networks, their subnets and the
+              network interfaces, security groups, route tables and public IPs attached to them, with the address
+              utilization of every subnet.
+            - Virtual networks, network interfaces, security groups, route tables and public IPs are each listed once,
+              concurrently, for I(resource_group) or the whole subscription, and joined by resource id. Attached
+              resources in other resource groups only appear as ids unless the whole subscription is listed.
+        type: bool
+        default: false
+        version_added: "2.7"
+    fields:
+        description:
+            - Only return these fields of each object, given as dotted paths such as C(name) or C(tags).
+        required: false
+        default: null
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -61,6 +78,17 @@ EXAMPLES = '''
       azure_rm_virtualnetwork_facts:
         resource_group: Testing
 
+    - name: Get the network topology and subnet utilization of a resource group
+      azure_rm_virtualnetwork_facts:
+        resource_group: Testing
+        topology: yes
+
+    - name: List subnets that are more than 80% full
+      debug:
+        msg: "{{ item.value.name }} {{ item.value.utilization }}%"
+      with_dict: "{{ azure_virtualnetwork_topology.subnets }}"
+      when: item.value.utilization is not none and item.value.utilization > 80
+
     - name: Get facts by tags
       azure_rm_virtualnetwork_facts:
         tags:
@@ -88,6 +116,40 @@ azure_virtualnetworks:
         },
         "type": "Microsoft.Network/virtualNetworks"
     }]
+azure_virtualnetwork_topology:
+    description:
+        - Network graph keyed by lower case resource id, with cross references by id. Every subnet reports its number of
+          usable addresses (Azure reserves 5 per subnet), the number of IP configurations using it and the utilization
+          in percent. Usable and available addresses and utilization are null for subnets without an IPv4 prefix.
+    returned: when I(topology=true)
+    type: dict
+    example: {
+        "virtual_networks": {
+            "/subscriptions/xxx/resourcegroups/testing/providers/microsoft.network/virtualnetworks/vnet2001": {
+                "name": "vnet2001",
+                "address_prefixes": ["10.10.0.0/16"],
+                "subnets": ["/subscriptions/xxx/resourcegroups/testing/providers/microsoft.network/virtualnetworks/vnet2001/subnets/default"]
+            }
+        },
+        "subnets": {
+            "/subscriptions/xxx/resourcegroups/testing/providers/microsoft.network/virtualnetworks/vnet2001/subnets/default": {
+                "name": "default",
+                "virtual_network": "/subscriptions/xxx/resourcegroups/testing/providers/microsoft.network/virtualnetworks/vnet2001",
+                "address_prefix": "10.10.0.0/24",
+                "network_security_group": null,
+                "route_table": null,
+                "network_interfaces": ["/subscriptions/xxx/resourcegroups/testing/providers/microsoft.network/networkinterfaces/nic001"],
+                "usable_addresses": 251,
+                "used_addresses": 1,
+                "available_addresses": 250,
+                "utilization": 0.4
+            }
+        },
+        "network_interfaces": {},
+        "network_security_groups": {},
+        "route_tables": {},
+        "public_ip_addresses": {}
+    }
 '''
 
 try:
@@ -96,11 +158,125 @@ except:
     # This is handled in azure_rm_common
     pass
 
-from ansible.module_utils.azure_rm_common import AzureRMModuleBase
+from ansible.module_utils.azure_rm_common import AzureRMModuleBase, cidr_to_range, run_concurrently
 
 
 AZURE_OBJECT_CLASS = 'VirtualNetwork'
 
+# Addresses Azure reserves in every subnet: network, gateway, two for DNS and broadcast
+RESERVED_SUBNET_ADDRESSES = 5
+
+TOPOLOGY_RESOURCES = ('virtual_networks', 'network_interfaces', 'network_security_groups', 'route_tables',
+                      'public_ip_addresses')
+
+
+def resource_key(sub_resource):
+    if sub_resource is None or not getattr(sub_resource, 'id', None):
+        return None
+    return sub_resource.id.lower()
+
+
+def parent_key(key, levels=2):
+    return key.rsplit('/', levels)[0]
+
+
+def build_topology(resources, vnets):
+    '''
+    Join the listed network resources into a graph around the given virtual networks.
+
+    :param resources: dict of TOPOLOGY_RESOURCES names to lists of SDK objects
+    :param vnets: the VirtualNetwork objects to report
+    :return: dict
+    '''
+    topology = dict((name, dict()) for name in TOPOLOGY_RESOURCES)
+    topology['subnets'] = dict()
+
+    for vnet in vnets:
+        vnet_key = resource_key(vnet)
+        topology['virtual_networks'][vnet_key] = dict(
+            name=vnet.name,
+            address_prefixes=list(vnet.address_space.address_prefixes) if vnet.address_space else [],
+            subnets=[resource_key(subnet) for subnet in vnet.subnets or []]
+        )
+        for subnet in vnet.subnets or []:
+            try:
+                first, last = cidr_to_range(subnet.address_prefix)
+                usable = max(0, last - first + 1 - RESERVED_SUBNET_ADDRESSES)
+            except ValueError:
+                # no address_prefix, or an IPv6 one
+                usable = None
+            used = len(subnet.ip_configurations or [])
+            topology['subnets'][resource_key(subnet)] = dict(
+                name=subnet.name,
+                virtual_network=vnet_key,
+                address_prefix=subnet.address_prefix,
+                network_security_group=resource_key(subnet.network_security_group),
+                route_table=resource_key(subnet.route_table),
+                network_interfaces=[],
+                usable_addresses=usable,
+                used_addresses=used,
+                available_addresses=max(0, usable - used) if usable is not None else None,
+                utilization=(round(100.0 * used / usable, 1) if usable else 0.0) if usable is not None else None
+            )
+
+    subnets = topology['subnets']
+    public_ips = dict((resource_key(pip), pip) for pip in resources['public_ip_addresses'])
+    referenced = dict(network_security_groups=set(), route_tables=set(), public_ip_addresses=set())
+    for subnet in subnets.values():
+        referenced['network_security_groups'].add(subnet['network_security_group'])
+        referenced['route_tables'].add(subnet['route_table'])
+
+    for nic in resources['network_interfaces']:
+        nic_key = resource_key(nic)
+        configurations = nic.ip_configurations or []
+        nic_subnets = [resource_key(config.subnet) for config in configurations]
+        if not any(key in subnets for key in nic_subnets):
+            continue
+        pip_keys = [resource_key(config.public_ip_address) for config in configurations if config.public_ip_address]
+        topology['network_interfaces'][nic_key] = dict(
+            name=nic.name,
+            subnets=nic_subnets,
+            private_ip_addresses=[config.private_ip_address for config in configurations],
+            public_ip_addresses=pip_keys,
+            network_security_group=resource_key(nic.network_security_group),
+            virtual_machine=resource_key(nic.virtual_machine)
+        )
+        for key in set(nic_subnets):
+            if key in subnets:
+                subnets[key]['network_interfaces'].append(nic_key)
+        referenced['network_security_groups'].add(resource_key(nic.network_security_group))
+        referenced['public_ip_addresses'].update(pip_keys)
+
+    for nsg in resources['network_security_groups']:
+        key = resource_key(nsg)
+        if key in referenced['network_security_groups']:
+            topology['network_security_groups'][key] = dict(
+                name=nsg.name,
+                rules=len(nsg.security_rules or []),
+                subnets=[resource_key(subnet) for subnet in nsg.subnets or []],
+                network_interfaces=[resource_key(nic) for nic in nsg.network_interfaces or []]
+            )
+
+    for route_table in resources['route_tables']:
+        key = resource_key(route_table)
+        if key in referenced['route_tables']:
+            topology['route_tables'][key] = dict(
+                name=route_table.name,
+                routes=len(route_table.routes or []),
+                subnets=[resource_key(subnet) for subnet in route_table.subnets or []]
+            )
+
+    for key in referenced['public_ip_addresses']:
+        pip = public_ips.get(key)
+        if pip:
+            topology['public_ip_addresses'][key] = dict(
+                name=pip.name,
+                ip_address=pip.ip_address,
+                public_ip_allocation_method=pip.public_ip_allocation_method,
+                attached_to=parent_key(resource_key(pip.ip_configuration)) if pip.ip_configuration else None
+            )
+    return topology
+
 
 class AzureRMNetworkInterfaceFacts(AzureRMModuleBase):
 
@@ -110,6 +286,7 @@ class AzureRMNetworkInterfaceFacts(AzureRMModuleBase):
             name=dict(type='str'),
             resource_group=dict(type='str'),
             tags=dict(type='list'),
+            topology=dict(type='bool', default=False),
         )
 
         self.results = dict(
@@ -120,16 +297,21 @@ class AzureRMNetworkInterfaceFacts(AzureRMModuleBase):
         self.name = None
         self.resource_group = None
         self.tags = None
+        self.topology = None
 
         super(AzureRMNetworkInterfaceFacts, self).__init__(self.module_arg_spec,
                                                            supports_tags=False,
-                                                           facts_module=True)
+                                                           facts_module=True,
+                                                           supports_fields=True)
 
     def exec_module(self, **kwargs):
 
         for key in self.module_arg_spec:
             setattr(self, key, kwargs[key])
 
+        if self.topology:
+            return self.exec_topology()
+
         if self.name is not None:
             self.results['ansible_facts']['azure_virtualnetworks'] = self.get_item()
         else:
@@ -137,6 +319,31 @@ class AzureRMNetworkInterfaceFacts(AzureRMModuleBase):
 
         return self.results
 
+    def exec_topology(self):
+        if self.name and not self.resource_group:
+            self.fail("Parameter error: resource_group is required when filtering by name")
+
+        client = self.network_client
+
+        def list_resources(name):
+            operations = getattr(client, name)
+            if self.resource_group:
+                return list(operations.list(self.resource_group))
+            return list(operations.list_all())
+
+        outcomes = run_concurrently(list_resources, TOPOLOGY_RESOURCES, len(TOPOLOGY_RESOURCES))
+        resources = dict()
+        for name, (items, exc) in zip(TOPOLOGY_RESOURCES, outcomes):
+            if exc:
+                self.fail("Failed to list {0} - {1}".format(name.replace('_', ' '), str(exc)))
+            resources[name] = items
+
+        vnets = [vnet for vnet in resources['virtual_networks']
+                 if (self.name is None or vnet.name == self.name) and self.has_tags(vnet.tags, self.tags)]
+        self.results['ansible_facts']['azure_virtualnetworks'] = [self.serialize_obj(vnet, AZURE_OBJECT_CLASS) for vnet in vnets]
+        self.results['ansible_facts']['azure_virtualnetwork_topology'] = build_topology(resources, vnets)
+        return self.results
+
     def get_item(self):
         self.log('Get properties for {0}'.format(self.name))
         item = None
@@ -57,7 +57,12 @@ options:
                     - configuration
                     - deployment_slot
                 default: basic
-
+    fields:
+        description:
+            - Only return these fields of each object, given as dotted paths such as C(name) or C(tags).
+        required: false
+        default: null
+        version_added: "2.7"
 
 extends_documentation_fragment:
     - azure
@@ -258,7 +263,8 @@ class AzureRMWebAppFacts(AzureRMModuleBase):
 
         super(AzureRMWebAppFacts, self).__init__(self.module_arg_spec,
                                                    supports_tags=False,
-                                                   facts_module=True)
+                                                   facts_module=True,
+                                                   supports_fields=True)
 
     def exec_module(self, **kwargs):
 
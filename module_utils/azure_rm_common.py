@@ -5,14 +5,24 @@
 
 import os
 import re
+import socket
+import struct
+import threading
 import types
 import copy
 import inspect
+import time
 import traceback
 
+from collections import deque
 from os.path import expanduser
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.azure_rm_http_cache import AzureRMHttpCache
+from ansible.module_utils.azure_rm_ip_allocation import AddressReservations, SubnetAddressBitmap
+from ansible.module_utils.azure_rm_metrics import AzureRMMetrics
+from ansible.module_utils.azure_rm_profiling import AzureRMProfiler
+from ansible.module_utils.azure_rm_storage_key_cache import AzureRMStorageKeyCache
 from ansible.module_utils.six.moves import configparser
 import ansible.module_utils.six.moves.urllib.parse as urlparse
 try:
@@ -80,6 +90,10 @@ AZURE_TAG_ARGS = dict(
     append_tags=dict(type='bool', default=True),
 )
 
+AZURE_FIELDS_ARGS = dict(
+    fields=dict(type='list'),
+)
+
 AZURE_COMMON_REQUIRED_IF = [
     ('log_mode', 'file', ['log_path'])
 ]
@@ -101,6 +115,8 @@ HAS_AZURE_CLI_CORE = True
 HAS_MSRESTAZURE = True
 HAS_MSRESTAZURE_EXC = None
 
+_IMPORT_STARTED = time.time()
+
 try:
     import importlib
 except ImportError:
@@ -156,6 +172,8 @@ except ImportError:
     HAS_AZURE_CLI_CORE = False
     CLIError = Exception
 
+AZURE_IMPORT_DURATION = time.time() - _IMPORT_STARTED
+
 
 def azure_id_to_dict(id):
     pieces = re.sub(r'^\/', '', id).split('/')
@@ -174,6 +192,123 @@ def format_resource_id(val, subscription_id, namespace, types, resource_group):
                        type=types,
                        subscription=subscription_id) if not is_valid_resource_id(val) else val
 
+
+def cidr_to_range(cidr):
+    '''
+    Return the first and last address of an IPv4 CIDR block as integers.
+
+    :param cidr: e.g. '10.0.1.0/24'
+    :return: tuple of ints
+    :raises ValueError: when cidr is not an IPv4 CIDR block
+    '''
+    try:
+        address, length = cidr.split('/')
+        length = int(length)
+        packed = socket.inet_aton(address)
+    except (AttributeError, ValueError, socket.error):
+        raise ValueError("{0} is not a valid IPv4 CIDR block".format(cidr))
+    if not 0 <= length <= 32 or address.count('.') != 3:
+        raise ValueError("{0} is not a valid IPv4 CIDR block".format(cidr))
+    mask = (0xffffffff << (32 - length)) & 0xffffffff
+    first = struct.unpack('!I', packed)[0] & mask
+    return first, first | (~mask & 0xffffffff)
+
+
+def run_concurrently(func, items, max_workers):
+    '''
+    Call func for every item on at most max_workers threads. Exceptions are collected per item rather than raised,
+    so func must not call fail() or exit_json().
+
+    :param func: callable taking one item
+    :param items: list of items
+    :param max_workers: upper bound of concurrent calls
+    :return: list of (result, exception) tuples in the order of items
+    '''
+    results = [(None, None)] * len(items)
+    pending = deque(enumerate(items))
+
+    def worker():
+        while True:
+            try:
+                index, item = pending.popleft()
+            except IndexError:
+                return
+            try:
+                results[index] = (func(item), None)
+            except Exception as exc:
+                results[index] = (None, exc)
+
+    threads = [threading.Thread(target=worker) for i in range(max(1, min(max_workers, len(items))))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def parse_fields(fields):
+    '''
+    Build a projection tree from a list of dotted field paths, e.g. ['name', 'properties.subnets[].name']
+    becomes {'name': True, 'properties': {'subnets': {'name': True}}}. A True leaf keeps the whole value.
+
+    :param fields: list of field paths
+    :return: dict or None
+    '''
+    if not fields:
+        return None
+    tree = dict()
+    for field in fields:
+        segments = [s for s in re.sub(r'\[\*?\]', '', field.strip()).split('.') if s]
+        if not segments:
+            continue
+        node = tree
+        for segment in segments[:-1]:
+            child = node.get(segment)
+            if child is True:
+                break
+            node = node.setdefault(segment, dict())
+        else:
+            node[segments[-1]] = True
+    return tree
+
+
+def _attribute_key_path(key):
+    # msrest flattens nested REST properties into keys like 'properties.provisioningState'; '\\.' escapes a dot
+    return [k.replace('\\.', '.') for k in re.split(r'(?<!\\)\.', key)]
+
+
+def project_model(value, tree, rest_keys=True):
+    '''
+    Return a copy of an SDK model that only holds the attributes selected by a projection tree, so that
+    serializing it never builds the unselected parts. Lists are projected item by item.
+
+    :param value: SDK model, list, dict or scalar
+    :param tree: projection tree from parse_fields, or True to keep the value
+    :param rest_keys: match the tree against REST keys (serialize_obj) instead of attribute names (as_dict)
+    :return: projected value
+    '''
+    if tree is True or value is None:
+        return value
+    if isinstance(value, list):
+        return [project_model(item, tree, rest_keys) for item in value]
+    if isinstance(value, dict):
+        return dict((k, project_model(v, tree[k], rest_keys)) for k, v in value.items() if k in tree)
+    attribute_map = getattr(value, '_attribute_map', None)
+    if attribute_map is None:
+        return value
+
+    projected = value.__class__.__new__(value.__class__)
+    for attr, desc in attribute_map.items():
+        node = tree
+        for segment in (_attribute_key_path(desc['key']) if rest_keys else [attr]):
+            node = node.get(segment)
+            if not isinstance(node, dict):
+                break
+        selected = getattr(value, attr, None) if node else None
+        setattr(projected, attr, project_model(selected, node, rest_keys) if selected is not None else None)
+    return projected
+
 # FUTURE: either get this from the requirements file (if we can be sure it's always available at runtime)
 # or generate the requirements files from this so we only have one source of truth to maintain...
 AZURE_PKG_VERSIONS = {
@@ -215,12 +350,14 @@ class AzureRMModuleBase(object):
     def __init__(self, derived_arg_spec, bypass_checks=False, no_log=False,
                  check_invalid_arguments=None, mutually_exclusive=None, required_together=None,
                  required_one_of=None, add_file_common_args=False, supports_check_mode=False,
-                 required_if=None, supports_tags=True, facts_module=False, skip_exec=False):
+                 required_if=None, supports_tags=True, facts_module=False, skip_exec=False, supports_fields=False):
 
         merged_arg_spec = dict()
         merged_arg_spec.update(AZURE_COMMON_ARGS)
         if supports_tags:
             merged_arg_spec.update(AZURE_TAG_ARGS)
+        if supports_fields:
+            merged_arg_spec.update(AZURE_FIELDS_ARGS)
 
         if derived_arg_spec:
             merged_arg_spec.update(derived_arg_spec)
@@ -240,6 +377,17 @@ class AzureRMModuleBase(object):
                                     supports_check_mode=supports_check_mode,
                                     required_if=merged_required_if)
 
+        module_name = getattr(self.module, '_name', self.__class__.__name__)
+        self._metrics = AzureRMMetrics.from_environment(module_name)
+        if self._metrics:
+            self._metrics.record_phase('import', AZURE_IMPORT_DURATION)
+
+        try:
+            self._profiler = AzureRMProfiler.from_environment(module_name)
+        except (OSError, ValueError) as exc:
+            self.module.warn("Azure module profiling disabled - {0}".format(str(exc)))
+            self._profiler = None
+
         if not HAS_PACKAGING_VERSION:
             self.fail("Do you have packaging installed? Try `pip install packaging`"
                       "- {0}".format(HAS_PACKAGING_VERSION_EXC))
@@ -264,9 +412,25 @@ class AzureRMModuleBase(object):
         self.check_mode = self.module.check_mode
         self.api_profile = self.module.params.get('api_profile')
         self.facts_module = facts_module
+        self.fields = parse_fields(self.module.params.get('fields')) if supports_fields else None
+
+        try:
+            self._http_cache = AzureRMHttpCache.from_environment()
+        except (OSError, ValueError) as exc:
+            self.module.warn("Azure HTTP cache disabled - {0}".format(str(exc)))
+            self._http_cache = None
+
+        self._storage_keys = dict()
+        self._blob_clients = dict()
+        try:
+            self._storage_key_cache = AzureRMStorageKeyCache.from_environment()
+        except (OSError, ValueError) as exc:
+            self.module.warn("Storage account key cache disabled - {0}".format(str(exc)))
+            self._storage_key_cache = None
         # self.debug = self.module.params.get('debug')
 
         # authenticate
+        auth_started = time.time()
         self.credentials = self._get_credentials(self.module.params)
         if not self.credentials:
             if HAS_AZURE_CLI_CORE:
@@ -337,12 +501,22 @@ class AzureRMModuleBase(object):
                       "Credentials must include client_id, secret and tenant or ad_user and password or "
                       "be logged using AzureCLI.")
 
+        if self._metrics:
+            self._metrics.record_phase('auth', time.time() - auth_started)
+
         # common parameter validation
         if self.module.params.get('tags'):
             self.validate_tags(self.module.params['tags'])
 
         if not skip_exec:
-            res = self.exec_module(**self.module.params)
+            exec_started = time.time()
+            if self._profiler:
+                res = self._profiler.run(self.exec_module, **self.module.params)
+            else:
+                res = self.exec_module(**self.module.params)
+            if self._metrics:
+                self._metrics.record_phase('exec', time.time() - exec_started)
+                res['_azure_metrics'] = self._metrics.summary()
             self.module.exit_json(**res)
 
     def check_client_version(self, client_type):
@@ -372,6 +546,8 @@ class AzureRMModuleBase(object):
         :param kwargs: Any key=value pairs
         :return: None
         '''
+        if getattr(self, '_metrics', None) and '_azure_metrics' not in kwargs:
+            kwargs['_azure_metrics'] = self._metrics.summary()
         self.module.fail_json(msg=msg, **kwargs)
 
     def deprecate(self, msg, version=None):
@@ -611,8 +787,22 @@ class AzureRMModuleBase(object):
             self.log("dependencies: ")
             self.log(str(dependencies))
         serializer = Serializer(classes=dependencies)
+        if self.fields:
+            # a projected model misses required attributes on purpose, so skip body() validation
+            return serializer._serialize(project_model(obj, self.fields), class_name, keep_readonly=True)
         return serializer.body(obj, class_name, keep_readonly=True)
 
+    def model_to_dict(self, obj):
+        '''
+        Return obj.as_dict(), restricted to the facts module fields when given.
+
+        :param obj: Azure object
+        :return: dict
+        '''
+        if self.fields:
+            obj = project_model(obj, self.fields, rest_keys=False)
+        return obj.as_dict()
+
     def get_poller_result(self, poller, wait=5):
         '''
         Consistent method of waiting on and retrieving results from Azure's long poller
@@ -620,6 +810,7 @@ class AzureRMModuleBase(object):
         :param poller Azure poller object
         :return object resulting from the original request
         '''
+        started = time.time()
         try:
             delay = wait
             while not poller.done():
@@ -629,6 +820,50 @@ class AzureRMModuleBase(object):
         except Exception as exc:
             self.log(str(exc))
             raise
+        finally:
+            if self._metrics:
+                self._metrics.record_poller(time.time() - started)
+
+    def run_pollers(self, start, items, max_pending, wait=1):
+        '''
+        Start a long running operation for every item, with at most max_pending in flight, and wait for all of them
+        in one loop rather than one thread or get_poller_result call per operation. Exceptions are collected per item.
+
+        :param start: callable taking one item and returning a poller
+        :param items: list of items
+        :param max_pending: upper bound of operations in flight
+        :param wait: seconds to wait on the oldest operation between checks
+        :return: list of (result, exception, seconds) tuples in the order of items
+        '''
+        results = [(None, None, 0.0)] * len(items)
+        queue = deque(enumerate(items))
+        in_flight = dict()
+        started_all = time.time()
+        try:
+            while queue or in_flight:
+                while queue and len(in_flight) < max(1, max_pending):
+                    index, item = queue.popleft()
+                    started = time.time()
+                    try:
+                        in_flight[index] = (start(item), started)
+                    except Exception as exc:
+                        results[index] = (None, exc, time.time() - started)
+                finished = [index for index, (poller, started) in in_flight.items() if poller.done()]
+                for index in finished:
+                    poller, started = in_flight.pop(index)
+                    try:
+                        results[index] = (poller.result(), None, time.time() - started)
+                    except Exception as exc:
+                        self.log(str(exc))
+                        results[index] = (None, exc, time.time() - started)
+                if in_flight and not finished:
+                    oldest = min(in_flight)
+                    self.log("Waiting for {0} operations".format(len(in_flight) + len(queue)))
+                    in_flight[oldest][0].wait(timeout=wait)
+        finally:
+            if self._metrics:
+                self._metrics.record_poller(time.time() - started_all)
+        return results
 
     def check_provisioning_state(self, azure_object, requested_state='present'):
         '''
@@ -666,25 +901,145 @@ class AzureRMModuleBase(object):
                     azure_object.name, azure_object.provisioning_state, AZURE_SUCCESS_STATE))
 
     def get_blob_client(self, resource_group_name, storage_account_name, storage_blob_type='block'):
-        keys = dict()
-        try:
-            # Get keys from the storage account
-            self.log('Getting keys')
-            account_keys = self.storage_client.storage_accounts.list_keys(resource_group_name, storage_account_name)
-        except Exception as exc:
-            self.fail("Error getting keys for account {0} - {1}".format(storage_account_name, str(exc)))
+        '''
+        Return a blob service client of a storage account. Clients are reused for the rest of the module run. When a
+        request is refused, the client fetches the current account key once, in case the cached one was rotated,
+        and retries with it.
+        '''
+        client_key = (self.subscription_id, resource_group_name.lower(), storage_account_name.lower(), storage_blob_type)
+        if client_key in self._blob_clients:
+            return self._blob_clients[client_key]
 
+        account_key = self.get_storage_account_key(resource_group_name, storage_account_name)
         try:
             self.log('Create blob service')
-            if storage_blob_type == 'page':
-                return CloudStorageAccount(storage_account_name, account_keys.keys[0].value).create_page_blob_service()
-            elif storage_blob_type == 'block':
-                return CloudStorageAccount(storage_account_name, account_keys.keys[0].value).create_block_blob_service()
-            else:
-                raise Exception("Invalid storage blob type defined.")
+            client = self._create_blob_service(storage_account_name, account_key, storage_blob_type)
         except Exception as exc:
             self.fail("Error creating blob service client for storage account {0} - {1}".format(storage_account_name,
                                                                                                 str(exc)))
+        if hasattr(client, 'retry'):
+            client.retry = self._refresh_key_on_auth_failure(client, resource_group_name, storage_account_name,
+                                                             storage_blob_type)
+        self._blob_clients[client_key] = client
+        return client
+
+    def get_storage_account_key(self, resource_group_name, storage_account_name):
+        '''
+        Return the first key of a storage account. Keys are kept for the rest of the module run and, when
+        AZURE_RM_STORAGE_KEY_CACHE_SECRET is set, in an encrypted file cache shared by the tasks of a play.
+        '''
+        key = (self.subscription_id, resource_group_name.lower(), storage_account_name.lower())
+        if key not in self._storage_keys:
+            cached = self._storage_key_cache.get(key) if self._storage_key_cache else None
+            if cached:
+                self._storage_keys[key] = cached
+            else:
+                try:
+                    # Get keys from the storage account
+                    self.log('Getting keys')
+                    self._storage_keys[key] = self._list_storage_account_key(resource_group_name, storage_account_name)
+                except Exception as exc:
+                    self.fail("Error getting keys for account {0} - {1}".format(storage_account_name, str(exc)))
+        return self._storage_keys[key]
+
+    def _list_storage_account_key(self, resource_group_name, storage_account_name):
+        account_keys = self.storage_client.storage_accounts.list_keys(resource_group_name, storage_account_name)
+        value = account_keys.keys[0].value
+        if self._storage_key_cache:
+            self._storage_key_cache.set((self.subscription_id, resource_group_name.lower(), storage_account_name.lower()),
+                                        value)
+        return value
+
+    def _create_blob_service(self, storage_account_name, account_key, storage_blob_type):
+        if storage_blob_type == 'page':
+            return CloudStorageAccount(storage_account_name, account_key).create_page_blob_service()
+        elif storage_blob_type == 'block':
+            return CloudStorageAccount(storage_account_name, account_key).create_block_blob_service()
+        raise Exception("Invalid storage blob type defined.")
+
+    def _refresh_key_on_auth_failure(self, client, resource_group_name, storage_account_name, storage_blob_type):
+        '''
+        Wrap the retry policy of a blob service. The first 403 response fetches the current account key, and when it
+        differs from the one in use, the request is signed with it and retried at once. Runs on the threads of the
+        storage SDK, so errors are logged rather than passed to fail().
+        '''
+        retry = client.retry
+        key = (self.subscription_id, resource_group_name.lower(), storage_account_name.lower())
+        lock = threading.Lock()
+        state = dict(refreshed=False)
+
+        def refresh_and_retry(context):
+            response = getattr(context, 'response', None)
+            if response is not None and response.status == 403:
+                with lock:
+                    if not state['refreshed']:
+                        state['refreshed'] = True
+                        try:
+                            value = self._list_storage_account_key(resource_group_name, storage_account_name)
+                        except Exception as exc:
+                            self.log("Error refreshing keys for account {0} - {1}".format(storage_account_name, str(exc)))
+                            if self._storage_key_cache:
+                                self._storage_key_cache.invalidate(key)
+                            return retry(context)
+                        self._storage_keys[key] = value
+                        if value != client.account_key:
+                            self.log("Key of storage account {0} was rotated, retrying".format(storage_account_name))
+                            client.account_key = value
+                            client.authentication = self._create_blob_service(storage_account_name, value,
+                                                                              storage_blob_type).authentication
+                            return 0
+            return retry(context)
+
+        return refresh_and_retry
+
+    def allocate_private_ip_addresses(self, resource_group, virtual_network_name, subnet_name, count):
+        '''
+        Pick count free private IP addresses of a subnet for static assignment. Used addresses are read from the
+        subnet's ip configurations, and picked addresses are reserved in a local lock file for a while so that
+        parallel tasks do not pick them again before Azure reports them as used.
+
+        :param resource_group: resource group of the virtual network
+        :param virtual_network_name: name of the virtual network
+        :param subnet_name: name of the subnet
+        :param count: number of addresses
+        :return: list of IP addresses
+        :raises ValueError: when the subnet does not have enough free addresses
+        '''
+        subnet = self.network_client.subnets.get(resource_group, virtual_network_name, subnet_name)
+        used = []
+        nic_groups = set()
+        verify = False
+        for config in subnet.ip_configurations or []:
+            if config.private_ip_address:
+                used.append(config.private_ip_address)
+                continue
+            # subnets usually reference their ip configurations by id only
+            id_dict = parse_resource_id(config.id)
+            group = id_dict.get('resource_group')
+            if group and (id_dict.get('type') or '').lower() == 'networkinterfaces':
+                nic_groups.add(group)
+            else:
+                verify = True
+        for group in nic_groups:
+            for nic in self.network_client.network_interfaces.list(group):
+                for config in nic.ip_configurations or []:
+                    if config.subnet and config.subnet.id.lower() == subnet.id.lower() and config.private_ip_address:
+                        used.append(config.private_ip_address)
+
+        addresses = []
+        with AddressReservations(subnet.id) as reservations:
+            bitmap = SubnetAddressBitmap(subnet.address_prefix)
+            for address in used + list(reservations.addresses):
+                bitmap.mark(address)
+            while len(addresses) < count:
+                candidate = bitmap.allocate(1)[0]
+                # load balancer frontends and gateways are not resolved, let Azure confirm those candidates
+                if verify and not self.network_client.virtual_networks.check_ip_address_availability(
+                        resource_group, virtual_network_name, candidate).available:
+                    continue
+                addresses.append(candidate)
+            reservations.reserve(addresses)
+        return addresses
 
     def create_default_pip(self, resource_group, location, public_ip_name, allocation_method='Dynamic'):
         '''
@@ -868,6 +1223,14 @@ class AzureRMModuleBase(object):
         if self._cert_validation_mode == 'ignore':
             client.config.session_configuration_callback = self._validation_ignore_callback
 
+        # Serve repeated GETs from the opt-in run cache, revalidating with the stored ETag
+        if self._http_cache and hasattr(client, '_client'):
+            client._client.send = self._http_cache.wrap_send(client._client.send)
+
+        # Time every request, including the ones answered by the cache
+        if self._metrics and hasattr(client, '_client'):
+            client._client.send = self._metrics.wrap_send(client._client.send)
+
         return client
 
     @property
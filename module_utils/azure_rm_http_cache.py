@@ -0,0 +1,327 @@
+# Copyright (c) 2018 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+'''
+Opt-in, on-disk conditional-GET cache for Azure Resource Manager requests.
+
+Entries live under a directory tree mirroring the (lower-cased) ARM resource path, so that
+a write to a resource can drop the cached copy of the resource, its children and its parents
+inside the same provider without scanning the whole cache.
+'''
+
+import base64
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import ansible.module_utils.six.moves.urllib.parse as urlparse
+
+try:
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+except ImportError:
+    # This is handled in azure_rm_common
+    Response = None
+    CaseInsensitiveDict = dict
+
+HTTP_CACHE_DIR_ENV = 'AZURE_RM_HTTP_CACHE'
+HTTP_CACHE_TTL_ENV = 'AZURE_RM_HTTP_CACHE_TTL'
+HTTP_CACHE_MAX_SIZE_ENV = 'AZURE_RM_HTTP_CACHE_MAX_SIZE'
+
+HTTP_CACHE_DEFAULT_TTL = 300
+HTTP_CACHE_DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+ENTRY_PREFIX = 'GET-'
+ENTRY_SUFFIX = '.json'
+
+# Objects that practically never change during a play and may be served without revalidation.
+STABLE_RESOURCE_PATTERN = re.compile(r'^/subscriptions/[^/]+(/resourcegroups/[^/]+)?$')
+
+# Long-running operation status endpoints must always hit the wire.
+UNCACHEABLE_PATH_PATTERN = re.compile(r'/(operations|operationresults|operationstatuses|azureasyncoperations)(/|$)')
+
+WRITE_METHODS = ('PUT', 'PATCH', 'DELETE', 'POST')
+
+
+def _body_etag(content):
+    # most Resource Manager resources only return their etag in the body
+    try:
+        body = json.loads(content.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        return None
+    return body.get('etag') if isinstance(body, dict) else None
+
+
+def _normalize_path(url):
+    path = urlparse.urlparse(url).path.rstrip('/').lower()
+    return path or '/'
+
+
+def _normalize_query(url):
+    # api-version is part of the query, so different api versions never share an entry
+    query = urlparse.parse_qsl(urlparse.urlparse(url).query, keep_blank_values=True)
+    return urlparse.urlencode(sorted((k.lower(), v) for k, v in query))
+
+
+def _request_url(request):
+    # msrest 0.4 keeps query parameters on request.params, later releases fold them into request.url
+    params = getattr(request, 'params', None)
+    if not params:
+        return request.url
+    separator = '&' if '?' in request.url else '?'
+    return request.url + separator + urlparse.urlencode(sorted(params.items()))
+
+
+def _provider_root_depth(segments):
+    '''
+    Return the number of leading path segments that sit above the first resource provider
+    type, e.g. ['subscriptions', 'x', 'resourcegroups', 'y', 'providers', 'microsoft.network'].
+    '''
+    for index, segment in enumerate(segments):
+        if segment == 'providers':
+            return index + 2
+    return len(segments)
+
+
+class AzureRMHttpCache(object):
+    '''
+    Cache of successful GET responses keyed by resource path and query string (including api-version).
+    '''
+
+    def __init__(self, path, ttl=HTTP_CACHE_DEFAULT_TTL, max_size=HTTP_CACHE_DEFAULT_MAX_SIZE):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.ttl = ttl
+        self.max_size = max_size
+        # upper bound of the cache size, None until the first eviction walked the tree
+        self.size = None
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                if not os.path.isdir(self.path):
+                    raise
+
+    @classmethod
+    def from_environment(cls):
+        '''
+        Build a cache from the AZURE_RM_HTTP_CACHE* environment variables. Returns None when caching is disabled.
+        '''
+        path = os.environ.get(HTTP_CACHE_DIR_ENV)
+        if not path:
+            return None
+        ttl = int(os.environ.get(HTTP_CACHE_TTL_ENV, HTTP_CACHE_DEFAULT_TTL))
+        max_size = int(os.environ.get(HTTP_CACHE_MAX_SIZE_ENV, HTTP_CACHE_DEFAULT_MAX_SIZE))
+        return cls(path, ttl=ttl, max_size=max_size)
+
+    def _resource_dir(self, resource_path):
+        segments = [urlparse.quote(s, safe='') for s in resource_path.split('/') if s]
+        return os.path.join(self.path, *segments) if segments else self.path
+
+    def _entry_file(self, url):
+        resource_path = _normalize_path(url)
+        digest = hashlib.sha1(_normalize_query(url).encode('utf-8')).hexdigest()
+        return os.path.join(self._resource_dir(resource_path), ENTRY_PREFIX + digest + ENTRY_SUFFIX)
+
+    @staticmethod
+    def is_cacheable(method, url):
+        return method.upper() == 'GET' and not UNCACHEABLE_PATH_PATTERN.search(_normalize_path(url))
+
+    def is_stable(self, url):
+        return bool(STABLE_RESOURCE_PATTERN.match(_normalize_path(url)))
+
+    def lookup(self, url):
+        '''
+        Return the cached entry for url, or None.
+
+        :param url: request URL, including the api-version query parameter
+        :return: dict with etag, stored_at, status, headers and body keys
+        '''
+        entry_file = self._entry_file(url)
+        try:
+            with open(entry_file, 'r') as f:
+                entry = json.load(f)
+            # mtime tracks the last use for LRU eviction
+            os.utime(entry_file, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return entry
+
+    def is_fresh(self, url, entry):
+        return self.ttl > 0 and self.is_stable(url) and time.time() - entry.get('stored_at', 0) < self.ttl
+
+    def store(self, url, response, previous=None):
+        '''
+        Save a 200 response. Responses without a body are not cached. A response with the ETag of the previous entry
+        only refreshes its age.
+
+        :param url: request URL
+        :param response: requests.Response
+        :param previous: entry sent for revalidation, if any
+        :return: stored entry or None
+        '''
+        content = response.content
+        if response.status_code != 200 or not content:
+            return None
+        etag = response.headers.get('ETag') or _body_etag(content)
+        if previous and etag and previous.get('etag') == etag:
+            self.touch(url, previous)
+            return previous
+        entry = dict(
+            url=url,
+            etag=etag,
+            stored_at=time.time(),
+            status=response.status_code,
+            headers=dict((k, v) for k, v in response.headers.items()
+                         if k.lower() in ('content-type', 'etag', 'x-ms-request-id')),
+            body=base64.b64encode(content).decode('ascii'),
+        )
+        entry_file = self._entry_file(url)
+        entry_dir = os.path.dirname(entry_file)
+        try:
+            if not os.path.isdir(entry_dir):
+                os.makedirs(entry_dir)
+            data = json.dumps(entry)
+            fd, tmp_path = tempfile.mkstemp(dir=entry_dir, prefix='.tmp-')
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+            os.rename(tmp_path, entry_file)
+        except (IOError, OSError):
+            # the cache is best effort; a concurrent invalidation may have removed the directory
+            return None
+        # replaced and invalidated entries are not subtracted, so the count only errs towards an early walk
+        if self.size is not None:
+            self.size += len(data)
+        if self.size is None or self.size > self.max_size:
+            self.evict()
+        return entry
+
+    def touch(self, url, entry):
+        '''
+        Refresh the age of an entry after a successful revalidation.
+        '''
+        entry['stored_at'] = time.time()
+        entry_file = self._entry_file(url)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_file), prefix='.tmp-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.rename(tmp_path, entry_file)
+        except (IOError, OSError):
+            pass
+
+    def invalidate(self, url):
+        '''
+        Drop every entry that a write to url may have changed: the resource itself, anything nested
+        below it, and the parent resources and collections inside the same resource provider.
+        '''
+        resource_path = _normalize_path(url)
+        shutil.rmtree(self._resource_dir(resource_path), ignore_errors=True)
+
+        segments = [s for s in resource_path.split('/') if s]
+        root_depth = _provider_root_depth(segments)
+        for depth in range(len(segments) - 1, root_depth - 1, -1):
+            self._drop_entries(self._resource_dir('/' + '/'.join(segments[:depth])))
+
+    @staticmethod
+    def _drop_entries(directory):
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith(ENTRY_PREFIX):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+    def evict(self):
+        '''
+        Remove least recently used entries until the cache fits within max_size, leaving a tenth of it free. Walks
+        the whole cache tree, so store() only calls it on its first write and when the tracked size passes max_size.
+        '''
+        entries = []
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for name in filenames:
+                if not name.startswith(ENTRY_PREFIX):
+                    continue
+                entry_file = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(entry_file)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry_file))
+                total += stat.st_size
+
+        if total <= self.max_size:
+            self.size = total
+            return
+
+        # trim below the limit, otherwise every following write would walk the tree again
+        low_water = self.max_size - self.max_size // 10
+        entries.sort()
+        for mtime, size, entry_file in entries:
+            try:
+                os.remove(entry_file)
+            except OSError:
+                pass
+            total -= size
+            if total <= low_water:
+                break
+        self.size = total
+
+    @staticmethod
+    def build_response(request, entry):
+        '''
+        Rebuild a requests.Response from a cached entry so the SDK deserializes it as usual.
+        '''
+        response = Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = base64.b64decode(entry['body'])
+        response.encoding = 'utf-8'
+        response.url = entry['url']
+        response.request = request
+        response.reason = 'OK'
+        response.from_cache = True
+        return response
+
+    def wrap_send(self, send):
+        '''
+        Wrap a msrest ServiceClient.send method with cache lookup, ETag revalidation and write invalidation.
+        '''
+        cache = self
+
+        def send_with_cache(request, headers=None, content=None, **config):
+            method = (request.method or '').upper()
+            url = _request_url(request)
+
+            if method in WRITE_METHODS:
+                cache.invalidate(url)
+                return send(request, headers, content, **config)
+
+            if not cache.is_cacheable(method, url) or config.get('stream'):
+                return send(request, headers, content, **config)
+
+            entry = cache.lookup(url)
+            if entry and cache.is_fresh(url, entry):
+                return cache.build_response(request, entry)
+
+            if entry and entry.get('etag'):
+                headers = dict(headers or {})
+                headers['If-None-Match'] = entry['etag']
+
+            response = send(request, headers, content, **config)
+            if entry and response.status_code == 304:
+                cache.touch(url, entry)
+                return cache.build_response(request, entry)
+            cache.store(url, response, entry)
+            return response
+
+        return send_with_cache
@@ -0,0 +1,136 @@
+# Copyright (c) 2018 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+'''
+Private IP address allocation for static NIC addressing.
+
+SubnetAddressBitmap keeps one bit per address of a subnet and hands out free addresses in order.
+AddressReservations records handed out addresses in a JSON file guarded by an exclusive lock, so
+modules running in parallel forks on the same host never pick the same address before Azure lists it
+in the subnet. Reservations expire after AZURE_RM_IP_RESERVATION_TTL seconds (default 600) and live
+in AZURE_RM_IP_RESERVATION_DIR (defaults to the system temporary directory).
+'''
+
+import hashlib
+import json
+import os
+import socket
+import struct
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on this platform; reservations still apply within one process
+    fcntl = None
+
+RESERVATION_DIR_ENV = 'AZURE_RM_IP_RESERVATION_DIR'
+RESERVATION_TTL_ENV = 'AZURE_RM_IP_RESERVATION_TTL'
+DEFAULT_RESERVATION_TTL = 600
+
+# Azure keeps the network address, the gateway, two DNS addresses and the broadcast address of every subnet
+RESERVED_OFFSETS_START = 4
+RESERVED_OFFSETS_END = 1
+
+
+def ip_to_int(address):
+    return struct.unpack('!I', socket.inet_aton(address))[0]
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+
+class SubnetAddressBitmap(object):
+
+    def __init__(self, address_prefix):
+        address, length = address_prefix.split('/')
+        self.size = 1 << (32 - int(length))
+        self.first = ip_to_int(address) & ~(self.size - 1) & 0xffffffff
+        self.bits = bytearray((self.size + 7) // 8)
+        self.cursor = 0
+        for offset in list(range(min(RESERVED_OFFSETS_START, self.size))) + [self.size - RESERVED_OFFSETS_END]:
+            self._set(offset)
+
+    def _set(self, offset):
+        self.bits[offset >> 3] |= 1 << (offset & 7)
+
+    def _is_set(self, offset):
+        return self.bits[offset >> 3] & (1 << (offset & 7))
+
+    def mark(self, address):
+        '''
+        Mark an address as used. Addresses outside the subnet are ignored.
+        '''
+        offset = ip_to_int(address) - self.first
+        if 0 <= offset < self.size:
+            self._set(offset)
+
+    def allocate(self, count):
+        '''
+        Return count free addresses and mark them as used. Full bytes are skipped, so every address costs
+        O(1) amortized.
+
+        :raises ValueError: when the subnet has fewer than count free addresses
+        '''
+        addresses = []
+        while len(addresses) < count:
+            index = self.cursor >> 3
+            while index < len(self.bits) and self.bits[index] == 0xff:
+                index += 1
+            offset = max(self.cursor, index << 3)
+            while offset < self.size and self._is_set(offset):
+                offset += 1
+            if offset >= self.size:
+                raise ValueError("only {0} of {1} requested addresses are free".format(len(addresses), count))
+            self._set(offset)
+            self.cursor = offset + 1
+            addresses.append(int_to_ip(self.first + offset))
+        return addresses
+
+
+class AddressReservations(object):
+    '''
+    Context manager holding the reservations of one subnet under an exclusive lock.
+    '''
+
+    def __init__(self, subnet_id, directory=None, ttl=None):
+        directory = os.path.expanduser(directory or os.environ.get(RESERVATION_DIR_ENV) or tempfile.gettempdir())
+        name = 'azure-ip-{0}'.format(hashlib.sha1(subnet_id.lower().encode('utf-8')).hexdigest())
+        self.path = os.path.join(directory, name + '.json')
+        self.lock_path = os.path.join(directory, name + '.lock')
+        self.ttl = ttl if ttl is not None else int(os.environ.get(RESERVATION_TTL_ENV, DEFAULT_RESERVATION_TTL))
+        self.addresses = dict()
+        self._lock = None
+
+    def __enter__(self):
+        self._lock = open(self.lock_path, 'a')
+        if fcntl:
+            fcntl.flock(self._lock.fileno(), fcntl.LOCK_EX)
+        now = time.time()
+        try:
+            with open(self.path) as f:
+                self.addresses = dict((address, expires) for address, expires in json.load(f).items() if expires > now)
+        except (IOError, OSError, ValueError):
+            self.addresses = dict()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        try:
+            if exc_type is None:
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.tmp-')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.addresses, f)
+                os.rename(tmp_path, self.path)
+        finally:
+            if fcntl:
+                fcntl.flock(self._lock.fileno(), fcntl.LOCK_UN)
+            self._lock.close()
+        return False
+
+    def reserve(self, addresses):
+        expires = time.time() + self.ttl
+        for address in addresses:
+            self.addresses[address] = expires
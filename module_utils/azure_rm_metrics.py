@@ -0,0 +1,192 @@
+# Copyright (c) 2018 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+'''
+Opt-in per-call instrumentation for Azure Resource Manager modules.
+
+Every request sent through a management client is timed and grouped by HTTP method and resource type,
+so a slow task can be broken down into auth, SDK import, reads, writes and long-running operation waits.
+'''
+
+import json
+import os
+import threading
+import time
+
+import ansible.module_utils.six.moves.urllib.parse as urlparse
+
+METRICS_ENV = 'AZURE_RM_METRICS'
+METRICS_TRACE_ENV = 'AZURE_RM_METRICS_TRACE'
+
+# Upper bounds, in seconds, of the latency histogram buckets. The last bucket is unbounded.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def operation_name(method, url):
+    '''
+    Collapse a request into a stable operation label by dropping resource names from the path, e.g.
+    "GET Microsoft.Network/virtualNetworks/subnets" or "PUT resourceGroups".
+
+    :param method: HTTP method
+    :param url: request URL
+    :return: str
+    '''
+    segments = [s for s in urlparse.urlparse(url).path.split('/') if s]
+    lowered = [s.lower() for s in segments]
+    if 'providers' in lowered:
+        index = len(lowered) - 1 - lowered[::-1].index('providers')
+        namespace = segments[index + 1] if index + 1 < len(segments) else ''
+        types = segments[index + 2::2]
+        label = '/'.join([namespace] + types)
+    else:
+        # subscription and resource group level calls: keep the collection names only
+        label = '/'.join(segments[0::2])
+    return '{0} {1}'.format(method.upper(), label)
+
+
+def _content_length(content):
+    if content is None:
+        return 0
+    if isinstance(content, (bytes, bytearray)):
+        return len(content)
+    if isinstance(content, dict) or isinstance(content, list):
+        return len(json.dumps(content))
+    try:
+        return len(content)
+    except TypeError:
+        return 0
+
+
+def _retry_count(response):
+    # requests keeps the urllib3 response, whose Retry object records every retried attempt
+    retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    history = getattr(retries, 'history', None)
+    return len(history) if history else 0
+
+
+class AzureRMMetrics(object):
+    '''
+    Thread-safe collector of request and poller timings for a single module run.
+    '''
+
+    def __init__(self, module_name, trace_path=None):
+        self.module_name = module_name
+        self.trace_path = trace_path
+        self.started = time.time()
+        self.phases = dict()
+        self.operations = dict()
+        self.pollers = dict(count=0, wait=0.0)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, module_name):
+        '''
+        Build a collector when AZURE_RM_METRICS is set to a true value. Returns None otherwise.
+        '''
+        enabled = os.environ.get(METRICS_ENV, '').lower()
+        if enabled not in ('1', 'true', 'yes', 'on'):
+            return None
+        return cls(module_name, trace_path=os.environ.get(METRICS_TRACE_ENV))
+
+    def record_phase(self, name, duration):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    def record_poller(self, duration):
+        with self._lock:
+            self.pollers['count'] += 1
+            self.pollers['wait'] += duration
+        self._trace(dict(event='poller', duration=round(duration, 4)))
+
+    def record_request(self, method, url, status, duration, bytes_sent, bytes_received, retries, cached=False):
+        name = operation_name(method, url)
+        with self._lock:
+            stats = self.operations.get(name)
+            if stats is None:
+                stats = dict(count=0, errors=0, retries=0, cache_hits=0, total=0.0, max=0.0,
+                             bytes_sent=0, bytes_received=0, histogram=[0] * (len(LATENCY_BUCKETS) + 1))
+                self.operations[name] = stats
+            stats['count'] += 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+            stats['bytes_sent'] += bytes_sent
+            stats['bytes_received'] += bytes_received
+            stats['retries'] += retries
+            if cached:
+                stats['cache_hits'] += 1
+            if status is None or status >= 400:
+                stats['errors'] += 1
+            bucket = len(LATENCY_BUCKETS)
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    bucket = index
+                    break
+            stats['histogram'][bucket] += 1
+        self._trace(dict(event='request', operation=name, status=status, duration=round(duration, 4),
+                         bytes_sent=bytes_sent, bytes_received=bytes_received, retries=retries, cached=cached))
+
+    def _trace(self, record):
+        if not self.trace_path:
+            return
+        record['module'] = self.module_name
+        record['time'] = round(time.time(), 4)
+        record['pid'] = os.getpid()
+        try:
+            with open(self.trace_path, 'a') as trace_file:
+                trace_file.write(json.dumps(record) + '\n')
+        except (IOError, OSError):
+            # tracing must never break the module
+            self.trace_path = None
+
+    def summary(self):
+        '''
+        Return the collected metrics as a JSON-serializable dict for the module result.
+        '''
+        with self._lock:
+            operations = dict()
+            requests_total = dict(count=0, total=0.0)
+            for name, stats in self.operations.items():
+                operation = dict(stats)
+                operation['histogram'] = dict(zip(['le_{0}'.format(b) for b in LATENCY_BUCKETS] + ['le_inf'],
+                                                  stats['histogram']))
+                operation['mean'] = round(stats['total'] / stats['count'], 4) if stats['count'] else 0.0
+                operation['total'] = round(stats['total'], 4)
+                operation['max'] = round(stats['max'], 4)
+                operations[name] = operation
+                requests_total['count'] += stats['count']
+                requests_total['total'] += stats['total']
+            requests_total['total'] = round(requests_total['total'], 4)
+            return dict(
+                module=self.module_name,
+                elapsed=round(time.time() - self.started, 4),
+                phases=dict((k, round(v, 4)) for k, v in self.phases.items()),
+                requests=requests_total,
+                operations=operations,
+                pollers=dict(count=self.pollers['count'], wait=round(self.pollers['wait'], 4)),
+            )
+
+    def wrap_send(self, send):
+        '''
+        Wrap a msrest ServiceClient.send method to time each request.
+        '''
+        metrics = self
+
+        def send_with_metrics(request, headers=None, content=None, **config):
+            start = time.time()
+            response = None
+            try:
+                response = send(request, headers, content, **config)
+                return response
+            finally:
+                duration = time.time() - start
+                url = request.url
+                status = getattr(response, 'status_code', None)
+                received = 0
+                if response is not None and not config.get('stream'):
+                    received = len(response.content or b'')
+                sent = _content_length(content if content is not None else getattr(request, 'data', None))
+                metrics.record_request(request.method or '', url, status, duration, sent, received,
+                                       _retry_count(response), cached=getattr(response, 'from_cache', False))
+
+        return send_with_metrics
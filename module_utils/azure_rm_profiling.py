@@ -0,0 +1,91 @@
+# Copyright (c) 2018 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+'''
+Opt-in cProfile/tracemalloc profiling of AzureRMModuleBase.exec_module.
+
+Set AZURE_RM_PROFILE to "cpu" or "mem" to write one profile per task to AZURE_RM_PROFILE_DIR
+(defaults to the system temporary directory). Profiles are named <module>-<timestamp>-<pid>.pstats
+or .tracemalloc and can be merged across a play with tests/benchmark/aggregate_profiles.py.
+'''
+
+import os
+import tempfile
+import time
+
+try:
+    import cProfile
+except ImportError:
+    cProfile = None
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2 has no tracemalloc; memory profiling is then unavailable
+    tracemalloc = None
+
+PROFILE_ENV = 'AZURE_RM_PROFILE'
+PROFILE_DIR_ENV = 'AZURE_RM_PROFILE_DIR'
+
+PROFILE_EXTENSIONS = dict(cpu='.pstats', mem='.tracemalloc')
+
+# Frames kept per allocation in memory snapshots
+TRACEMALLOC_FRAMES = 10
+
+
+class AzureRMProfiler(object):
+
+    def __init__(self, mode, directory, module_name):
+        self.mode = mode
+        self.directory = directory
+        self.module_name = module_name
+        self.path = None
+
+    @classmethod
+    def from_environment(cls, module_name):
+        '''
+        Build a profiler from AZURE_RM_PROFILE and AZURE_RM_PROFILE_DIR. Returns None when profiling is disabled.
+
+        :raises ValueError: for an unknown mode or when the mode is not supported by this interpreter
+        '''
+        mode = os.environ.get(PROFILE_ENV, '').lower()
+        if not mode:
+            return None
+        if mode not in PROFILE_EXTENSIONS:
+            raise ValueError("{0} must be one of {1}, not {2}".format(PROFILE_ENV, ', '.join(sorted(PROFILE_EXTENSIONS)), mode))
+        if mode == 'cpu' and cProfile is None:
+            raise ValueError("cProfile is not available in this Python interpreter")
+        if mode == 'mem' and tracemalloc is None:
+            raise ValueError("tracemalloc requires Python 3.4 or later")
+        directory = os.path.expanduser(os.environ.get(PROFILE_DIR_ENV) or tempfile.gettempdir())
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        return cls(mode, directory, module_name)
+
+    def _output_path(self):
+        timestamp = time.strftime('%Y%m%dT%H%M%S', time.localtime())
+        name = '{0}-{1}-{2}{3}'.format(self.module_name, timestamp, os.getpid(), PROFILE_EXTENSIONS[self.mode])
+        return os.path.join(self.directory, name)
+
+    def run(self, func, *args, **kwargs):
+        '''
+        Call func under the profiler and write the result, also when func exits through fail_json.
+        '''
+        self.path = self._output_path()
+        if self.mode == 'cpu':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                profiler.dump_stats(self.path)
+
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            snapshot.dump(self.path)
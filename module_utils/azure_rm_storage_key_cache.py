@@ -0,0 +1,97 @@
+# Copyright (c) 2018 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+'''
+Opt-in encrypted on-disk cache of storage account keys.
+
+Set AZURE_RM_STORAGE_KEY_CACHE_SECRET to a long random string to keep the keys returned by
+storage_accounts.list_keys for AZURE_RM_STORAGE_KEY_CACHE_TTL seconds (default 300), so the tasks of a
+play call the management API once per account. Entries are Fernet tokens encrypted with a key derived
+from the secret and are stored in AZURE_RM_STORAGE_KEY_CACHE_DIR (defaults to the system temporary
+directory). Requires the cryptography package.
+'''
+
+import base64
+import hashlib
+import hmac
+import os
+import tempfile
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+    InvalidToken = ValueError
+
+KEY_CACHE_SECRET_ENV = 'AZURE_RM_STORAGE_KEY_CACHE_SECRET'
+KEY_CACHE_DIR_ENV = 'AZURE_RM_STORAGE_KEY_CACHE_DIR'
+KEY_CACHE_TTL_ENV = 'AZURE_RM_STORAGE_KEY_CACHE_TTL'
+
+KEY_CACHE_DEFAULT_TTL = 300
+
+
+class AzureRMStorageKeyCache(object):
+
+    def __init__(self, secret, directory, ttl):
+        secret = secret.encode('utf-8')
+        self.fernet = Fernet(base64.urlsafe_b64encode(hashlib.sha256(secret).digest()))
+        # entry names are keyed too, so the cache does not list the accounts it holds
+        self.name_key = hashlib.sha256(b'names' + secret).digest()
+        self.directory = directory
+        self.ttl = ttl
+
+    @classmethod
+    def from_environment(cls):
+        '''
+        Build a cache from the AZURE_RM_STORAGE_KEY_CACHE_* variables. Returns None when no secret is set.
+
+        :raises ValueError: when the TTL is invalid or cryptography is missing
+        '''
+        secret = os.environ.get(KEY_CACHE_SECRET_ENV)
+        if not secret:
+            return None
+        if Fernet is None:
+            raise ValueError("the cryptography package is required to encrypt cached keys")
+        try:
+            ttl = int(os.environ.get(KEY_CACHE_TTL_ENV, KEY_CACHE_DEFAULT_TTL))
+        except ValueError:
+            raise ValueError("{0} must be a number of seconds".format(KEY_CACHE_TTL_ENV))
+        if ttl <= 0:
+            return None
+        directory = os.path.expanduser(os.environ.get(KEY_CACHE_DIR_ENV) or tempfile.gettempdir())
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        return cls(secret, directory, ttl)
+
+    def _path(self, key):
+        name = hmac.new(self.name_key, '/'.join(key).encode('utf-8'), hashlib.sha256).hexdigest()
+        return os.path.join(self.directory, 'azure-storage-key-{0}'.format(name))
+
+    def get(self, key):
+        '''
+        :param key: tuple of subscription, resource group and account name
+        :return: the account key, or None when it is missing, expired or unreadable
+        '''
+        try:
+            with open(self._path(key), 'rb') as f:
+                return self.fernet.decrypt(f.read(), ttl=self.ttl).decode('utf-8')
+        except (IOError, OSError, InvalidToken):
+            return None
+
+    def set(self, key, value):
+        try:
+            # mkstemp creates the file readable by its owner only
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.fernet.encrypt(value.encode('utf-8')))
+            os.rename(tmp_path, self._path(key))
+        except (IOError, OSError):
+            # the cache only saves requests
+            pass
+
+    def invalidate(self, key):
+        try:
+            os.remove(self._path(key))
+        except (IOError, OSError):
+            pass
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2018 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+'''
+Merge the profiles written with AZURE_RM_PROFILE=cpu|mem and list the hottest functions.
+
+    python tests/benchmark/aggregate_profiles.py /tmp/azure-profiles
+    python tests/benchmark/aggregate_profiles.py /tmp/azure-profiles --module azure_rm_appgw --top 40
+    python tests/benchmark/aggregate_profiles.py /tmp/azure-profiles --sort tottime --output merged.pstats
+
+CPU profiles (*.pstats) are combined with pstats and sorted by cumulative time by default. Memory
+snapshots (*.tracemalloc) are combined by allocation site and sorted by allocated size.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import glob
+import os
+import pstats
+import sys
+from collections import defaultdict
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def find_profiles(paths, extension, module=None):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, '*' + extension)))
+        elif path.endswith(extension):
+            files.append(path)
+    if module:
+        files = [f for f in files if os.path.basename(f).startswith(module + '-')]
+    return sorted(files)
+
+
+def module_counts(files):
+    counts = defaultdict(int)
+    for f in files:
+        counts[os.path.basename(f).rsplit('-', 2)[0]] += 1
+    return counts
+
+
+def aggregate_cpu(files, sort, top, output):
+    stats = pstats.Stats(files[0])
+    for f in files[1:]:
+        stats.add(f)
+    if output:
+        stats.dump_stats(output)
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+
+
+def aggregate_memory(files, top, group_by):
+    if tracemalloc is None:
+        raise SystemExit('Memory snapshots require Python 3.4 or later')
+    sizes = defaultdict(int)
+    counts = defaultdict(int)
+    for f in files:
+        snapshot = tracemalloc.Snapshot.load(f).filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        for statistic in snapshot.statistics(group_by):
+            frame = statistic.traceback[0]
+            key = '{0}:{1}'.format(frame.filename, frame.lineno)
+            sizes[key] += statistic.size
+            counts[key] += statistic.count
+
+    total = sum(sizes.values())
+    print('{0} snapshots, {1:.1f} KiB retained at the end of exec_module\n'.format(len(files), total / 1024.0))
+    print('{0:>12} {1:>10} {2:>8}  {3}'.format('KiB', 'blocks', 'share', 'allocation site'))
+    for key in sorted(sizes, key=sizes.get, reverse=True)[:top]:
+        share = 100.0 * sizes[key] / total if total else 0.0
+        print('{0:>12.1f} {1:>10} {2:>7.1f}%  {3}'.format(sizes[key] / 1024.0, counts[key], share, key))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='profile files or directories (AZURE_RM_PROFILE_DIR)')
+    parser.add_argument('--mode', choices=['cpu', 'mem'], help='profile type; detected from the files by default')
+    parser.add_argument('--module', help='only merge profiles of this module, e.g. azure_rm_virtualmachine')
+    parser.add_argument('--top', type=int, default=25, help='number of entries to list')
+    parser.add_argument('--sort', default='cumulative', help='pstats sort key for CPU profiles')
+    parser.add_argument('--group-by', default='lineno', choices=['lineno', 'filename', 'traceback'],
+                        help='tracemalloc grouping for memory snapshots')
+    parser.add_argument('--output', help='write the merged CPU profile to this pstats file')
+    args = parser.parse_args()
+
+    cpu_files = find_profiles(args.paths, '.pstats', args.module)
+    mem_files = find_profiles(args.paths, '.tracemalloc', args.module)
+    mode = args.mode or ('cpu' if cpu_files else 'mem')
+    files = cpu_files if mode == 'cpu' else mem_files
+    if not files:
+        print('No {0} profiles found'.format(mode), file=sys.stderr)
+        sys.exit(1)
+
+    print('Profiles per module: ' + ', '.join('{0}={1}'.format(k, v) for k, v in sorted(module_counts(files).items())))
+    if mode == 'cpu':
+        aggregate_cpu(files, args.sort, args.top, args.output)
+    else:
+        aggregate_memory(files, args.top, args.group_by)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,848 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2018 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+'''
+Offline stand-in for the Azure Resource Manager, AAD token and blob storage endpoints.
+
+The server keeps an in-memory resource store so that the modules in this role can run their full
+create/read/update/delete paths without a subscription. Latency per HTTP method and the number of
+long-running operation polls are scriptable, either on the command line or per scenario through
+the control endpoints:
+
+    POST /_standin/reset      clear the store and request counters
+    POST /_standin/configure  {"latency": {"GET": 0.05}, "lro_polls": 2, "resources": [...], "fixtures": {...}}
+
+Each entry of "resources" is {"path": ..., "body": ...}, optionally with "count": N to create N copies
+with {i} in the path and body replaced by the copy index.
+    GET  /_standin/stats      request counters
+
+Two listeners are started: an HTTPS listener for ARM and AAD, and a plain HTTP proxy listener that
+accepts CONNECT tunnels. Pointing HTTPS_PROXY at the proxy listener routes blob traffic for
+<account>.blob.core.windows.net to the same store.
+
+Clients are pointed at the server with:
+
+    AZURE_CLOUD_ENVIRONMENT=https://127.0.0.1:<port>  (the metadata endpoint)
+    AZURE_TENANT=adfs                                 (skips AAD authority discovery)
+    REQUESTS_CA_BUNDLE=<certfile>
+    HTTPS_PROXY=http://127.0.0.1:<proxy port>, NO_PROXY=127.0.0.1,localhost
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import base64
+import copy
+import hashlib
+import json
+import re
+import ssl
+import threading
+import time
+import uuid
+
+from email.utils import formatdate
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+from xml.sax.saxutils import escape as xml_escape
+
+OPERATIONS_PATH = '/_standin/operations/'
+BLOB_HOST_PATTERN = re.compile(r'^(?P<account>[^.]+)\.blob\.')
+
+# Read-only properties that the service fills in and the modules rely on
+RESOURCE_DEFAULTS = {
+    'microsoft.resources/deployments': dict(dependencies=[], outputs=dict(), mode='Incremental'),
+}
+
+
+def _now_rfc1123():
+    return formatdate(usegmt=True)
+
+
+def _etag():
+    return 'W/"{0}"'.format(uuid.uuid4())
+
+
+class ResourceStore(object):
+    '''
+    Thread-safe store of ARM resources and blob containers.
+    '''
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.resources = dict()
+            self.fixtures = dict()
+            self.operations = dict()
+            self.containers = dict()
+            self.latency = dict()
+            self.lro_polls = 0
+            self.stats = dict(total=0, by_method=dict(), by_kind=dict())
+
+    def configure(self, config):
+        with self.lock:
+            if 'latency' in config:
+                self.latency = dict((k.upper(), float(v)) for k, v in config['latency'].items())
+            if 'lro_polls' in config:
+                self.lro_polls = int(config['lro_polls'])
+            for path, body in config.get('fixtures', {}).items():
+                self.fixtures[path.lower()] = body
+            for resource in config.get('resources', []):
+                # "count": N repeats an entry, substituting {i} in its path and body
+                template = json.dumps(dict(path=resource['path'], body=resource['body']))
+                for index in range(resource.get('count', 1)):
+                    expanded = json.loads(template.replace('{i}', str(index)))
+                    self.put_resource(expanded['path'], expanded['body'])
+            for container in config.get('containers', []):
+                self.containers.setdefault(container['account'], dict())[container['name']] = \
+                    dict(metadata=container.get('metadata', {}), blobs=dict(), etag=_etag(),
+                         modified=_now_rfc1123())
+
+    def count(self, method, kind):
+        with self.lock:
+            self.stats['total'] += 1
+            self.stats['by_method'][method] = self.stats['by_method'].get(method, 0) + 1
+            self.stats['by_kind'][kind] = self.stats['by_kind'].get(kind, 0) + 1
+
+    def delay(self, method):
+        seconds = self.latency.get(method, self.latency.get('*', 0.0))
+        if seconds:
+            time.sleep(seconds)
+
+    # ARM resources
+
+    @staticmethod
+    def resource_type(path):
+        segments = [s for s in path.split('/') if s]
+        lowered = [s.lower() for s in segments]
+        if 'providers' not in lowered:
+            return 'Microsoft.Resources/' + '/'.join(segments[-2::-2][::-1])
+        index = lowered.index('providers')
+        return '/'.join([segments[index + 1]] + segments[index + 2::2])
+
+    def put_resource(self, path, body):
+        with self.lock:
+            path = path.rstrip('/')
+            body = body if isinstance(body, dict) else dict()
+            existing = self.resources.get(path.lower())
+            body['id'] = existing['id'] if existing else path
+            body['name'] = path.split('/')[-1]
+            body['type'] = self.resource_type(path)
+            body['etag'] = _etag()
+            if not path.lower().startswith('/subscriptions/') or '/providers/' in path.lower():
+                properties = body.setdefault('properties', dict())
+                properties['provisioningState'] = 'Succeeded'
+                properties.setdefault('resourceGuid', str(uuid.uuid4()))
+                for key, value in RESOURCE_DEFAULTS.get(body['type'].lower(), dict()).items():
+                    properties.setdefault(key, copy.deepcopy(value))
+                self._assign_child_ids(body['id'], properties)
+            else:
+                body.setdefault('properties', dict())['provisioningState'] = 'Succeeded'
+            if not self._sync_parent(path, body):
+                self.resources[path.lower()] = body
+            return body
+
+    def _assign_child_ids(self, parent_id, properties):
+        # embedded child collections such as subnets, securityRules or routes get ids of their own
+        for key, value in properties.items():
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, dict) and item.get('name') and 'properties' in item:
+                        item['id'] = '{0}/{1}/{2}'.format(parent_id, key, item['name'])
+                        item['etag'] = _etag()
+                        item['properties'].setdefault('provisioningState', 'Succeeded')
+
+    def _parent(self, path):
+        segments = path.rstrip('/').split('/')
+        if len(segments) < 3:
+            return None, None, None
+        parent_path = '/'.join(segments[:-2])
+        parent = self.resources.get(parent_path.lower())
+        return parent, segments[-2], segments[-1]
+
+    @staticmethod
+    def _children(parent, collection, create=False):
+        properties = parent.setdefault('properties', dict())
+        for key, value in properties.items():
+            if key.lower() == collection.lower() and isinstance(value, list):
+                return value
+        if not create:
+            return []
+        properties[collection] = []
+        return properties[collection]
+
+    def _sync_parent(self, path, body):
+        # child resources live embedded in their parent, the same way ARM returns them
+        parent, collection, name = self._parent(path)
+        if not parent or '/providers/' not in path.lower():
+            return False
+        children = self._children(parent, collection, create=True)
+        children[:] = [c for c in children if c.get('name', '').lower() != name.lower()]
+        children.append(dict((k, v) for k, v in body.items() if k in ('id', 'name', 'etag', 'properties')))
+        return True
+
+    def get_resource(self, path):
+        with self.lock:
+            path = path.rstrip('/')
+            if path.lower() in self.fixtures:
+                return self.fixtures[path.lower()]
+            resource = self.resources.get(path.lower())
+            if resource is not None:
+                return resource
+            parent, collection, name = self._parent(path)
+            if parent:
+                for child in self._children(parent, collection):
+                    if isinstance(child, dict) and child.get('name', '').lower() == name.lower():
+                        return child
+            return None
+
+    def list_resources(self, path):
+        with self.lock:
+            path = path.rstrip('/').lower()
+            if path in self.fixtures:
+                return self.fixtures[path]
+            items = []
+            depth = len(path.split('/')) + 1
+            subscription_scope = '/resourcegroups/' not in path and '/providers/' in path
+            for resource_id, resource in sorted(self.resources.items()):
+                candidate = resource_id
+                if subscription_scope:
+                    candidate = re.sub(r'/resourcegroups/[^/]+', '', resource_id)
+                if candidate.startswith(path + '/') and len(candidate.split('/')) == depth:
+                    items.append(resource)
+            if not items:
+                parent = self.resources.get('/'.join(path.split('/')[:-1]))
+                if parent:
+                    items = [c for c in self._children(parent, path.split('/')[-1])
+                             if isinstance(c, dict) and c.get('name')]
+            return dict(value=items)
+
+    def delete_resource(self, path):
+        with self.lock:
+            path = path.rstrip('/').lower()
+            removed = False
+            for resource_id in list(self.resources):
+                if resource_id == path or resource_id.startswith(path + '/'):
+                    del self.resources[resource_id]
+                    removed = True
+            parent, collection, name = self._parent(path)
+            if parent:
+                children = self._children(parent, collection)
+                kept = [c for c in children if c.get('name', '').lower() != name.lower()]
+                removed = removed or len(kept) != len(children)
+                children[:] = kept
+            return removed
+
+    def start_operation(self):
+        with self.lock:
+            operation_id = str(uuid.uuid4())
+            self.operations[operation_id] = self.lro_polls
+            return operation_id
+
+    def poll_operation(self, operation_id):
+        with self.lock:
+            remaining = self.operations.get(operation_id, 0)
+            if remaining > 0:
+                self.operations[operation_id] = remaining - 1
+                return 'InProgress'
+            self.operations.pop(operation_id, None)
+            return 'Succeeded'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AzureStandIn/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _json_body(self, raw):
+        try:
+            return json.loads(raw.decode('utf-8')) if raw else dict()
+        except ValueError:
+            return dict()
+
+    def _send(self, status, body=None, headers=None, content_type='application/json; charset=utf-8'):
+        if body is None:
+            payload = b''
+        elif isinstance(body, bytes):
+            payload = body
+        elif isinstance(body, str) and content_type.startswith('application/xml'):
+            payload = body.encode('utf-8')
+        else:
+            payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('x-ms-request-id', str(uuid.uuid4()))
+        self.send_header('Date', _now_rfc1123())
+        if payload or content_type:
+            self.send_header('Content-Type', content_type)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if payload and self.command != 'HEAD':
+            self.wfile.write(payload)
+
+    def _not_found(self, path):
+        self._send(404, dict(error=dict(code='ResourceNotFound',
+                                        message="The resource '{0}' was not found.".format(path))))
+
+    def _base_url(self):
+        return 'https://{0}'.format(self.headers.get('Host'))
+
+    def _dispatch(self):
+        host = self.headers.get('Host', '')
+        blob_host = BLOB_HOST_PATTERN.match(host)
+        url = urlparse(self.path)
+        kind = 'blob' if blob_host else 'arm'
+        if url.path.startswith(OPERATIONS_PATH):
+            kind = 'lro'
+        elif url.path.startswith('/_standin/'):
+            kind = 'control'
+        elif url.path.endswith('/oauth2/token') or url.path.startswith('/metadata/'):
+            kind = 'auth'
+        if kind != 'control':
+            self.store.count(self.command, kind)
+            self.store.delay(self.command)
+
+        if kind == 'blob':
+            return BlobHandler(self, blob_host.group('account')).handle()
+        if kind == 'control':
+            return self._control(url)
+        if kind == 'auth':
+            return self._auth(url)
+        if kind == 'lro':
+            status = self.store.poll_operation(url.path[len(OPERATIONS_PATH):])
+            return self._send(200, dict(status=status), headers={'Retry-After': '0'})
+        return self._arm(url)
+
+    do_GET = do_PUT = do_PATCH = do_POST = do_DELETE = do_HEAD = _dispatch
+
+    def do_CONNECT(self):
+        # blob traffic arrives through a proxy tunnel and is served with the same certificate
+        self.send_response(200, 'Connection Established')
+        self.end_headers()
+        self.wfile.flush()
+        try:
+            tunnel = self.server.tls_context.wrap_socket(self.connection, server_side=True)
+        except (ssl.SSLError, OSError):
+            self.close_connection = True
+            return
+        StandInHandler(tunnel, self.client_address, self.server)
+        self.close_connection = True
+
+    def _control(self, url):
+        body = self._json_body(self._read_body())
+        if url.path == '/_standin/reset':
+            self.store.reset()
+            return self._send(200, dict())
+        if url.path == '/_standin/configure':
+            self.store.configure(body)
+            return self._send(200, dict())
+        if url.path == '/_standin/stats':
+            with self.store.lock:
+                return self._send(200, copy.deepcopy(self.store.stats))
+        return self._not_found(url.path)
+
+    def _auth(self, url):
+        base = self._base_url()
+        if url.path.startswith('/metadata/endpoints'):
+            return self._send(200, dict(
+                galleryEndpoint=base,
+                graphEndpoint=base,
+                portalEndpoint=base,
+                authentication=dict(loginEndpoint=base, audiences=['https://management.core.windows.net/'])
+            ))
+        self._read_body()
+        now = int(time.time())
+        return self._send(200, dict(
+            token_type='Bearer',
+            expires_in='3600',
+            ext_expires_in='3600',
+            expires_on=str(now + 3600),
+            not_before=str(now),
+            resource='https://management.core.windows.net/',
+            access_token='standin-' + hashlib.sha1(str(now).encode('utf-8')).hexdigest(),
+        ))
+
+    def _lro_headers(self):
+        if not self.store.lro_polls:
+            return None
+        operation_id = self.store.start_operation()
+        return {
+            'Azure-AsyncOperation': '{0}{1}{2}'.format(self._base_url(), OPERATIONS_PATH, operation_id),
+            'Retry-After': '0',
+        }
+
+    def _arm(self, url):
+        path = url.path
+        segments = [s for s in path.split('/') if s]
+        lowered = [s.lower() for s in segments]
+        raw = self._read_body()
+
+        if self.command == 'POST':
+            if lowered and lowered[-1] == 'listkeys':
+                seed = hashlib.sha256('/'.join(lowered[:-1]).encode('utf-8')).digest()
+                keys = [dict(keyName='key{0}'.format(i + 1), permissions='Full',
+                             value=base64.b64encode(seed + bytes(bytearray([i])) * 32).decode('ascii'))
+                        for i in range(2)]
+                return self._send(200, dict(keys=keys))
+            headers = self._lro_headers()
+            return self._send(202 if headers else 200, dict(), headers=headers)
+
+        # collections have an odd number of segments past the provider namespace
+        is_collection = False
+        if 'providers' in lowered:
+            is_collection = (len(segments) - lowered.index('providers')) % 2 == 1
+        else:
+            is_collection = len(segments) % 2 == 1
+
+        if self.command in ('GET', 'HEAD'):
+            if is_collection:
+                return self._send(200, self.store.list_resources(path))
+            resource = self.store.get_resource(path)
+            if resource is None:
+                return self._not_found(path)
+            if self.command == 'HEAD':
+                return self._send(204, None, content_type='')
+            return self._send(200, resource)
+
+        if self.command in ('PUT', 'PATCH'):
+            body = self._json_body(raw)
+            existing = self.store.get_resource(path)
+            if self.command == 'PATCH' and existing:
+                merged = copy.deepcopy(existing)
+                for key, value in body.items():
+                    if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                        merged[key].update(value)
+                    else:
+                        merged[key] = value
+                body = merged
+            resource = self.store.put_resource(path, body)
+            return self._send(200 if existing else 201, resource, headers=self._lro_headers())
+
+        if self.command == 'DELETE':
+            removed = self.store.delete_resource(path)
+            headers = self._lro_headers()
+            if headers:
+                return self._send(202, None, headers=headers, content_type='')
+            return self._send(200 if removed else 204, None, content_type='')
+
+        return self._send(405, dict(error=dict(code='MethodNotAllowed', message=self.command)))
+
+
+class BlobHandler(object):
+    '''
+    Minimal blob service: containers, block/page/append blobs, metadata, properties, listing and copy.
+    '''
+
+    def __init__(self, request, account):
+        self.request = request
+        self.account = account
+        self.url = urlparse(request.path)
+        self.query = dict((k.lower(), v[0]) for k, v in parse_qs(self.url.query, keep_blank_values=True).items())
+        self.headers = request.headers
+        parts = [p for p in self.url.path.split('/') if p]
+        self.container = parts[0] if parts else None
+        self.blob = '/'.join(parts[1:]) if len(parts) > 1 else None
+
+    @property
+    def store(self):
+        return self.request.store
+
+    def _containers(self):
+        return self.store.containers.setdefault(self.account, dict())
+
+    def _error(self, status, code):
+        body = '<?xml version="1.0" encoding="utf-8"?><Error><Code>{0}</Code><Message>{0}</Message></Error>'.format(code)
+        self.request._send(status, body, headers={'x-ms-error-code': code}, content_type='application/xml')
+
+    def _metadata_headers(self, metadata):
+        return dict(('x-ms-meta-' + k, v) for k, v in metadata.items())
+
+    def _read_metadata(self):
+        return dict((k[len('x-ms-meta-'):], v) for k, v in self.headers.items() if k.lower().startswith('x-ms-meta-'))
+
+    def handle(self):
+        raw = self.request._read_body()
+        method = self.request.command
+        with self.store.lock:
+            if self.container is None:
+                if self.query.get('comp') == 'list':
+                    return self._list_containers()
+                if self.query.get('comp') == 'properties':
+                    return self.request._send(202, None, content_type='')
+                return self._error(400, 'InvalidQueryParameterValue')
+            if self.blob is None:
+                return self._handle_container(method)
+            return self._handle_blob(method, raw)
+
+    def _handle_container(self, method):
+        containers = self._containers()
+        container = containers.get(self.container)
+        comp = self.query.get('comp')
+        if method == 'PUT' and comp is None:
+            if container is not None:
+                return self._error(409, 'ContainerAlreadyExists')
+            containers[self.container] = dict(metadata=self._read_metadata(), blobs=dict(), etag=_etag(),
+                                              modified=_now_rfc1123())
+            return self.request._send(201, None, headers={'ETag': containers[self.container]['etag'],
+                                                          'Last-Modified': containers[self.container]['modified']},
+                                      content_type='')
+        if container is None:
+            return self._error(404, 'ContainerNotFound')
+        if method == 'DELETE':
+            del containers[self.container]
+            return self.request._send(202, None, content_type='')
+        if comp == 'metadata' and method == 'PUT':
+            container['metadata'] = self._read_metadata()
+            container['etag'] = _etag()
+            return self.request._send(200, None, headers={'ETag': container['etag'],
+                                                          'Last-Modified': container['modified']}, content_type='')
+        if comp == 'list':
+            return self._list_blobs(container)
+        if comp == 'acl':
+            headers = {'ETag': container['etag'], 'Last-Modified': container['modified']}
+            return self.request._send(200, '<?xml version="1.0" encoding="utf-8"?><SignedIdentifiers />',
+                                      headers=headers, content_type='application/xml')
+        headers = {'ETag': container['etag'], 'Last-Modified': container['modified'], 'x-ms-lease-status': 'unlocked',
+                   'x-ms-lease-state': 'available'}
+        headers.update(self._metadata_headers(container['metadata']))
+        return self.request._send(200, None, headers=headers, content_type='')
+
+    def _blob_headers(self, blob):
+        headers = {
+            'ETag': blob['etag'],
+            'Last-Modified': blob['modified'],
+            'x-ms-blob-type': blob['type'],
+            'x-ms-lease-status': 'unlocked',
+            'x-ms-lease-state': 'available',
+            'Accept-Ranges': 'bytes',
+        }
+        for key, header in (('content_type', 'Content-Type'), ('content_encoding', 'Content-Encoding'),
+                            ('content_language', 'Content-Language'), ('content_disposition', 'Content-Disposition'),
+                            ('cache_control', 'Cache-Control'), ('content_md5', 'Content-MD5')):
+            if blob['settings'].get(key):
+                headers[header] = blob['settings'][key]
+        if blob.get('copy'):
+            headers['x-ms-copy-id'] = blob['copy']['id']
+            headers['x-ms-copy-status'] = 'success'
+            headers['x-ms-copy-source'] = blob['copy']['source']
+            headers['x-ms-copy-progress'] = '{0}/{0}'.format(len(blob['data']))
+        headers.update(self._metadata_headers(blob['metadata']))
+        return headers
+
+    def _read_settings(self):
+        settings = dict()
+        for key, header in (('content_type', 'x-ms-blob-content-type'), ('content_encoding', 'x-ms-blob-content-encoding'),
+                            ('content_language', 'x-ms-blob-content-language'),
+                            ('content_disposition', 'x-ms-blob-content-disposition'),
+                            ('cache_control', 'x-ms-blob-cache-control'), ('content_md5', 'x-ms-blob-content-md5')):
+            if self.headers.get(header):
+                settings[key] = self.headers.get(header)
+        return settings
+
+    def _parse_range(self, size):
+        header = self.headers.get('x-ms-range') or self.headers.get('Range')
+        if not header:
+            return None
+        match = re.match(r'bytes=(\d+)-(\d*)', header)
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else size - 1
+        return start, min(end, size - 1)
+
+    def _handle_blob(self, method, raw):
+        container = self._containers().get(self.container)
+        if container is None:
+            return self._error(404, 'ContainerNotFound')
+        blobs = container['blobs']
+        blob = blobs.get(self.blob)
+        comp = self.query.get('comp')
+
+        if method == 'PUT' and comp is None:
+            copy_source = self.headers.get('x-ms-copy-source')
+            if copy_source:
+                return self._copy_blob(blobs, copy_source)
+            blob_type = self.headers.get('x-ms-blob-type', 'BlockBlob')
+            data = bytearray(raw)
+            if blob_type == 'PageBlob':
+                data = bytearray(int(self.headers.get('x-ms-blob-content-length') or 0))
+            blobs[self.blob] = blob = dict(type=blob_type, data=data, blocks=dict(), metadata=self._read_metadata(),
+                                           settings=self._read_settings(), etag=_etag(), modified=_now_rfc1123())
+            return self.request._send(201, None, headers={'ETag': blob['etag'], 'Last-Modified': blob['modified']},
+                                      content_type='')
+        if method == 'PUT' and comp == 'block':
+            if blob is None:
+                blobs[self.blob] = blob = dict(type='BlockBlob', data=bytearray(), blocks=dict(), metadata=dict(),
+                                               settings=dict(), etag=_etag(), modified=_now_rfc1123(), uncommitted=True)
+            blob['blocks'][self.query.get('blockid')] = raw
+            return self.request._send(201, None, content_type='')
+        if method == 'PUT' and comp == 'blocklist':
+            if blob is None:
+                blobs[self.blob] = blob = dict(type='BlockBlob', data=bytearray(), blocks=dict(), metadata=dict(),
+                                               settings=dict(), etag=_etag(), modified=_now_rfc1123())
+            ids = re.findall(r'<(?:Latest|Uncommitted|Committed)>([^<]*)</', raw.decode('utf-8'))
+            blob['data'] = bytearray(b''.join(blob['blocks'].get(i, b'') for i in ids))
+            blob['blocks'] = dict()
+            blob['metadata'] = self._read_metadata() or blob['metadata']
+            blob['settings'] = self._read_settings() or blob['settings']
+            blob['etag'] = _etag()
+            blob.pop('uncommitted', None)
+            return self.request._send(201, None, headers={'ETag': blob['etag'], 'Last-Modified': blob['modified']},
+                                      content_type='')
+
+        if blob is None or blob.get('uncommitted'):
+            return self._error(404, 'BlobNotFound')
+
+        if method == 'PUT' and comp == 'page':
+            start, end = self._parse_range(len(blob['data']))
+            if self.headers.get('x-ms-page-write', 'update').lower() == 'clear':
+                blob['data'][start:end + 1] = bytearray(end - start + 1)
+            else:
+                blob['data'][start:end + 1] = bytearray(raw)
+            blob['etag'] = _etag()
+            return self.request._send(201, None, headers={'ETag': blob['etag'], 'Last-Modified': blob['modified']},
+                                      content_type='')
+        if method == 'PUT' and comp == 'metadata':
+            blob['metadata'] = self._read_metadata()
+            blob['etag'] = _etag()
+            return self.request._send(200, None, headers={'ETag': blob['etag'], 'Last-Modified': blob['modified']},
+                                      content_type='')
+        if method == 'PUT' and comp == 'properties':
+            blob['settings'] = self._read_settings()
+            blob['etag'] = _etag()
+            return self.request._send(200, None, headers={'ETag': blob['etag'], 'Last-Modified': blob['modified']},
+                                      content_type='')
+        if method == 'DELETE':
+            del blobs[self.blob]
+            return self.request._send(202, None, content_type='')
+        if method == 'HEAD':
+            headers = self._blob_headers(blob)
+            headers.pop('Content-Type', None)
+            self.request.send_response(200)
+            self.request.send_header('Content-Type', blob['settings'].get('content_type', 'application/octet-stream'))
+            self.request.send_header('Content-Length', str(len(blob['data'])))
+            for key, value in headers.items():
+                self.request.send_header(key, value)
+            self.request.end_headers()
+            return None
+        if method == 'GET' and comp == 'pagelist':
+            ranges = ''.join('<PageRange><Start>{0}</Start><End>{1}</End></PageRange>'.format(s, e)
+                             for s, e in _page_ranges(blob['data']))
+            return self.request._send(200, '<?xml version="1.0" encoding="utf-8"?><PageList>{0}</PageList>'.format(ranges),
+                                      headers={'ETag': blob['etag'], 'Last-Modified': blob['modified'],
+                                               'x-ms-blob-content-length': str(len(blob['data']))},
+                                      content_type='application/xml')
+        if method == 'GET':
+            data = bytes(blob['data'])
+            headers = self._blob_headers(blob)
+            content_type = headers.pop('Content-Type', 'application/octet-stream')
+            byte_range = self._parse_range(len(data)) if data else None
+            if byte_range:
+                start, end = byte_range
+                headers['Content-Range'] = 'bytes {0}-{1}/{2}'.format(start, end, len(data))
+                return self.request._send(206, data[start:end + 1], headers=headers, content_type=content_type)
+            return self.request._send(200, data, headers=headers, content_type=content_type)
+        return self._error(400, 'UnsupportedHttpVerb')
+
+    def _copy_blob(self, blobs, copy_source):
+        source = urlparse(copy_source)
+        account = BLOB_HOST_PATTERN.match(source.netloc).group('account')
+        parts = [p for p in source.path.split('/') if p]
+        source_container = self.store.containers.get(account, {}).get(parts[0]) if parts else None
+        source_blob = source_container['blobs'].get('/'.join(parts[1:])) if source_container else None
+        if source_blob is None:
+            return self._error(404, 'CannotVerifyCopySource')
+        copy_id = str(uuid.uuid4())
+        blobs[self.blob] = blob = dict(type=source_blob['type'], data=bytearray(source_blob['data']), blocks=dict(),
+                                       metadata=self._read_metadata() or dict(source_blob['metadata']),
+                                       settings=dict(source_blob['settings']), etag=_etag(), modified=_now_rfc1123(),
+                                       copy=dict(id=copy_id, source=copy_source))
+        return self.request._send(202, None, headers={'ETag': blob['etag'], 'Last-Modified': blob['modified'],
+                                                      'x-ms-copy-id': copy_id, 'x-ms-copy-status': 'success'},
+                                  content_type='')
+
+    def _paged(self, names):
+        marker = self.query.get('marker')
+        max_results = int(self.query.get('maxresults') or 5000)
+        if marker:
+            names = [n for n in names if n >= marker]
+        page = names[:max_results]
+        next_marker = names[max_results] if len(names) > max_results else ''
+        return page, next_marker
+
+    def _list_containers(self):
+        prefix = self.query.get('prefix', '')
+        containers = self._containers()
+        names, next_marker = self._paged(sorted(n for n in containers if n.startswith(prefix)))
+        items = []
+        for name in names:
+            container = containers[name]
+            metadata = ''
+            if 'metadata' in self.query.get('include', ''):
+                metadata = '<Metadata>{0}</Metadata>'.format(''.join(
+                    '<{0}>{1}</{0}>'.format(k, xml_escape(v)) for k, v in container['metadata'].items()))
+            items.append('<Container><Name>{0}</Name><Properties><Last-Modified>{1}</Last-Modified><Etag>{2}</Etag>'
+                         '<LeaseStatus>unlocked</LeaseStatus><LeaseState>available</LeaseState></Properties>{3}'
+                         '</Container>'.format(xml_escape(name), container['modified'], container['etag'], metadata))
+        body = ('<?xml version="1.0" encoding="utf-8"?><EnumerationResults ServiceEndpoint="https://{0}.blob.core.windows.net/">'
+                '<Prefix>{1}</Prefix><Containers>{2}</Containers><NextMarker>{3}</NextMarker></EnumerationResults>'
+                ).format(self.account, xml_escape(prefix), ''.join(items), xml_escape(next_marker))
+        return self.request._send(200, body, content_type='application/xml')
+
+    def _list_blobs(self, container):
+        prefix = self.query.get('prefix', '')
+        delimiter = self.query.get('delimiter')
+        entries = dict()
+        for name, blob in container['blobs'].items():
+            if blob.get('uncommitted') or not name.startswith(prefix):
+                continue
+            rest = name[len(prefix):]
+            if delimiter and delimiter in rest:
+                entries[prefix + rest.split(delimiter)[0] + delimiter] = None
+            else:
+                entries[name] = blob
+        names, next_marker = self._paged(sorted(entries))
+        items = []
+        for name in names:
+            blob = entries[name]
+            if blob is None:
+                items.append('<BlobPrefix><Name>{0}</Name></BlobPrefix>'.format(xml_escape(name)))
+                continue
+            metadata = ''
+            if 'metadata' in self.query.get('include', ''):
+                metadata = '<Metadata>{0}</Metadata>'.format(''.join(
+                    '<{0}>{1}</{0}>'.format(k, xml_escape(v)) for k, v in blob['metadata'].items()))
+            settings = blob['settings']
+            items.append(
+                '<Blob><Name>{0}</Name><Properties><Last-Modified>{1}</Last-Modified><Etag>{2}</Etag>'
+                '<Content-Length>{3}</Content-Length><Content-Type>{4}</Content-Type>'
+                '<Content-Encoding>{5}</Content-Encoding><BlobType>{6}</BlobType><LeaseStatus>unlocked</LeaseStatus>'
+                '<LeaseState>available</LeaseState></Properties>{7}</Blob>'.format(
+                    xml_escape(name), blob['modified'], blob['etag'], len(blob['data']),
+                    xml_escape(settings.get('content_type', 'application/octet-stream')),
+                    xml_escape(settings.get('content_encoding', '')), blob['type'], metadata))
+        body = ('<?xml version="1.0" encoding="utf-8"?><EnumerationResults ServiceEndpoint="https://{0}.blob.core.windows.net/" '
+                'ContainerName="{1}"><Prefix>{2}</Prefix><Blobs>{3}</Blobs><NextMarker>{4}</NextMarker></EnumerationResults>'
+                ).format(self.account, xml_escape(self.container), xml_escape(prefix), ''.join(items), xml_escape(next_marker))
+        return self.request._send(200, body, content_type='application/xml')
+
+
+def _page_ranges(data, page_size=512):
+    start = None
+    for offset in range(0, len(data), page_size):
+        empty = not any(data[offset:offset + page_size])
+        if not empty and start is None:
+            start = offset
+        elif empty and start is not None:
+            yield start, offset - 1
+            start = None
+    if start is not None:
+        yield start, len(data) - 1
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, store, tls_context, wrap=True, verbose=False):
+        HTTPServer.__init__(self, address, StandInHandler)
+        self.store = store
+        self.tls_context = tls_context
+        self.verbose = verbose
+        if wrap:
+            self.socket = tls_context.wrap_socket(self.socket, server_side=True)
+
+
+class AzureStandIn(object):
+    '''
+    HTTPS endpoint for ARM and AAD plus an HTTP CONNECT proxy for blob hosts, sharing one store.
+    '''
+
+    def __init__(self, certfile, keyfile=None, host='127.0.0.1', port=0, proxy_port=0, verbose=False):
+        self.store = ResourceStore()
+        context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        context.load_cert_chain(certfile, keyfile)
+        self.https = StandInServer((host, port), self.store, context, wrap=True, verbose=verbose)
+        self.proxy = StandInServer((host, proxy_port), self.store, context, wrap=False, verbose=verbose)
+        self.threads = []
+
+    @property
+    def endpoint(self):
+        return 'https://{0}:{1}'.format(*self.https.server_address[:2])
+
+    @property
+    def proxy_url(self):
+        return 'http://{0}:{1}'.format(*self.proxy.server_address[:2])
+
+    def start(self):
+        for server in (self.https, self.proxy):
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in (self.https, self.proxy):
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--certfile', required=True, help='PEM certificate (and key) served on both listeners')
+    parser.add_argument('--keyfile', help='PEM private key, when not bundled with the certificate')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--proxy-port', type=int, default=8080)
+    parser.add_argument('--latency', action='append', default=[], metavar='METHOD=SECONDS',
+                        help='delay applied to every request of METHOD (use * for all methods)')
+    parser.add_argument('--lro-polls', type=int, default=0, help='InProgress responses before an operation succeeds')
+    parser.add_argument('--seed', help='JSON file with resources, fixtures and containers to preload')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    standin = AzureStandIn(args.certfile, args.keyfile, args.host, args.port, args.proxy_port, args.verbose)
+    config = dict(lro_polls=args.lro_polls,
+                  latency=dict(item.split('=', 1) for item in args.latency))
+    if args.seed:
+        with open(args.seed) as seed_file:
+            config.update(json.load(seed_file))
+    standin.store.configure(config)
+    standin.start()
+    print('ARM endpoint {0}, blob proxy {1}'.format(standin.endpoint, standin.proxy_url))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == '__main__':
+    main()
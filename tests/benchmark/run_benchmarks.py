@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2018 Ansible Project
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+'''
+Run the module benchmark scenarios against the offline Azure stand-in.
+
+Every scenario is a playbook in scenarios/ with an optional JSON file of the same name holding the
+stand-in configuration (preloaded resources, fixtures, latency and LRO polls). For each scenario the
+wall time, the number of requests served by the stand-in and the peak RSS of the ansible-playbook
+process tree are measured and compared against a stored baseline.
+
+    python tests/benchmark/run_benchmarks.py                      # run all, compare with baseline.json
+    python tests/benchmark/run_benchmarks.py -s securitygroup     # run a single scenario
+    python tests/benchmark/run_benchmarks.py --update-baseline    # record the current numbers
+
+Requires ansible-playbook, the Azure SDK from files/requirements-azure.txt and the openssl binary.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from arm_standin import AzureStandIn
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROLE_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, '..', '..'))
+SCENARIO_DIR = os.path.join(BENCHMARK_DIR, 'scenarios')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+SUBSCRIPTION_ID = '00000000-0000-0000-0000-000000000000'
+
+
+def create_certificate(directory):
+    '''
+    Create a throw-away certificate valid for the loopback address and every blob host.
+    '''
+    keyfile = os.path.join(directory, 'standin.key')
+    certfile = os.path.join(directory, 'standin.crt')
+    config = os.path.join(directory, 'openssl.cnf')
+    with open(config, 'w') as f:
+        f.write('[req]\ndistinguished_name=dn\nx509_extensions=ext\nprompt=no\n'
+                '[dn]\nCN=localhost\n'
+                '[ext]\nsubjectAltName=DNS:localhost,IP:127.0.0.1,DNS:*.blob.core.windows.net\n')
+    subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                           '-keyout', keyfile, '-out', certfile, '-config', config],
+                          stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    return certfile, keyfile
+
+
+def scenario_environment(standin, certfile):
+    env = dict(os.environ)
+    env.update(
+        ANSIBLE_LIBRARY=os.path.join(ROLE_DIR, 'library'),
+        ANSIBLE_MODULE_UTILS=os.path.join(ROLE_DIR, 'module_utils'),
+        ANSIBLE_RETRY_FILES_ENABLED='false',
+        ANSIBLE_AZURE_AUTH_SOURCE='env',
+        AZURE_SUBSCRIPTION_ID=SUBSCRIPTION_ID,
+        AZURE_CLIENT_ID='benchmark',
+        AZURE_SECRET='benchmark',
+        AZURE_TENANT='adfs',
+        AZURE_CLOUD_ENVIRONMENT=standin.endpoint,
+        REQUESTS_CA_BUNDLE=certfile,
+        HTTPS_PROXY=standin.proxy_url,
+        https_proxy=standin.proxy_url,
+        NO_PROXY='127.0.0.1,localhost',
+        no_proxy='127.0.0.1,localhost',
+    )
+    env.pop('AZURE_PROFILE', None)
+    return env
+
+
+def load_scenarios(names):
+    scenarios = []
+    for playbook in sorted(glob.glob(os.path.join(SCENARIO_DIR, '*.yml'))):
+        name = os.path.splitext(os.path.basename(playbook))[0]
+        if names and name not in names:
+            continue
+        config = dict()
+        config_file = os.path.splitext(playbook)[0] + '.json'
+        if os.path.exists(config_file):
+            with open(config_file) as f:
+                config = json.load(f)
+        scenarios.append(dict(name=name, playbook=playbook, config=config))
+    missing = set(names or []) - set(s['name'] for s in scenarios)
+    if missing:
+        raise SystemExit('Unknown scenario(s): {0}'.format(', '.join(sorted(missing))))
+    return scenarios
+
+
+def run_scenario(standin, scenario, env, workdir, verbose=False):
+    standin.store.reset()
+    standin.store.configure(scenario['config'])
+
+    command = ['ansible-playbook', '-i', 'localhost,', '-c', 'local', scenario['playbook'],
+               '-e', 'benchmark_workdir={0}'.format(workdir)]
+    output = None if verbose else open(os.path.join(workdir, scenario['name'] + '.log'), 'w')
+    started = time.time()
+    process = subprocess.Popen(command, env=env, stdout=output, stderr=subprocess.STDOUT, cwd=workdir)
+    # wait4 reports the peak RSS of the playbook and of the module processes it reaped
+    pid, status, usage = os.wait4(process.pid, 0)
+    wall = time.time() - started
+    process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+    if output:
+        output.close()
+
+    with standin.store.lock:
+        stats = json.loads(json.dumps(standin.store.stats))
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = usage.ru_maxrss / 1024.0 if sys.platform != 'darwin' else usage.ru_maxrss / (1024.0 * 1024.0)
+    return dict(
+        ok=process.returncode == 0,
+        wall=round(wall, 3),
+        requests=stats['total'],
+        requests_by_kind=stats['by_kind'],
+        peak_rss_mb=round(rss, 1),
+    )
+
+
+def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2.0
+
+
+def compare(name, result, baseline, tolerance):
+    '''
+    Return a list of regressions of result against the stored baseline entry.
+    '''
+    regressions = []
+    previous = baseline.get(name)
+    if not previous:
+        return regressions
+    if result['requests'] > previous['requests']:
+        regressions.append('requests {0} > {1}'.format(result['requests'], previous['requests']))
+    for key in ('wall', 'peak_rss_mb'):
+        limit = previous[key] * (1.0 + tolerance)
+        if result[key] > limit:
+            regressions.append('{0} {1} > {2:.3f} (baseline {3})'.format(key, result[key], limit, previous[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--scenario', action='append', help='scenario name; may be repeated')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='write the measured numbers to the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative increase of wall time and peak RSS (default 0.25)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per scenario; the median is reported')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('-v', '--verbose', action='store_true', help='show the playbook output')
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.scenario)
+    baseline = dict()
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix='azure-benchmark-')
+    certfile, keyfile = create_certificate(workdir)
+    standin = AzureStandIn(certfile, keyfile, verbose=args.verbose).start()
+    env = scenario_environment(standin, certfile)
+
+    results = dict()
+    failures = []
+    try:
+        for scenario in scenarios:
+            runs = [run_scenario(standin, scenario, env, workdir, args.verbose) for i in range(args.repeat)]
+            result = dict(runs[-1])
+            result['wall'] = round(median([r['wall'] for r in runs]), 3)
+            result['peak_rss_mb'] = max(r['peak_rss_mb'] for r in runs)
+            result['ok'] = all(r['ok'] for r in runs)
+            results[scenario['name']] = result
+            if not result['ok']:
+                failures.append('{0}: playbook failed, see {1}'.format(
+                    scenario['name'], os.path.join(workdir, scenario['name'] + '.log')))
+                continue
+            for regression in compare(scenario['name'], result, baseline, args.tolerance):
+                failures.append('{0}: {1}'.format(scenario['name'], regression))
+    finally:
+        standin.stop()
+
+    print('{0:<24} {1:>9} {2:>9} {3:>12}  {4}'.format('scenario', 'wall (s)', 'requests', 'peak RSS MB', 'baseline'))
+    for name in sorted(results):
+        result = results[name]
+        previous = baseline.get(name)
+        reference = '{wall}s / {requests} / {peak_rss_mb}MB'.format(**previous) if previous else '-'
+        print('{0:<24} {1:>9} {2:>9} {3:>12}  {4}'.format(
+            name + ('' if result['ok'] else ' (FAILED)'), result['wall'], result['requests'],
+            result['peak_rss_mb'], reference))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        for name, result in results.items():
+            if result['ok']:
+                baseline[name] = dict(wall=result['wall'], requests=result['requests'],
+                                      peak_rss_mb=result['peak_rss_mb'])
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('Baseline written to {0}'.format(args.baseline))
+
+    if failures:
+        print('\n'.join(['', 'Regressions:'] + failures))
+        sys.exit(1)
+
+    if not any(not r['ok'] for r in results.values()):
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()